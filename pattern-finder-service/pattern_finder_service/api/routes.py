@@ -36,6 +36,11 @@ def create_router(config: ServiceConfig, dataset_client: DatasetServerClient) ->
     async def health() -> dict[str, str]:
         return {"status": "ok"}
 
+    @router.get("/cache/stats", summary="Local asset cache counters")
+    async def cache_stats() -> dict[str, Optional[dict[str, int]]]:
+        cache = dataset_client.asset_cache
+        return {"assets": cache.stats() if cache is not None else None}
+
     @router.get(
         "/datasets/public",
         response_model=DatasetListResponse,
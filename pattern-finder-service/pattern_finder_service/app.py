@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
@@ -7,16 +10,29 @@ from fastapi.staticfiles import StaticFiles
 from .api.routes import create_router
 from .clients.dataset_server import DatasetServerClient
 from .config import get_config
+from .services.executor import get_executor
 
 
 def create_app() -> FastAPI:
     config = get_config()
     dataset_client = DatasetServerClient(config)
+    executor = get_executor(config)
+
+    @asynccontextmanager
+    async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+        await dataset_client.start()
+        await executor.start()
+        try:
+            yield
+        finally:
+            await dataset_client.aclose()
+            executor.shutdown()
 
     app = FastAPI(
         title="Pattern Finder Service",
         version="0.1.0",
         description="FastAPI interface around the star pattern search utilities.",
+        lifespan=lifespan,
     )
 
     cors_origins = list(config.cors_origins) or ["*"]
@@ -37,6 +53,7 @@ def create_app() -> FastAPI:
 
     app.state.config = config
     app.state.dataset_client = dataset_client
+    app.state.executor = executor
 
     return app
 
@@ -0,0 +1,4 @@
+"""Stand-alone benchmarks for the pattern search pipeline.
+
+Run them as modules, e.g. ``python -m pattern_finder_service.benchmarks.scaling``.
+"""
@@ -0,0 +1,71 @@
+"""Equalization engines compared: stage time and star-catalog agreement.
+
+    python -m pattern_finder_service.benchmarks.equalization --sizes 1024 2048 --detector dog
+
+Each synthetic field is equalised by every engine and run through the same detector and
+candidate filter. ``agree`` is the share of the ``skimage`` catalog the engine also finds
+within ``--match-px``, ``extra`` the share of its stars the ``skimage`` catalog lacks,
+and ``recall`` is measured against the injected stars.
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import replace
+from typing import Sequence
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from ..services.pattern_core import StarDetectionParams, _equalize, _filter_candidate_stars, _find_blobs
+from .synthetic import render_star_field
+
+
+def _share_matched(reference: np.ndarray, found: np.ndarray, radius: float) -> float:
+    if not len(reference):
+        return 1.0
+    if not len(found):
+        return 0.0
+    distances, _ = KDTree(found).query(reference, distance_upper_bound=radius)
+    return float(np.isfinite(distances).mean())
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1024, 2048])
+    parser.add_argument("--density", type=float, default=1500.0, help="Stars per megapixel")
+    parser.add_argument("--engines", nargs="+", default=["skimage", "opencv", "none"])
+    parser.add_argument("--detector", default="dog", choices=["log", "dog"])
+    parser.add_argument("--noise", type=float, default=0.02)
+    parser.add_argument("--match-px", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    base = StarDetectionParams(detector=args.detector)
+    print(f"{'tile':>10} {'engine':>8} {'equalize s':>10} {'stars':>6} {'agree':>6} {'extra':>6} {'recall':>7}")
+    for size in args.sizes:
+        n_stars = max(1, int(args.density * size * size / 1e6))
+        image, truth = render_star_field((size, size), n_stars, seed=args.seed, noise=args.noise)
+        image = np.clip(image, 0.0, 1.0)
+        image = (image - image.min()) / max(float(image.max() - image.min()), 1e-12)
+        reference = None
+        for engine in args.engines:
+            params = replace(base, equalization=engine)
+            started = time.perf_counter()
+            img_eq = _equalize(image, params)
+            elapsed = time.perf_counter() - started
+            blobs = _find_blobs(img_eq, params)
+            stars = blobs[_filter_candidate_stars(img_eq, blobs, params), :2] if len(blobs) else np.zeros((0, 2))
+            if reference is None:
+                reference = stars
+            agree = _share_matched(reference, stars, args.match_px)
+            extra = 1.0 - _share_matched(stars, reference, args.match_px)
+            recall = _share_matched(truth, stars, args.match_px)
+            print(
+                f"{size:>5}x{size:<4} {engine:>8} {elapsed:10.3f} {len(stars):6d} {agree:6.3f} {extra:6.3f} {recall:7.3f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
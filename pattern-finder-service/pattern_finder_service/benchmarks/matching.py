@@ -0,0 +1,160 @@
+"""Match engines compared on synthetic star catalogs: success rate and time per search.
+
+    python -m pattern_finder_service.benchmarks.matching --stars 300 3000 30000 --engines ransac triangles
+
+Every trial scatters ``--stars`` stars over a square field at ``--density`` stars per
+megapixel, embeds a ``--pattern-points`` pattern with well separated stars and moves each
+detected position by up to ``--jitter`` px. The search pattern is the embedded one under a
+random similarity transform; a trial succeeds when every embedded star is matched within
+``--match-px``. ``--bright-pattern`` makes the pattern stars the most prominent ones, as
+hand-picked asterisms usually are; otherwise their prominence is as random as the field's.
+``--copies`` embeds that many differently rotated copies of the pattern (one per grid cell)
+and ``--max-matches`` asks the matcher for that many occurrences; a trial then succeeds when
+every copy is found and ``found`` is the mean number of copies found per search.
+``iters`` is the mean number of hypotheses drawn (or looked up) per search.
+``--verifiers kdtree grid`` times each search with both hypothesis verification backends
+(``--grid-cell`` sizes the grid); they accept the same inliers.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import statistics
+import time
+from typing import Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from ..services.pattern_core import MatchStats, match_pattern
+from .synthetic import similarity_transform
+
+
+def make_catalog(
+    n_stars: int,
+    pattern_points: int,
+    *,
+    density: float,
+    jitter: float,
+    bright_pattern: bool,
+    seed: int,
+    copies: int = 1,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(stars_rc, brightness, copies_rc)`` with the ``(copies, P, 2)`` pattern stars at the end of the catalog."""
+
+    rng = np.random.default_rng(seed)
+    side = math.sqrt(n_stars / density * 1e6)
+    grid = math.ceil(math.sqrt(copies))
+    cell = side / grid
+    spacing = cell / 20.0
+    pattern: list = []
+    while len(pattern) < pattern_points:
+        candidate = rng.uniform(cell * 0.25, cell * 0.75, 2)
+        if all(np.hypot(*(candidate - other)) >= spacing for other in pattern):
+            pattern.append(candidate)
+    pattern_rc = np.asarray(pattern)
+    placed = [pattern_rc]
+    centre = np.full(2, cell / 2.0)
+    for index in range(1, copies):
+        angle = rng.uniform(0.0, 2 * np.pi)
+        rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+        placed.append((pattern_rc - centre) @ rotation.T + centre + np.array(divmod(index, grid)) * cell)
+    embedded = copies * pattern_points
+    field = rng.uniform(0.0, side, (n_stars - embedded, 2))
+    stars = np.concatenate([field, *placed]) + rng.uniform(-jitter, jitter, (n_stars, 2))
+    brightness = rng.uniform(0.3, 1.0, n_stars)
+    if bright_pattern:
+        brightness[-embedded:] = 1.0 + rng.uniform(0.0, 0.1, embedded)
+    return stars, brightness, np.stack(placed)
+
+
+def run_trial(
+    stars: np.ndarray,
+    brightness: np.ndarray,
+    copies_rc: np.ndarray,
+    engine: str,
+    verifier: str,
+    args: argparse.Namespace,
+    seed: int,
+) -> Tuple[int, float, int]:
+    pattern = similarity_transform(copies_rc[0][:, ::-1], seed=seed)[:, ::-1]
+    stats = MatchStats()
+    started = time.perf_counter()
+    matches = match_pattern(
+        stars,
+        pattern,
+        args.tolerance,
+        args.max_iterations,
+        brightness=brightness,
+        seed_stars=args.seed_stars,
+        engine=engine,
+        rng=seed,
+        confidence=args.confidence,
+        stats=stats,
+        max_matches=args.max_matches,
+        verifier=verifier,
+        grid_cell=args.grid_cell,
+    )
+    elapsed = time.perf_counter() - started
+    radius = args.match_px + args.jitter
+    trees = [KDTree(match.points) for match in matches]
+    found = sum(
+        any(np.isfinite(tree.query(copy_rc, distance_upper_bound=radius)[0]).all() for tree in trees)
+        for copy_rc in copies_rc
+    )
+    return found, elapsed, stats.iterations
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stars", nargs="+", type=int, default=[300, 3000, 30000])
+    parser.add_argument("--engines", nargs="+", default=["ransac", "triangles"], choices=["ransac", "triangles"])
+    parser.add_argument("--verifiers", nargs="+", default=["kdtree"], choices=["kdtree", "grid"])
+    parser.add_argument("--grid-cell", type=float, default=0.0, help="Grid verifier cell in pixels (0 = auto)")
+    parser.add_argument("--density", type=float, default=300.0, help="Stars per megapixel")
+    parser.add_argument("--pattern-points", type=int, default=5)
+    parser.add_argument("--jitter", type=float, default=0.5, help="Detection error in pixels")
+    parser.add_argument("--tolerance", type=float, default=3.0)
+    parser.add_argument("--match-px", type=float, default=1.5)
+    parser.add_argument("--seed-stars", type=int, default=0, help="Brightest-first pool / bright triangle family")
+    parser.add_argument("--max-iterations", type=int, default=1000, help="Hypothesis cap per sampling pool")
+    parser.add_argument("--confidence", type=float, default=0.99, help="Adaptive stopping confidence")
+    parser.add_argument("--bright-pattern", action="store_true")
+    parser.add_argument("--copies", type=int, default=1, help="Pattern copies embedded per catalog")
+    parser.add_argument("--max-matches", type=int, default=1, help="Occurrences asked of the matcher")
+    parser.add_argument("--trials", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    print(f"{'stars':>7} {'engine':>10} {'verify':>7} {'success':>8} {'mean ms':>9} {'median ms':>10} {'iters':>8} {'found':>6}")
+    for n_stars in args.stars:
+        for engine, verifier in itertools.product(args.engines, args.verifiers):
+            successes = 0
+            times = []
+            iterations = []
+            found = []
+            for seed in range(args.trials):
+                stars, brightness, copies_rc = make_catalog(
+                    n_stars,
+                    args.pattern_points,
+                    density=args.density,
+                    jitter=args.jitter,
+                    bright_pattern=args.bright_pattern,
+                    seed=seed,
+                    copies=args.copies,
+                )
+                copies, elapsed, drawn = run_trial(stars, brightness, copies_rc, engine, verifier, args, seed)
+                successes += copies == args.copies
+                found.append(copies)
+                times.append(elapsed * 1000.0)
+                iterations.append(drawn)
+            print(
+                f"{n_stars:>7d} {engine:>10} {verifier:>7} {successes / args.trials:8.2f} "
+                f"{statistics.mean(times):9.1f} {statistics.median(times):10.1f} {statistics.mean(iterations):8.0f} "
+                f"{statistics.mean(found):6.2f}",
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Per-stage wall time and peak RSS of one search, per gray-conversion mode.
+
+    python -m pattern_finder_service.benchmarks.memory --size 2048 --bands 3 --detector dog
+
+Writes a multi-band synthetic GeoTIFF, then runs ``search_in_image`` on a fresh
+``RasterContext`` once per ``--modes`` entry under a :class:`StageProfiler`. ``stack`` is
+the previous loader (all bands decoded into one ``(bands, rows, cols)`` array, then
+averaged) and only times the load; ``mean``, ``band2`` and ``luma`` are the band-by-band
+reader. Peaks are absolute process RSS; compare them with ``rss0``, the RSS before the run.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+import rasterio
+
+from ..services.pattern_core import BandSelection, RasterContext, build_pattern, search_in_image
+from ..services.profiling import StageProfiler, current_rss_mb, stage
+from .synthetic import pattern_from_stars, write_star_field
+
+_LUMA = (0.299, 0.587, 0.114)
+
+
+def _modes(bands: int) -> Dict[str, BandSelection]:
+    modes: Dict[str, BandSelection] = {"mean": None, "band2": min(2, bands)}
+    if bands == 3:
+        modes["luma"] = _LUMA
+    return modes
+
+
+def _stack_load(path: Path) -> None:
+    with rasterio.open(path) as src:
+        data = src.read(out_dtype=np.float32)
+        gray = np.mean(data, axis=0, dtype=np.float32)
+        del data
+        gray -= float(gray.min())
+        gray /= max(float(gray.max()), 1e-12)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=2048)
+    parser.add_argument("--bands", type=int, default=3)
+    parser.add_argument("--stars", type=int, default=1500)
+    parser.add_argument("--detector", default="dog", choices=["log", "dog"])
+    parser.add_argument("--equalization", default="skimage", choices=["skimage", "opencv", "none"])
+    parser.add_argument("--modes", nargs="+", default=["stack", "mean", "band2", "luma"])
+    args = parser.parse_args(argv)
+
+    star_params = {"detector": args.detector, "equalization": args.equalization}
+    modes = _modes(args.bands)
+    with tempfile.TemporaryDirectory(prefix="pattern_bench_") as tmp:
+        field = write_star_field(Path(tmp) / "field.tif", (args.size, args.size), args.stars, bands=args.bands)
+        pattern = build_pattern(pattern_from_stars(field))
+        print(f"raster={args.size}x{args.size}x{args.bands} uint8 detector={args.detector} equalization={args.equalization}")
+        print(f"{'mode':>6} {'stage':>22} {'seconds':>8} {'rss0 MB':>8} {'peak MB':>8}")
+        for mode in args.modes:
+            if mode != "stack" and mode not in modes:
+                continue
+            with StageProfiler() as profiler:
+                if mode == "stack":
+                    with stage("load"):
+                        _stack_load(field.path)
+                else:
+                    with RasterContext.open(field.path, bands=modes[mode]) as raster:
+                        search_in_image(raster, pattern, star_params)
+            for record in profiler.records:
+                start = "-" if record.rss_start_mb is None else f"{record.rss_start_mb:8.1f}"
+                print(f"{mode:>6} {record.name:>22} {record.seconds:8.3f} {start:>8} {record.peak_rss_mb:8.1f}", flush=True)
+        if not profiler.exact:
+            print("note: per-stage peaks unavailable here; figures are the process-lifetime ru_maxrss")
+        rss = current_rss_mb()
+        if rss is not None:
+            print(f"final rss {rss:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Throughput of concurrent searches per executor backend and worker count.
+
+    python -m pattern_finder_service.benchmarks.scaling --workers 1 2 4 --jobs 8
+
+Every job runs a full ``search_in_image`` (detection + matching) on the same synthetic
+GeoTIFF (no star-catalog cache), mirroring what ``execute_search`` submits
+to the executor for each dataset file.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Sequence
+
+import numpy as np
+
+from ..services.executor import SearchExecutor
+from ..services.pattern_core import build_pattern, search_in_image
+from .synthetic import pattern_from_stars, write_star_field
+
+
+def _search_job(path: str, pattern_xy: np.ndarray) -> bool:
+    result = search_in_image(path, build_pattern(pattern_xy))
+    return bool(result.matches)
+
+
+async def _measure(kind: str, workers: int, jobs: int, path: str, pattern_xy: np.ndarray) -> float:
+    executor = SearchExecutor(kind, workers)
+    try:
+        await executor.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(executor.run(_search_job, path, pattern_xy) for _ in range(jobs)))
+        return time.perf_counter() - started
+    finally:
+        executor.shutdown()
+
+
+def run(kinds: Sequence[str], worker_counts: Sequence[int], jobs: int, size: int, stars: int) -> List[dict]:
+    rows: List[dict] = []
+    with tempfile.TemporaryDirectory(prefix="pattern_bench_") as tmp:
+        field = write_star_field(Path(tmp) / "field.tif", (size, size), stars)
+        pattern_xy = pattern_from_stars(field)
+        for kind in kinds:
+            baseline = None
+            for workers in worker_counts:
+                elapsed = asyncio.run(_measure(kind, workers, jobs, str(field.path), pattern_xy))
+                throughput = jobs / elapsed
+                baseline = baseline or throughput
+                rows.append(
+                    {
+                        "executor": kind,
+                        "workers": workers,
+                        "seconds": elapsed,
+                        "jobs_per_s": throughput,
+                        "speedup": throughput / baseline,
+                    }
+                )
+                print(
+                    f"{kind:>7}  workers={workers:<3d} {elapsed:8.2f} s  "
+                    f"{throughput:6.2f} jobs/s  x{throughput / baseline:4.2f}",
+                    flush=True,
+                )
+    return rows
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--executors", nargs="+", default=["thread", "process"], choices=["thread", "process"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--size", type=int, default=768, help="Side of the synthetic raster in pixels")
+    parser.add_argument("--stars", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    print(f"cpu_count={os.cpu_count()} jobs={args.jobs} raster={args.size}x{args.size} stars={args.stars}")
+    run(args.executors, args.workers, args.jobs, args.size, args.stars)
+
+
+if __name__ == "__main__":
+    main()
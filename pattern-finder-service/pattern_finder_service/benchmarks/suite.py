@@ -0,0 +1,224 @@
+"""End-to-end synthetic benchmark: throughput, stage times, memory, recall and match success.
+
+    python -m pattern_finder_service.benchmarks.suite --sizes 1024 2048 --artifacts none all
+    python -m pattern_finder_service.benchmarks.suite --json current.json --baseline main.json
+
+Every scenario (size x density x PSF x noise x artifacts x empty sky) is rendered once as an 8-bit
+GeoTIFF with known star positions and an embedded pattern, then searched once per engine
+combination (``--detectors`` x ``--equalizations`` x ``--matchers``) through ``RasterContext`` and
+``search_in_image`` under a :class:`StageProfiler`, without any cache. ``--empty`` leaves
+that fraction of each frame as bare sky and ``--nodata-border`` frames it with nodata, to
+measure what ``--skip-background`` saves on sparse frames. The search pattern
+is the embedded one under a random similarity transform; a match succeeds when every
+embedded star is matched within ``--match-px``.
+
+Columns: ``MP/s`` is raster megapixels over the whole search, the stage columns are
+seconds, ``peak`` is the highest per-stage RSS in MB, and ``recall``/``prec`` compare
+detected stars with the injected ones. With ``--baseline`` the run exits with status 1
+if any row present in both runs lost more than ``--max-slowdown`` of its throughput or
+more than ``--max-recall-drop`` of its recall, or stopped matching.
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from scipy.spatial import KDTree
+
+from ..services.pattern_core import RasterContext, build_pattern, search_in_image
+from ..services.profiling import StageProfiler
+from .synthetic import SceneSpec, similarity_transform, write_scene
+
+ARTIFACTS: Dict[str, Dict[str, Any]] = {
+    "none": {},
+    "gradient": {"gradient": 0.3},
+    "hot": {"hot_pixels": 50.0},
+    "streaks": {"streaks": 3},
+    "all": {"gradient": 0.3, "hot_pixels": 50.0, "streaks": 3},
+}
+_STAGES = ("load", "detect/background", "detect/equalize", "detect/blobs", "detect/tiles", "match")
+
+
+def _matched(reference: np.ndarray, found: np.ndarray, radius: float) -> int:
+    if not len(reference) or not len(found):
+        return 0
+    distances, _ = KDTree(found).query(reference, distance_upper_bound=radius)
+    return int(np.isfinite(distances).sum())
+
+
+def run_case(
+    path: Path,
+    spec: SceneSpec,
+    truth_rc: np.ndarray,
+    pattern_rc: np.ndarray,
+    star_params: Dict[str, Any],
+    *,
+    tolerance: float,
+    match_px: float,
+) -> Dict[str, Any]:
+    """Search one rendered scene with one engine combination and score the result."""
+
+    pattern = build_pattern(similarity_transform(pattern_rc[:, ::-1].astype(np.float64), seed=spec.seed))
+    # Seed the matcher with the scene so reruns are comparable.
+    star_params = {**star_params, "match_seed": spec.seed}
+    with StageProfiler() as profiler:
+        started = time.perf_counter()
+        with RasterContext.open(path) as raster:
+            result = search_in_image(raster, pattern, star_params, tolerance)
+        elapsed = time.perf_counter() - started
+
+    stars_rc = result.stars_xy[:, ::-1] if result.stars_xy is not None else np.zeros((0, 2))
+    matched_rc = result.matched_points_img[:, ::-1] if result.matched_points_img is not None else np.zeros((0, 2))
+    stages = {record.name: record.seconds for record in profiler.records}
+    return {
+        "seconds": elapsed,
+        "mp_per_s": spec.megapixels / max(elapsed, 1e-9),
+        "stages": {name: stages.get(name) for name in _STAGES},
+        "peak_rss_mb": max((record.peak_rss_mb for record in profiler.records), default=None),
+        "exact_peaks": profiler.exact,
+        "stars": int(len(stars_rc)),
+        "recall": _matched(truth_rc, stars_rc, match_px) / max(len(truth_rc), 1),
+        "precision": _matched(stars_rc, truth_rc, match_px) / max(len(stars_rc), 1),
+        "match_score": float(result.score),
+        "match_stats": result.match_stats.to_dict() if result.match_stats is not None else None,
+        "match_success": bool(result.success and _matched(pattern_rc, matched_rc, match_px) == len(pattern_rc)),
+    }
+
+
+def _row_key(row: Dict[str, Any]) -> str:
+    spec = row["scene"]
+    return (
+        f"{spec['shape'][0]}x{spec['shape'][1]}/d{spec['density']:g}/psf{spec['psf_sigma']:g}/"
+        f"n{spec['noise']:g}/{row['artifacts']}/{row['detector']}+{row['equalization']}"
+        + (f"/empty{spec['empty_fraction']:g}" if spec.get("empty_fraction") else "")
+        + (f"/nodata{spec['nodata_border']}" if spec.get("nodata_border") else "")
+        + ("/skipbg" if row.get("skip_background") else "")
+        + (f"/{row['match_engine']}" if row.get("match_engine", "ransac") != "ransac" else "")
+        + (f"/top{row['max_stars']}" if row.get("max_stars") else "")
+        + (f"/seed{row['match_seed_stars']}" if row.get("match_seed_stars") else "")
+    )
+
+
+def _print_row(row: Dict[str, Any]) -> None:
+    stage_cols = " ".join("-".rjust(7) if row["stages"][name] is None else f"{row['stages'][name]:7.3f}" for name in _STAGES)
+    peak = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.0f}"
+    print(
+        f"{_row_key(row):<64} {row['mp_per_s']:6.2f} {stage_cols} {peak:>6} {row['stars']:6d} "
+        f"{row['recall']:6.3f} {row['precision']:6.3f} {'yes' if row['match_success'] else 'no':>5}",
+        flush=True,
+    )
+
+
+def compare(rows: Sequence[Dict[str, Any]], baseline: Sequence[Dict[str, Any]], max_slowdown: float, max_recall_drop: float) -> List[str]:
+    """Regressions of ``rows`` against ``baseline``, as human-readable lines."""
+
+    previous = {_row_key(row): row for row in baseline}
+    problems: List[str] = []
+    for row in rows:
+        key = _row_key(row)
+        old = previous.get(key)
+        if old is None:
+            continue
+        if row["mp_per_s"] < old["mp_per_s"] / max_slowdown:
+            problems.append(f"{key}: {old['mp_per_s']:.2f} -> {row['mp_per_s']:.2f} MP/s")
+        if row["recall"] < old["recall"] - max_recall_drop:
+            problems.append(f"{key}: recall {old['recall']:.3f} -> {row['recall']:.3f}")
+        if old["match_success"] and not row["match_success"]:
+            problems.append(f"{key}: pattern no longer matched")
+    return problems
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1024])
+    parser.add_argument("--densities", nargs="+", type=float, default=[300.0], help="Stars per megapixel")
+    parser.add_argument("--psf", nargs="+", type=float, default=[1.6], help="PSF sigma in pixels")
+    parser.add_argument("--noise", nargs="+", type=float, default=[0.01])
+    parser.add_argument("--artifacts", nargs="+", default=["none"], choices=sorted(ARTIFACTS))
+    parser.add_argument("--detectors", nargs="+", default=["dog"], choices=["log", "dog"])
+    parser.add_argument("--equalizations", nargs="+", default=["opencv"], choices=["skimage", "opencv", "none"])
+    parser.add_argument("--matchers", nargs="+", default=["ransac"], choices=["ransac", "triangles"])
+    parser.add_argument("--max-stars", type=int, default=0, help="Star budget (0 = all stars)")
+    parser.add_argument("--seed-stars", type=int, default=0, help="Brightest-first matching pool (0 = off)")
+    parser.add_argument("--empty", nargs="+", type=float, default=[0.0], help="Star-free share of each frame")
+    parser.add_argument("--nodata-border", type=int, default=0, help="Nodata frame width in pixels")
+    parser.add_argument("--skip-background", action="store_true", help="Skip flat and nodata regions in detection")
+    parser.add_argument("--pattern-points", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=3.0, help="verify_tol_px passed to the search")
+    parser.add_argument("--match-px", type=float, default=1.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="Write the rows to this file")
+    parser.add_argument("--baseline", type=Path, help="Rows from an earlier --json run to compare against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    parser.add_argument("--max-recall-drop", type=float, default=0.02)
+    args = parser.parse_args(argv)
+
+    rows: List[Dict[str, Any]] = []
+    print(f"{'scenario':<64} {'MP/s':>6} {' '.join(name.split('/')[-1][:7].rjust(7) for name in _STAGES)} "
+          f"{'peak':>6} {'stars':>6} {'recall':>6} {'prec':>6} {'match':>5}")
+    with tempfile.TemporaryDirectory(prefix="pattern_bench_") as tmp:
+        for size, density, psf, noise, artifacts, empty in itertools.product(
+            args.sizes, args.densities, args.psf, args.noise, args.artifacts, args.empty
+        ):
+            spec = SceneSpec(
+                shape=(size, size),
+                density=density,
+                psf_sigma=psf,
+                noise=noise,
+                empty_fraction=empty,
+                nodata_border=args.nodata_border,
+                pattern_points=args.pattern_points,
+                seed=args.seed,
+                **ARTIFACTS[artifacts],
+            )
+            field = write_scene(Path(tmp) / "scene.tif", spec)
+            for detector, equalization, matcher in itertools.product(args.detectors, args.equalizations, args.matchers):
+                row = run_case(
+                    field.path,
+                    spec,
+                    field.stars_rc,
+                    field.pattern_rc,
+                    {
+                        "detector": detector,
+                        "equalization": equalization,
+                        "max_stars": args.max_stars,
+                        "match_seed_stars": args.seed_stars,
+                        "skip_background": args.skip_background,
+                        "match_engine": matcher,
+                    },
+                    tolerance=args.tolerance,
+                    match_px=args.match_px,
+                )
+                row.update(
+                    scene=asdict(spec),
+                    artifacts=artifacts,
+                    detector=detector,
+                    equalization=equalization,
+                    max_stars=args.max_stars,
+                    match_seed_stars=args.seed_stars,
+                    skip_background=args.skip_background,
+                    match_engine=matcher,
+                )
+                rows.append(row)
+                _print_row(row)
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+    if args.baseline:
+        problems = compare(rows, json.loads(args.baseline.read_text()), args.max_slowdown, args.max_recall_drop)
+        for line in problems:
+            print(f"REGRESSION {line}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+
+@dataclass
+class StarField:
+    """A synthetic raster written to disk plus the true star centres (row, col).
+
+    ``pattern_rc`` holds the embedded pattern stars when the field was written from a
+    :class:`SceneSpec`.
+    """
+
+    path: Path
+    stars_rc: np.ndarray
+    shape: Tuple[int, int]
+    pattern_rc: Optional[np.ndarray] = None
+
+
+@dataclass(frozen=True)
+class SceneSpec:
+    """Everything that shapes a synthetic benchmark scene; identical specs render identically."""
+
+    shape: Tuple[int, int] = (1024, 1024)
+    density: float = 300.0  # background stars per megapixel
+    psf_sigma: float = 1.6
+    noise: float = 0.01
+    background: float = 0.1
+    gradient: float = 0.0  # background ramp added across the frame (sky glow, vignetting)
+    hot_pixels: float = 0.0  # single saturated pixels per megapixel
+    streaks: int = 0  # satellite / cosmic-ray trails
+    empty_fraction: float = 0.0  # star-free flat sky on the right-hand side of the frame
+    nodata_border: int = 0  # nodata (0) pixels framing the image, as left by reprojection
+    pattern_points: int = 5
+    seed: int = 0
+
+    @property
+    def megapixels(self) -> float:
+        return self.shape[0] * self.shape[1] / 1e6
+
+
+@dataclass
+class Scene:
+    image: np.ndarray
+    stars_rc: np.ndarray  # every injected star, pattern stars included
+    pattern_rc: np.ndarray  # the embedded pattern stars
+    valid: Optional[np.ndarray] = None  # False on nodata pixels, when the spec has a border
+
+
+def _add_point_sources(
+    image: np.ndarray, rows: np.ndarray, cols: np.ndarray, amplitudes: np.ndarray, psf_sigma: float
+) -> None:
+    height, width = image.shape
+    radius = int(np.ceil(5 * psf_sigma))
+    offsets = np.arange(-radius, radius + 1)
+    for row, col, amplitude in zip(rows, cols, amplitudes):
+        r0, c0 = int(row), int(col)
+        rr = np.clip(r0 + offsets, 0, height - 1)
+        cc = np.clip(c0 + offsets, 0, width - 1)
+        dy = (rr - row)[:, None]
+        dx = (cc - col)[None, :]
+        image[np.ix_(rr, cc)] += amplitude * np.exp(-(dy**2 + dx**2) / (2 * psf_sigma**2))
+
+
+def render_star_field(
+    shape: Tuple[int, int],
+    n_stars: int,
+    *,
+    seed: int = 0,
+    psf_sigma: float = 1.6,
+    background: float = 0.1,
+    noise: float = 0.01,
+    margin: int = 10,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Render Gaussian point sources on a noisy background, returning ``(image, stars_rc)``."""
+
+    rng = np.random.default_rng(seed)
+    height, width = shape
+    image = rng.normal(background, noise, shape).astype(np.float32)
+    rows = rng.uniform(margin, height - margin, n_stars)
+    cols = rng.uniform(margin, width - margin, n_stars)
+    amplitudes = rng.uniform(0.3, 1.0, n_stars)
+    _add_point_sources(image, rows, cols, amplitudes, psf_sigma)
+    return image, np.column_stack([rows, cols]).astype(np.float32)
+
+
+def render_scene(spec: SceneSpec) -> Scene:
+    """Render a star field with artifacts and an embedded, isolated pattern.
+
+    The pattern stars are drawn at full brightness, at least ``8 * psf_sigma`` apart from
+    each other, inside the central half of the populated part of the frame. Artifacts are
+    a linear background ramp, saturated single-pixel hot pixels and straight trails; none
+    of them should be reported as stars. ``empty_fraction`` of the width is left as bare
+    sky and ``nodata_border`` pixels around the frame are zeroed as nodata.
+    """
+
+    height, width = spec.shape
+    populated = width - int(round(width * spec.empty_fraction))
+    n_stars = int(round(spec.density * height * populated / 1e6))
+    image, stars = render_star_field(
+        (height, populated),
+        n_stars,
+        seed=spec.seed,
+        psf_sigma=spec.psf_sigma,
+        background=spec.background,
+        noise=spec.noise,
+    )
+    if populated < width:
+        sky = np.random.default_rng((spec.seed, 2)).normal(spec.background, spec.noise, (height, width - populated))
+        image = np.hstack([image, sky.astype(np.float32)])
+    rng = np.random.default_rng((spec.seed, 1))
+
+    spacing = 8 * spec.psf_sigma
+    pattern: list = []
+    while len(pattern) < spec.pattern_points:
+        candidate = rng.uniform([height * 0.25, populated * 0.25], [height * 0.75, populated * 0.75])
+        if all(np.hypot(*(candidate - other)) >= spacing for other in pattern):
+            pattern.append(candidate)
+    pattern_rc = np.asarray(pattern, dtype=np.float32).reshape(-1, 2)
+    _add_point_sources(image, pattern_rc[:, 0], pattern_rc[:, 1], np.ones(len(pattern_rc)), spec.psf_sigma)
+
+    if spec.gradient:
+        image += np.linspace(0.0, spec.gradient, width, dtype=np.float32)[None, :]
+    hot = int(round(spec.hot_pixels * spec.megapixels))
+    if hot:
+        image[rng.integers(0, height, hot), rng.integers(0, width, hot)] = 1.5
+    for _ in range(spec.streaks):
+        start = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        end = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.line(image, start, end, color=0.6, thickness=2, lineType=cv2.LINE_AA)
+
+    stars = np.concatenate([stars, pattern_rc])
+    valid = None
+    border = spec.nodata_border
+    if border:
+        valid = np.zeros(spec.shape, dtype=bool)
+        valid[border:-border, border:-border] = True
+        image[~valid] = 0.0
+        keep = valid[stars[:, 0].astype(int), stars[:, 1].astype(int)]
+        stars = stars[keep]
+    return Scene(image=image, stars_rc=stars, pattern_rc=pattern_rc, valid=valid)
+
+
+def write_star_field(
+    path: Union[str, Path],
+    shape: Tuple[int, int] = (1024, 1024),
+    n_stars: int = 300,
+    *,
+    seed: int = 0,
+    psf_sigma: float = 1.6,
+    bands: int = 1,
+) -> StarField:
+    """Write an 8-bit GeoTIFF star field in EPSG:3857 (10 m pixels).
+
+    With ``bands > 1`` every band carries the same field at a slightly lower gain, like the
+    colour channels of an RGB scan.
+    """
+
+    path = Path(path)
+    image, stars = render_star_field(shape, n_stars, seed=seed, psf_sigma=psf_sigma)
+    _write_uint8(path, image, bands)
+    return StarField(path=path, stars_rc=stars, shape=shape)
+
+
+def pattern_from_stars(field: StarField, count: int = 4, *, seed: int = 0) -> np.ndarray:
+    """Pick ``count`` true stars as an (x, y) pixel pattern that is known to be present.
+
+    Fields written from a :class:`SceneSpec` return their embedded pattern instead.
+    """
+
+    if field.pattern_rc is not None:
+        return field.pattern_rc[:count, ::-1].astype(np.float64)
+
+    rng = np.random.default_rng(seed)
+    picked = field.stars_rc[rng.choice(len(field.stars_rc), size=count, replace=False)]
+    return picked[:, ::-1].astype(np.float64)
+
+
+def _write_uint8(path: Path, image: np.ndarray, bands: int, nodata: Optional[float] = None) -> None:
+    height, width = image.shape
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        height=height,
+        width=width,
+        count=bands,
+        dtype="uint8",
+        crs="EPSG:3857",
+        transform=from_origin(0.0, 0.0, 10.0, 10.0),
+        tiled=True,
+        nodata=nodata,
+    ) as dst:
+        for band in range(1, bands + 1):
+            gain = 200 * (1.0 - 0.1 * (band - 1))
+            dst.write(np.clip(image * gain, 0, 255).astype(np.uint8), band)
+
+
+def write_scene(path: Union[str, Path], spec: SceneSpec, *, bands: int = 1) -> StarField:
+    """Render ``spec`` and write it like :func:`write_star_field`, keeping the pattern stars."""
+
+    path = Path(path)
+    scene = render_scene(spec)
+    _write_uint8(path, scene.image, bands, nodata=0 if scene.valid is not None else None)
+    return StarField(path=path, stars_rc=scene.stars_rc, shape=spec.shape, pattern_rc=scene.pattern_rc)
+
+
+def similarity_transform(pattern_xy: np.ndarray, *, seed: int = 0) -> np.ndarray:
+    """Rotate, scale and shift ``pattern_xy`` randomly, so matching has to recover the pose."""
+
+    rng = np.random.default_rng((seed, 2))
+    angle = rng.uniform(0.0, 2 * np.pi)
+    scale = rng.uniform(0.8, 1.25)
+    rotation = scale * np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    centred = pattern_xy - pattern_xy.mean(axis=0)
+    return centred @ rotation.T + rng.uniform(-500.0, 500.0, 2)
+
+
+__all__ = [
+    "Scene",
+    "SceneSpec",
+    "StarField",
+    "pattern_from_stars",
+    "render_scene",
+    "render_star_field",
+    "similarity_transform",
+    "write_scene",
+    "write_star_field",
+]
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import logger
+
+
+def file_digest(path: Union[str, Path], *, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks."""
+
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_key(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _sidecars(path: Path) -> List[Path]:
+    """Files named ``<path>.<ext>`` next to ``path``."""
+
+    return list(path.parent.glob(f"{path.name}.*"))
+
+
+class DiskCache:
+    """Directory of cache entries with atomic writes and size-bounded LRU eviction.
+
+    Entries are plain files named after their (hashed) key. Reads refresh the file's
+    mtime, which is what eviction orders by, so the least recently used entries go first
+    once the directory grows past ``max_bytes``. Entries handed out with :meth:`acquire`
+    (or ``commit(..., lease=True)``) are never evicted until they are :meth:`release`\ d.
+
+    Files named ``<entry>.<ext>`` (e.g. a GDAL ``.ovr`` next to a ``.tif``) are sidecars of
+    that entry: they count towards its size, are published by :meth:`commit` together with
+    it and are leased, evicted and discarded with it.
+    """
+
+    def __init__(self, root: Path, max_bytes: Optional[int], *, suffix: str = "") -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._leases: Dict[Path, int] = {}
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def acquire(self, key: str) -> Optional[Path]:
+        """Like :meth:`get`, but the entry is leased: eviction spares it until :meth:`release`."""
+
+        with self._lock:
+            path = self.get(key)
+            if path is not None:
+                self._leases[path] = self._leases.get(path, 0) + 1
+            return path
+
+    def release(self, path: Path) -> None:
+        with self._lock:
+            count = self._leases.get(path, 0) - 1
+            if count > 0:
+                self._leases[path] = count
+            else:
+                self._leases.pop(path, None)
+
+    def put(self, key: str, writer: Callable[[Path], None]) -> Path:
+        """Create an entry by letting ``writer`` fill a temporary file, then publish it atomically."""
+
+        tmp_path = self.reserve(key)
+        try:
+            writer(tmp_path)
+        except BaseException:
+            self.abandon(tmp_path)
+            raise
+        return self.commit(key, tmp_path)
+
+    def reserve(self, key: str) -> Path:
+        """Return a temporary path next to the entry; fill it, then :meth:`commit` it."""
+
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=".tmp-", suffix=self.suffix, dir=path.parent)
+        os.close(fd)
+        return Path(tmp_name)
+
+    def commit(self, key: str, tmp_path: Path, *, lease: bool = False) -> Path:
+        """Publish ``tmp_path`` and its sidecars as the entry for ``key``, replacing any old one."""
+
+        path = self.path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with self._lock:
+                # Sidecars go first so the entry never shows up without them.
+                published = self._publish_sidecars(tmp_path, path)
+                for stale in _sidecars(path):
+                    if stale not in published:
+                        stale.unlink(missing_ok=True)
+                os.replace(tmp_path, path)
+                if lease:
+                    self._leases[path] = self._leases.get(path, 0) + 1
+        except BaseException:
+            self.abandon(tmp_path)
+            raise
+        self.evict(keep=path)
+        return path
+
+    def commit_sidecars(self, key: str, tmp_path: Path) -> None:
+        """Publish only the sidecars of ``tmp_path`` next to the existing entry for ``key``."""
+
+        path = self.path_for(key)
+        try:
+            with self._lock:
+                self._publish_sidecars(tmp_path, path)
+        except BaseException:
+            self.abandon(tmp_path)
+            raise
+        self.evict(keep=path)
+
+    def abandon(self, tmp_path: Path) -> None:
+        """Delete a reserved temporary file and whatever sidecars were written next to it."""
+
+        for sidecar in _sidecars(tmp_path):
+            sidecar.unlink(missing_ok=True)
+        tmp_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _publish_sidecars(tmp_path: Path, path: Path) -> List[Path]:
+        published = []
+        for sidecar in _sidecars(tmp_path):
+            target = path.with_name(path.name + sidecar.name[len(tmp_path.name):])
+            os.replace(sidecar, target)
+            published.append(target)
+        return published
+
+    def discard(self, key: str) -> None:
+        path = self.path_for(key)
+        with self._lock:
+            for sidecar in _sidecars(path):
+                sidecar.unlink(missing_ok=True)
+            path.unlink(missing_ok=True)
+
+    def _entries(self) -> Iterator[Tuple[float, int, Path, List[Path]]]:
+        """``(mtime, bytes, path, files)`` of every entry, its sidecars included in ``files``.
+
+        The entry's own file sets the mtime; sidecars whose entry is gone are listed as
+        entries of their own so that eviction still collects them.
+        """
+
+        for bucket in self.root.iterdir():
+            if not bucket.is_dir():
+                continue
+            groups: Dict[str, List[Tuple[os.DirEntry, os.stat_result]]] = {}
+            for entry in os.scandir(bucket):
+                if entry.name.startswith(".tmp-") or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                # Keys are hex digests, so the first dot starts the suffix.
+                groups.setdefault(entry.name.split(".", 1)[0], []).append((entry, stat))
+            for key, members in groups.items():
+                path = bucket / f"{key}{self.suffix}"
+                mtimes = [stat.st_mtime for entry, stat in members if entry.name == path.name]
+                mtime = mtimes[0] if mtimes else min(stat.st_mtime for _, stat in members)
+                size = sum(stat.st_size for _, stat in members)
+                yield mtime, size, path, [Path(entry.path) for entry, _ in members]
+
+    def total_bytes(self) -> int:
+        return sum(size for _, size, _, _ in self._entries())
+
+    def evict(self, *, keep: Optional[Path] = None) -> int:
+        """Delete least recently used entries until the cache fits its budget."""
+
+        if self.max_bytes is None:
+            return 0
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda item: item[:3])
+            total = sum(size for _, size, _, _ in entries)
+            removed = 0
+            for _, size, path, files in entries:
+                if total <= self.max_bytes:
+                    break
+                if (keep is not None and path == keep) or path in self._leases:
+                    continue
+                for file in files:
+                    file.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+        if removed:
+            logger.info("Evicted cache entries", {"root": str(self.root), "removed": removed, "bytes": total})
+        return removed
+
+
+__all__ = ["DiskCache", "file_digest", "hash_key"]
@@ -1,3 +1,4 @@
-from .dataset_server import DatasetServerClient
+from .asset_cache import AssetCache, AssetEntry
+from .dataset_server import DatasetServerClient, build_http_client
 
-__all__ = ["DatasetServerClient"]
+__all__ = ["AssetCache", "AssetEntry", "DatasetServerClient", "build_http_client"]
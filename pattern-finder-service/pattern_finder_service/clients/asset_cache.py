@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from .. import logger
+from ..cache import DiskCache, hash_key
+from ..config import ServiceConfig
+
+# Index entries are a few hundred bytes each; this bounds them independently of the blobs.
+_INDEX_MAX_BYTES = 16 * 1024 * 1024
+
+
+@dataclass
+class AssetEntry:
+    """What the cache knows about one downloaded asset version."""
+
+    digest: str
+    size: int
+    version: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class AssetCache:
+    """Local, size-bounded cache of dataset assets downloaded from the dataset server.
+
+    Asset bodies are stored once under the SHA-256 of their content, so the same bytes
+    reached through different routes (public/admin) or file ids share storage. A small
+    index maps ``(route, version)`` to the blob plus the ``ETag``/``Last-Modified``
+    validators the server returned, which are replayed as conditional request headers.
+    """
+
+    def __init__(self, root: Path, max_bytes: Optional[int]) -> None:
+        self.root = Path(root)
+        self._blobs = DiskCache(self.root / "blobs", max_bytes)
+        self._index = DiskCache(self.root / "index", _INDEX_MAX_BYTES, suffix=".json")
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.bytes_served = 0
+
+    @classmethod
+    def from_config(cls, config: ServiceConfig) -> Optional["AssetCache"]:
+        if not config.asset_cache_max_bytes:
+            return None
+        return cls(config.cache_dir / "assets", config.asset_cache_max_bytes)
+
+    @staticmethod
+    def key_for(route: str, version: Optional[str]) -> str:
+        return hash_key(route, version or "")
+
+    def lookup(self, key: str) -> Optional[AssetEntry]:
+        path = self._index.get(key)
+        if path is None:
+            return None
+        try:
+            entry = AssetEntry(**json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError, TypeError):
+            self._index.discard(key)
+            return None
+        if self._blobs.get(entry.digest) is None:
+            # Blob was evicted; the index entry is useless without it.
+            self._index.discard(key)
+            return None
+        return entry
+
+    def reserve_blob(self) -> Path:
+        """Temporary file inside the blob store to stream a new download into."""
+
+        return self._blobs.reserve("00-incoming")
+
+    def commit(self, key: str, tmp_path: Path, entry: AssetEntry) -> Path:
+        blob_path = self._blobs.get(entry.digest)
+        if blob_path is not None:
+            # Same bytes already stored under another key or version.
+            tmp_path.unlink(missing_ok=True)
+        else:
+            blob_path = self._blobs.commit(entry.digest, tmp_path)
+        payload = json.dumps(asdict(entry)).encode("utf-8")
+        self._index.put(key, lambda tmp: tmp.write_bytes(payload))
+        return blob_path
+
+    def materialize(self, entry: AssetEntry, destination: Path) -> int:
+        """Expose the cached blob at ``destination``, hard-linking when possible.
+
+        Raises ``FileNotFoundError`` if the blob was evicted in the meantime.
+        """
+
+        blob_path = self._blobs.path_for(entry.digest)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        destination.unlink(missing_ok=True)
+        try:
+            os.link(blob_path, destination)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            shutil.copyfile(blob_path, destination)
+        self.bytes_served += entry.size
+        return entry.size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "bytesServed": self.bytes_served,
+            "bytesStored": self._blobs.total_bytes(),
+        }
+
+    def log_stats(self) -> None:
+        logger.info("Asset cache stats", self.stats())
+
+
+__all__ = ["AssetCache", "AssetEntry"]
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
@@ -9,11 +11,69 @@ from fastapi import HTTPException
 from .. import logger
 from ..config import ServiceConfig
 from ..models import DatasetDetailModel, DatasetSummaryModel
+from .asset_cache import AssetCache, AssetEntry
+
+
+def build_http_client(config: ServiceConfig) -> httpx.AsyncClient:
+    """Pooled client for talking to the dataset server, configured from ``config``."""
+
+    http2 = config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+    limits = httpx.Limits(
+        max_connections=config.http_max_connections,
+        max_keepalive_connections=config.http_max_keepalive,
+        keepalive_expiry=config.http_keepalive_expiry,
+    )
+    return httpx.AsyncClient(
+        timeout=config.request_timeout,
+        follow_redirects=True,
+        limits=limits,
+        http2=http2,
+    )
 
 
 class DatasetServerClient:
-    def __init__(self, config: ServiceConfig) -> None:
+    """Async client for the dataset server API.
+
+    One pooled ``httpx.AsyncClient`` is shared by every call. The application opens it in
+    :meth:`start` and closes it in :meth:`aclose`; if nothing started it, it is created on
+    first use.
+    """
+
+    def __init__(
+        self,
+        config: ServiceConfig,
+        asset_cache: Optional[AssetCache] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
         self._config = config
+        self._asset_cache = asset_cache if asset_cache is not None else AssetCache.from_config(config)
+        self._http = http_client
+        self._owns_http = http_client is None
+
+    async def start(self) -> None:
+        if self._http is None:
+            self._http = build_http_client(self._config)
+
+    async def aclose(self) -> None:
+        if self._http is not None and self._owns_http:
+            await self._http.aclose()
+            self._http = None
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = build_http_client(self._config)
+            self._owns_http = True
+        return self._http
+
+    @property
+    def asset_cache(self) -> Optional[AssetCache]:
+        return self._asset_cache
 
     async def _request_json(
         self,
@@ -26,9 +86,8 @@ class DatasetServerClient:
         url = f"{self._config.server_base_url}{path}"
         request_headers = headers or None
         try:
-            async with httpx.AsyncClient(timeout=self._config.request_timeout, follow_redirects=True) as client:
-                response = await client.request(method, url, headers=request_headers, **kwargs)
-                response.raise_for_status()
+            response = await self._client().request(method, url, headers=request_headers, **kwargs)
+            response.raise_for_status()
         except httpx.HTTPStatusError as exc:
             logger.error(
                 "Dataset server returned error",
@@ -62,17 +121,128 @@ class DatasetServerClient:
         destination: Path,
         *,
         headers: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
+        public: bool = False,
     ) -> int:
+        if self._asset_cache is not None and method == "GET":
+            return await self._cached_stream_to_file(
+                self._asset_cache, path, destination, headers=headers, version=version, public=public
+            )
         url = f"{self._config.server_base_url}{path}"
         total_bytes = 0
-        async with httpx.AsyncClient(timeout=self._config.request_timeout, follow_redirects=True) as client:
-            async with client.stream(method, url, headers=headers) as response:
-                response.raise_for_status()
-                destination.parent.mkdir(parents=True, exist_ok=True)
-                with destination.open("wb") as fh:
-                    async for chunk in response.aiter_bytes():
-                        total_bytes += len(chunk)
-                        fh.write(chunk)
+        async with self._client().stream(method, url, headers=headers) as response:
+            response.raise_for_status()
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with destination.open("wb") as fh:
+                async for chunk in response.aiter_bytes():
+                    total_bytes += len(chunk)
+                    fh.write(chunk)
+        return total_bytes
+
+    async def _cached_stream_to_file(
+        self,
+        cache: AssetCache,
+        path: str,
+        destination: Path,
+        *,
+        headers: Optional[Dict[str, str]],
+        version: Optional[str],
+        public: bool,
+    ) -> int:
+        """Serve ``path`` from the asset cache, revalidating or downloading as needed.
+
+        Entries of ``public`` routes keyed by a known ``version`` (the file's ``updated_at``)
+        are trusted as-is when the server sent no validators. Every other hit sends the
+        stored ``ETag``/``Last-Modified`` as ``If-None-Match``/``If-Modified-Since``, so the
+        server still checks the request's credentials, and a 304 reuses the local copy.
+        """
+
+        key = cache.key_for(path, version)
+        entry = cache.lookup(key)
+        if entry is not None and public and version is not None and not entry.has_validators:
+            try:
+                size = await asyncio.to_thread(cache.materialize, entry, destination)
+            except FileNotFoundError:
+                entry = None
+            else:
+                cache.hits += 1
+                logger.info("Asset cache hit", {"path": path, "bytes": size})
+                return size
+
+        url = f"{self._config.server_base_url}{path}"
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(entry.conditional_headers())
+
+        async with self._client().stream("GET", url, headers=request_headers) as response:
+            if entry is None or response.status_code != 304:
+                return await self._store_response(cache, key, path, response, destination, version=version, public=public)
+            try:
+                size = await asyncio.to_thread(cache.materialize, entry, destination)
+            except FileNotFoundError:
+                pass
+            else:
+                cache.hits += 1
+                cache.revalidated += 1
+                logger.info("Asset cache revalidated", {"path": path, "bytes": size})
+                return size
+
+        # Evicted between lookup and use: with the 304 stream closed, fetch it once unconditionally.
+        async with self._client().stream("GET", url, headers=headers or None) as response:
+            return await self._store_response(cache, key, path, response, destination, version=version, public=public)
+
+    async def _store_response(
+        self,
+        cache: AssetCache,
+        key: str,
+        path: str,
+        response: httpx.Response,
+        destination: Path,
+        *,
+        version: Optional[str],
+        public: bool,
+    ) -> int:
+        """Write a full ``response`` to ``destination``, through the cache when it can be reused."""
+
+        response.raise_for_status()
+        cache.misses += 1
+
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if not (etag or last_modified) and (version is None or not public):
+            # Nothing to revalidate a later request on, and only public routes may be served
+            # on their version alone; skip the cache.
+            total_bytes = 0
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with destination.open("wb") as fh:
+                async for chunk in response.aiter_bytes():
+                    total_bytes += len(chunk)
+                    fh.write(chunk)
+            return total_bytes
+
+        tmp_path = cache.reserve_blob()
+        digest = hashlib.sha256()
+        total_bytes = 0
+        try:
+            with tmp_path.open("wb") as fh:
+                async for chunk in response.aiter_bytes():
+                    total_bytes += len(chunk)
+                    digest.update(chunk)
+                    fh.write(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        new_entry = AssetEntry(
+            digest=digest.hexdigest(),
+            size=total_bytes,
+            version=version,
+            etag=etag,
+            last_modified=last_modified,
+        )
+        await asyncio.to_thread(cache.commit, key, tmp_path, new_entry)
+        await asyncio.to_thread(cache.materialize, new_entry, destination)
+        logger.info("Asset cache stored", {"path": path, "bytes": total_bytes})
         return total_bytes
 
     async def list_public_datasets(
@@ -200,12 +370,14 @@ class DatasetServerClient:
         destination: Path,
         *,
         headers: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
     ) -> int:
         return await self._stream_to_file(
             "GET",
             f"/admin/datasets/{dataset_id}/files/{file_id}/raw",
             destination,
             headers=headers,
+            version=version,
         )
 
     async def download_admin_mbtiles(
@@ -215,12 +387,14 @@ class DatasetServerClient:
         destination: Path,
         *,
         headers: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
     ) -> int:
         return await self._stream_to_file(
             "GET",
             f"/admin/datasets/{dataset_id}/files/{file_id}/mbtiles/raw",
             destination,
             headers=headers,
+            version=version,
         )
 
     async def download_public_file(
@@ -230,12 +404,15 @@ class DatasetServerClient:
         destination: Path,
         *,
         headers: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
     ) -> int:
         return await self._stream_to_file(
             "GET",
             f"/datasets/public/{dataset_id}/files/{file_id}/raw",
             destination,
             headers=headers,
+            version=version,
+            public=True,
         )
 
     async def download_public_mbtiles(
@@ -245,13 +422,16 @@ class DatasetServerClient:
         destination: Path,
         *,
         headers: Optional[Dict[str, str]] = None,
+        version: Optional[str] = None,
     ) -> int:
         return await self._stream_to_file(
             "GET",
             f"/datasets/public/{dataset_id}/files/{file_id}/mbtiles/raw",
             destination,
             headers=headers,
+            version=version,
+            public=True,
         )
 
 
-__all__ = ["DatasetServerClient"]
+__all__ = ["DatasetServerClient", "build_http_client"]
@@ -3,10 +3,10 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Union
 
 
-def _parse_max_download_bytes(raw: Optional[str]) -> Optional[int]:
+def _parse_megabytes(raw: Optional[str]) -> Optional[int]:
     if raw is None:
         return None
     try:
@@ -18,6 +18,56 @@ def _parse_max_download_bytes(raw: Optional[str]) -> Optional[int]:
     return int(value * 1024 * 1024)
 
 
+def _parse_megapixels(raw: Optional[str]) -> Optional[int]:
+    if raw is None:
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None
+    if value <= 0:
+        return None
+    return int(value * 1_000_000)
+
+
+def _parse_optional_int(raw: Optional[str]) -> Optional[int]:
+    if raw is None or not raw.strip():
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+def _parse_padding(raw: Optional[str]) -> Optional[float]:
+    """AOI padding factor; empty, 'none' or a negative value means "read the whole level"."""
+
+    if raw is None or not raw.strip() or raw.strip().lower() == "none":
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None
+    return value if value >= 0 else None
+
+
+def _parse_band_selection(raw: Optional[str]) -> Union[None, int, Tuple[float, ...]]:
+    """Gray conversion: empty/'mean' averages all bands, '2' reads band 2 only, and
+    '0.299,0.587,0.114' weights the bands (luminance)."""
+
+    if raw is None or not raw.strip() or raw.strip().lower() == "mean":
+        return None
+    items = [item.strip() for item in raw.split(",") if item.strip()]
+    try:
+        if len(items) == 1 and "." not in items[0]:
+            band = int(items[0])
+            return band if band >= 1 else None
+        weights = tuple(float(item) for item in items)
+    except ValueError:
+        return None
+    return weights if any(weights) else None
+
+
 def _parse_cors_origins(raw: Optional[str]) -> Tuple[str, ...]:
     if not raw:
         return tuple()
@@ -29,17 +79,61 @@ def _parse_cors_origins(raw: Optional[str]) -> Tuple[str, ...]:
 class ServiceConfig:
     server_base_url: str = field(default_factory=lambda: os.getenv("SERVER_API_BASE_URL", "http://localhost:3000/api"))
     request_timeout: float = field(default_factory=lambda: float(os.getenv("SERVER_REQUEST_TIMEOUT", "30")))
-    max_download_bytes: Optional[int] = field(default_factory=lambda: _parse_max_download_bytes(os.getenv("PATTERN_MAX_DOWNLOAD_MB")))
+    max_download_bytes: Optional[int] = field(default_factory=lambda: _parse_megabytes(os.getenv("PATTERN_MAX_DOWNLOAD_MB")))
     results_dir: Path = field(default_factory=lambda: Path(os.getenv("PATTERN_RESULTS_DIR", "pattern_outputs")).resolve())
+    # Kept apart from results_dir, which is served publicly under /results.
+    cache_dir: Path = field(default_factory=lambda: Path(os.getenv("PATTERN_CACHE_DIR", "pattern_cache")).resolve())
     cors_origins: Tuple[str, ...] = field(default_factory=lambda: _parse_cors_origins(os.getenv("PATTERN_CORS_ORIGINS")))
+    http_max_connections: int = field(default_factory=lambda: int(os.getenv("PATTERN_HTTP_MAX_CONNECTIONS", "100")))
+    http_max_keepalive: int = field(default_factory=lambda: int(os.getenv("PATTERN_HTTP_MAX_KEEPALIVE", "20")))
+    http_keepalive_expiry: float = field(default_factory=lambda: float(os.getenv("PATTERN_HTTP_KEEPALIVE_EXPIRY", "30")))
+    http2: bool = field(default_factory=lambda: os.getenv("PATTERN_HTTP2", "false").strip().lower() in ("1", "true", "yes", "on"))
     gdal_translate_timeout: float = field(default_factory=lambda: float(os.getenv("PATTERN_GDAL_TIMEOUT", "600")))
+    # Per-stage limits for the execute_search pipeline, and how many files may be in flight.
+    download_concurrency: int = field(default_factory=lambda: int(os.getenv("PATTERN_DOWNLOAD_CONCURRENCY", "2")))
+    convert_concurrency: int = field(default_factory=lambda: int(os.getenv("PATTERN_CONVERT_CONCURRENCY", "1")))
+    search_concurrency: int = field(default_factory=lambda: int(os.getenv("PATTERN_SEARCH_CONCURRENCY", "1")))
+    pipeline_depth: int = field(default_factory=lambda: int(os.getenv("PATTERN_PIPELINE_DEPTH", "3")))
+    # "thread" or "process"; the process pool sidesteps the GIL for concurrent searches.
+    executor: str = field(default_factory=lambda: os.getenv("PATTERN_EXECUTOR", "thread").strip().lower())
+    executor_workers: Optional[int] = field(default_factory=lambda: _parse_optional_int(os.getenv("PATTERN_EXECUTOR_WORKERS")))
+    # Rasters above this many pixels are streamed window by window instead of decoded whole.
+    # Off unless set: windowed detection can miss stars a whole-raster read finds.
+    stream_threshold_pixels: Optional[int] = field(default_factory=lambda: _parse_megapixels(os.getenv("PATTERN_STREAM_THRESHOLD_MP")))
+    raster_window_size: int = field(default_factory=lambda: int(os.getenv("PATTERN_WINDOW_SIZE", "4096")))
+    gray_bands: Union[None, int, Tuple[float, ...]] = field(default_factory=lambda: _parse_band_selection(os.getenv("PATTERN_GRAY_BANDS")))
+    # Log wall time and peak RSS of every search stage (open/load/equalize/blobs/filter/match/...).
+    profile_stages: bool = field(default_factory=lambda: os.getenv("PATTERN_PROFILE_STAGES", "false").strip().lower() in ("1", "true", "yes", "on"))
+    catalog_cache_max_bytes: Optional[int] = field(default_factory=lambda: _parse_megabytes(os.getenv("PATTERN_CATALOG_CACHE_MB", "512")))
+    # Equalized images + raw blobs, so filter-threshold tweaks skip CLAHE and blob finding.
+    stage_cache_max_bytes: Optional[int] = field(default_factory=lambda: _parse_megabytes(os.getenv("PATTERN_STAGE_CACHE_MB", "2048")))
+    asset_cache_max_bytes: Optional[int] = field(default_factory=lambda: _parse_megabytes(os.getenv("PATTERN_ASSET_CACHE_MB", "8192")))
+    conversion_cache_max_bytes: Optional[int] = field(default_factory=lambda: _parse_megabytes(os.getenv("PATTERN_CONVERSION_CACHE_MB", "4096")))
+    # "native" decodes MBTiles in-process, "gdal" converts them with gdal_translate.
+    mbtiles_reader: str = field(default_factory=lambda: os.getenv("PATTERN_MBTILES_READER", "native").strip().lower())
+    mbtiles_zoom: Optional[int] = field(default_factory=lambda: _parse_optional_int(os.getenv("PATTERN_MBTILES_ZOOM")))
+    mbtiles_aoi_padding: Optional[float] = field(default_factory=lambda: _parse_padding(os.getenv("PATTERN_MBTILES_AOI_PADDING", "1.0")))
     superpoint_onnx_path: Optional[Path] = None
 
     def __post_init__(self) -> None:
         self.server_base_url = self.server_base_url.rstrip("/")
         if self.request_timeout <= 0:
             self.request_timeout = 30.0
+        if self.http_max_connections < 1:
+            self.http_max_connections = 100
+        self.http_max_keepalive = max(0, min(self.http_max_keepalive, self.http_max_connections))
+        self.download_concurrency = max(1, self.download_concurrency)
+        self.convert_concurrency = max(1, self.convert_concurrency)
+        self.search_concurrency = max(1, self.search_concurrency)
+        self.pipeline_depth = max(1, self.pipeline_depth)
+        if self.executor not in ("thread", "process"):
+            self.executor = "thread"
+        if self.mbtiles_reader not in ("native", "gdal"):
+            self.mbtiles_reader = "native"
+        if self.raster_window_size < 256:
+            self.raster_window_size = 256
         self.results_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
         # Default SuperPoint path: <repo-root>/pattern-finder-service/models/superpoint_lightglue_pipeline.onnx
         try:
             base = Path(__file__).resolve().parents[1]
@@ -13,6 +13,12 @@ from .search import (
     AssetPreference,
     LinePoint,
     SearchDatasetRequest,
+    Equalization,
+    MatchEngine,
+    MatchVerifier,
+    SearchMode,
+    StarDetector,
+    SearchMatchItem,
     SearchResultItem,
     SearchRunResponse,
     StarDetectionParams,
@@ -31,6 +37,12 @@ __all__ = [
     "DatasetVisibility",
     "LinePoint",
     "SearchDatasetRequest",
+    "Equalization",
+    "MatchEngine",
+    "MatchVerifier",
+    "SearchMode",
+    "StarDetector",
+    "SearchMatchItem",
     "SearchResultItem",
     "SearchRunResponse",
     "StarDetectionParams",
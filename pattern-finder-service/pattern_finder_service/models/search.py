@@ -16,6 +16,32 @@ class AssetPreference(str, Enum):
     ORIGINAL = "original"
 
 
+class SearchMode(str, Enum):
+    FULL = "full"
+    COARSE_TO_FINE = "coarse_to_fine"
+
+
+class StarDetector(str, Enum):
+    LOG = "log"
+    DOG = "dog"
+
+
+class Equalization(str, Enum):
+    SKIMAGE = "skimage"
+    OPENCV = "opencv"
+    NONE = "none"
+
+
+class MatchEngine(str, Enum):
+    RANSAC = "ransac"
+    TRIANGLES = "triangles"
+
+
+class MatchVerifier(str, Enum):
+    KDTREE = "kdtree"
+    GRID = "grid"
+
+
 class LinePoint(CamelModel):
     x: float
     y: float
@@ -25,11 +51,108 @@ class LinePoint(CamelModel):
 
 
 class StarDetectionParams(CamelModel):
-    min_sigma: float = Field(default=1.0, ge=0.1, description="Minimum sigma for LoG detector")
-    max_sigma: float = Field(default=4.0, ge=0.1, description="Maximum sigma for LoG detector")
-    num_sigma: int = Field(default=10, ge=1, description="Number of sigma steps")
+    min_sigma: float = Field(default=1.0, alias="minSigma", ge=0.1, description="Minimum sigma for LoG detector")
+    max_sigma: float = Field(default=4.0, alias="maxSigma", ge=0.1, description="Maximum sigma for LoG detector")
+    num_sigma: int = Field(default=10, alias="numSigma", ge=1, description="Number of sigma steps")
     threshold: float = Field(default=0.02, ge=0.0, description="Detector intensity threshold")
-    log_scale: bool = Field(default=False, description="Use logarithmic scale between sigmas")
+    log_scale: bool = Field(default=False, alias="logScale", description="Use logarithmic scale between sigmas")
+    detector: StarDetector = Field(
+        default=StarDetector.LOG,
+        description="Scale-space backend: 'log' (Laplacian of Gaussian) or 'dog' (faster difference of Gaussians)",
+    )
+    equalization: Equalization = Field(
+        default=Equalization.SKIMAGE,
+        description="Contrast equalization before detection: 'skimage' CLAHE, 'opencv' 16-bit CLAHE (faster) or 'none'",
+    )
+    tile_size: int = Field(
+        default=0, alias="tileSize", ge=0, description="Detect in overlapping tiles of this size in parallel (0 = single pass)"
+    )
+    tile_workers: int = Field(
+        default=0, alias="tileWorkers", ge=0, description="Threads for tiled detection (0 = one per CPU)"
+    )
+    min_prominence: float = Field(
+        default=0.08,
+        alias="minProminence",
+        ge=0.0,
+        description="Minimum peak height above the surrounding halo and background (normalized intensity)",
+    )
+    min_center_value: float = Field(
+        default=0.14,
+        alias="minCenterValue",
+        ge=0.0,
+        le=1.0,
+        description="Minimum normalized intensity at the star centre",
+    )
+    axis_ratio_limit: float = Field(
+        default=0.1,
+        alias="axisRatioLimit",
+        ge=0.0,
+        le=1.0,
+        description="Minimum minor/major axis ratio of a star; lower values admit more elongated blobs",
+    )
+    max_stars: int = Field(
+        default=0, alias="maxStars", ge=0, description="Keep only this many of the most prominent stars (0 = all)"
+    )
+    match_seed_stars: int = Field(
+        default=0,
+        alias="matchSeedStars",
+        ge=0,
+        description="Draw match hypotheses from this many brightest stars first, widening as needed (0 = all stars)",
+    )
+    skip_background: bool = Field(
+        default=False,
+        alias="skipBackground",
+        description="Skip flat background and nodata regions found by a cheap block pre-pass",
+    )
+    background_block: int = Field(
+        default=64, alias="backgroundBlock", ge=8, description="Block size in pixels of the background pre-pass"
+    )
+    background_nsigma: float = Field(
+        default=5.0,
+        alias="backgroundNsigma",
+        gt=0.0,
+        description="Peak-above-median threshold, in noise levels, for a block to be searched",
+    )
+    match_engine: MatchEngine = Field(
+        default=MatchEngine.RANSAC,
+        alias="matchEngine",
+        description="Match hypotheses from 'ransac' random draws or a 'triangles' similarity-invariant index",
+    )
+    match_seed: int = Field(
+        default=0, alias="matchSeed", ge=0, description="Seed of the match sampler; equal seeds give equal results"
+    )
+    match_confidence: float = Field(
+        default=0.99,
+        alias="matchConfidence",
+        gt=0.0,
+        lt=1.0,
+        description="Stop sampling once a correct hypothesis would have been drawn with this probability",
+    )
+    match_max_iterations: int = Field(
+        default=1000,
+        alias="matchMaxIterations",
+        ge=1,
+        le=1_000_000,
+        description="Hard cap on match hypotheses per sampling pool",
+    )
+    match_max_matches: int = Field(
+        default=1,
+        alias="matchMaxMatches",
+        ge=1,
+        le=100,
+        description="Report up to this many non-overlapping occurrences of the pattern",
+    )
+    match_verifier: MatchVerifier = Field(
+        default=MatchVerifier.KDTREE,
+        alias="matchVerifier",
+        description="Verify match hypotheses with 'kdtree' queries or 'grid' lookups in a nearest-star table",
+    )
+    match_grid_cell: float = Field(
+        default=0.0,
+        alias="matchGridCell",
+        ge=0.0,
+        description="Cell size in pixels of the 'grid' verifier (0 = twice the tolerance); larger cells use less memory",
+    )
 
 
 class SearchDatasetRequest(CamelModel):
@@ -41,6 +164,20 @@ class SearchDatasetRequest(CamelModel):
     score_threshold: float = Field(default=0.05, alias="scoreThreshold", ge=0.0)
     generate_previews: bool = Field(default=True, alias="generatePreviews")
     asset_preference: AssetPreference = Field(default=AssetPreference.AUTO, alias="assetPreference")
+    search_mode: SearchMode = Field(default=SearchMode.FULL, alias="searchMode")
+    pyramid_levels: int = Field(
+        default=2,
+        alias="pyramidLevels",
+        ge=1,
+        le=6,
+        description="Overview depth for coarse_to_fine search; the coarse level is 2**pyramidLevels times smaller",
+    )
+
+
+class SearchMatchItem(CamelModel):
+    score: float
+    transform: Optional[List[List[float]]] = None
+    matched_points_image: Optional[List[List[float]]] = Field(default=None, alias="matchedPointsImage")
 
 
 class SearchResultItem(CamelModel):
@@ -56,7 +193,11 @@ class SearchResultItem(CamelModel):
     preview_url: Optional[str] = Field(default=None, alias="previewUrl")
     stars_path: Optional[str] = Field(default=None, alias="starsPath")
     stars_url: Optional[str] = Field(default=None, alias="starsUrl")
+    # "full" catalog, or only the coarse-to-fine refinement "windows" / "coarse" overview stars.
+    stars_scope: str = Field(default="full", alias="starsScope")
     geojson: Optional[dict] = None
+    # Every occurrence found, best first (the fields above describe the best one).
+    matches: List[SearchMatchItem] = Field(default_factory=list)
     message: Optional[str] = None
 
 
@@ -83,7 +224,9 @@ __all__ = [
     "AssetPreference",
     "LinePoint",
     "SearchDatasetRequest",
+    "SearchMatchItem",
     "SearchResultItem",
+    "SearchMode",
     "SearchRunResponse",
     "StarDetectionParams",
     "DatasetFileStatus",
@@ -1,9 +1,11 @@
 from .pattern_core import (
     MatchResult,
+    MatchStats,
     Pattern,
     PatternFinderResult,
     PatternMatch,
     StarDetectionParams,
+    WindowedRaster,
     build_pattern,
     detect_stars,
     draw_debug_image,
@@ -17,6 +19,11 @@ from .pattern_core import (
     visualize_match,
     visualize_stars,
 )
+from .mbtiles import MBTilesReader, open_mbtiles_context, read_mbtiles_region
+from .star_catalog import StarCatalogCache, get_catalog_cache
+from .conversion_cache import ConversionCache, get_conversion_cache
+from .executor import SearchExecutor, get_executor
+from .profiling import StageProfiler, stage
 from .pattern_runner import (
     convert_mbtiles_to_geotiff,
     download_dataset_asset,
@@ -27,6 +34,7 @@ from .pattern_runner import (
 
 __all__ = [
     "MatchResult",
+    "MatchStats",
     "Pattern",
     "PatternFinderResult",
     "PatternMatch",
@@ -44,8 +52,20 @@ __all__ = [
     "load_tif_grayscale",
     "resolve_asset_source",
     "sanitize_filename",
+    "StarCatalogCache",
+    "get_catalog_cache",
+    "ConversionCache",
+    "get_conversion_cache",
+    "SearchExecutor",
+    "get_executor",
+    "StageProfiler",
+    "stage",
+    "MBTilesReader",
+    "open_mbtiles_context",
+    "read_mbtiles_region",
     "search_in_image",
     "match_pattern",
     "visualize_match",
     "visualize_stars",
+    "WindowedRaster",
 ]
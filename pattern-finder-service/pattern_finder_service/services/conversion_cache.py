@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from .. import logger
+from ..cache import DiskCache, file_digest, hash_key
+from .pattern_core import ensure_overviews
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..config import ServiceConfig
+
+# Part of every key; bump when the conversion command changes its output.
+CONVERSION_FORMAT = "gdal_translate:gtiff:v1"
+
+Converter = Callable[[Path, Path], Awaitable[Path]]
+
+
+class ConversionCache:
+    """Content-addressed store of MBTiles → GeoTIFF conversions.
+
+    Entries are keyed by the SHA-256 of the source file, so re-downloads of an unchanged
+    asset reuse the earlier conversion. Concurrent requests for the same key share one
+    in-flight conversion instead of each running their own. Every path handed out is
+    leased, so eviction by another search cannot delete it before it has been read.
+
+    Overviews for coarse-to-fine searches are an ``.ovr`` sidecar of the entry, built in the
+    same in-flight step as the conversion (or, for an entry converted without them, in one
+    of its own) and published whole, so searches only ever read them.
+    """
+
+    def __init__(self, root: Path, max_bytes: Optional[int]) -> None:
+        self._store = DiskCache(root, max_bytes, suffix=".tif")
+        self._inflight: Dict[str, "asyncio.Future[Path]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    @property
+    def root(self) -> Path:
+        return self._store.root
+
+    @asynccontextmanager
+    async def leased(self, source: Path, converter: Converter, *, overview_levels: int = 0) -> AsyncIterator[Path]:
+        """:meth:`convert` ``source`` and keep the conversion from eviction while in the block."""
+
+        path = await self.convert(source, converter, overview_levels=overview_levels)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def release(self, path: Path) -> None:
+        self._store.release(path)
+
+    async def convert(self, source: Path, converter: Converter, *, overview_levels: int = 0) -> Path:
+        """Return the cached conversion of ``source``, running ``converter(source, target)`` once if missing.
+
+        With ``overview_levels`` the entry also gets that many overview levels. The returned
+        entry is leased; pass it to :meth:`release` once it is no longer read.
+        """
+
+        digest = await asyncio.to_thread(file_digest, source)
+        key = hash_key(CONVERSION_FORMAT, digest)
+
+        waited = False
+        while True:
+            cached = self._store.acquire(key)
+            if cached is not None and (not overview_levels or _has_overviews(cached)):
+                if not waited:
+                    self.hits += 1
+                    logger.info("Conversion cache hit", {"source": str(source), "path": str(cached)})
+                return cached
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            if cached is not None:
+                self._store.release(cached)
+            self.shared += 1
+            waited = True
+            logger.info("Waiting for in-flight conversion", {"source": str(source)})
+            # The converting search holds its own lease; take ours from the store. Should the
+            # entry already be gone again, convert it anew.
+            await asyncio.shield(pending)
+
+        future: "asyncio.Future[Path]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            if cached is not None:
+                logger.info("Building overviews for cached conversion", {"source": str(source), "path": str(cached)})
+                path = await self._add_overviews(key, cached, overview_levels)
+            else:
+                self.misses += 1
+                path = await self._convert_into_store(key, source, converter, overview_levels)
+        except BaseException as exc:
+            if cached is not None:
+                self._store.release(cached)
+            future.set_exception(exc)
+            # Mark the exception as retrieved in case nobody else was waiting.
+            future.exception()
+            raise
+        else:
+            future.set_result(path)
+            return path
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _convert_into_store(self, key: str, source: Path, converter: Converter, overview_levels: int) -> Path:
+        tmp_path = self._store.reserve(key)
+        try:
+            produced = await converter(source, tmp_path)
+            if overview_levels:
+                await asyncio.to_thread(ensure_overviews, produced, overview_levels)
+        except BaseException:
+            self._store.abandon(tmp_path)
+            raise
+        return await asyncio.to_thread(self._store.commit, key, produced, lease=True)
+
+    async def _add_overviews(self, key: str, path: Path, overview_levels: int) -> Path:
+        """Build the missing ``.ovr`` of the published ``path`` off to the side, then publish it."""
+
+        def _build() -> None:
+            tmp_path = self._store.reserve(key)
+            try:
+                # The overviews land next to a second name of the file, so searches reading
+                # ``path`` meanwhile never see a half-written sidecar.
+                tmp_path.unlink()
+                try:
+                    os.link(path, tmp_path)
+                except OSError:
+                    shutil.copyfile(path, tmp_path)
+                ensure_overviews(tmp_path, overview_levels)
+                self._store.commit_sidecars(key, tmp_path)
+            finally:
+                self._store.abandon(tmp_path)
+
+        await asyncio.to_thread(_build)
+        return path
+
+
+def _has_overviews(path: Path) -> bool:
+    return path.with_name(f"{path.name}.ovr").exists()
+
+
+_CACHES: Dict[Path, ConversionCache] = {}
+
+
+def get_conversion_cache(config: "ServiceConfig") -> Optional[ConversionCache]:
+    if not config.conversion_cache_max_bytes:
+        return None
+    root = config.cache_dir / "conversions"
+    cache = _CACHES.get(root)
+    if cache is None:
+        cache = ConversionCache(root, config.conversion_cache_max_bytes)
+        _CACHES[root] = cache
+    return cache
+
+
+__all__ = ["CONVERSION_FORMAT", "ConversionCache", "get_conversion_cache"]
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from .. import logger
+from ..config import ServiceConfig
+
+T = TypeVar("T")
+
+
+def _warm_worker() -> None:
+    """Process-pool initializer: pay the heavy imports once per worker, not per job."""
+
+    import cv2  # noqa: F401
+    import numpy as np
+    import rasterio  # noqa: F401
+    from skimage.exposure import equalize_adapthist
+    from skimage.feature import blob_log
+
+    from . import pattern_core  # noqa: F401
+
+    # Touch the compiled paths once so the first real job does not pay for lazy setup.
+    sample = np.zeros((32, 32), dtype=np.float32)
+    sample[16, 16] = 1.0
+    blob_log(equalize_adapthist(sample), min_sigma=1.0, max_sigma=2.0, num_sigma=2, threshold=0.1)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class SearchExecutor:
+    """Runs the CPU-bound part of a search off the event loop.
+
+    ``"thread"`` uses a thread pool, which is cheap but shares the GIL with the Python-level
+    detection, matching and drawing loops. ``"process"`` uses a pool of spawned worker
+    processes that import cv2/rasterio/skimage up front. Jobs are plain functions whose
+    arguments are file paths and request models rather than pixel arrays; each worker opens
+    the raster itself, so only small results cross the process boundary.
+    """
+
+    def __init__(self, kind: str = "thread", workers: Optional[int] = None) -> None:
+        self.kind = kind if kind in ("thread", "process") else "thread"
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self._pool: Optional[Executor] = None
+
+    @classmethod
+    def from_config(cls, config: ServiceConfig) -> "SearchExecutor":
+        return cls(config.executor, config.executor_workers)
+
+    def _ensure_pool(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_worker,
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pattern-search")
+        return self._pool
+
+    async def start(self) -> None:
+        """Create the pool and, for processes, wait until every worker has warmed up."""
+
+        pool = self._ensure_pool()
+        if self.kind != "process":
+            return
+        loop = asyncio.get_running_loop()
+        # Each submission forces another worker to spawn until the pool is full.
+        pids = await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+        logger.info("Search executor ready", {"kind": self.kind, "workers": self.workers, "pids": len(set(pids))})
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._ensure_pool(), partial(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+_EXECUTORS: Dict[str, SearchExecutor] = {}
+
+
+def get_executor(config: ServiceConfig) -> SearchExecutor:
+    key = f"{config.executor}:{config.executor_workers}"
+    executor = _EXECUTORS.get(key)
+    if executor is None:
+        executor = SearchExecutor.from_config(config)
+        _EXECUTORS[key] = executor
+    return executor
+
+
+__all__ = ["SearchExecutor", "get_executor"]
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import logging
+import math
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+from rasterio.transform import Affine
+from rasterio.warp import transform as rio_transform
+
+from .pattern_core import RasterContext
+
+
+logger = logging.getLogger(__name__)
+
+# Half the width of the EPSG:3857 world square, in metres.
+WEB_MERCATOR_HALF = 20037508.342789244
+MBTILES_CRS = "EPSG:3857"
+
+
+@dataclass
+class TileRange:
+    """Inclusive XYZ tile range (rows counted from the top, unlike the TMS rows in the file)."""
+
+    zoom: int
+    col_min: int
+    col_max: int
+    row_min: int
+    row_max: int
+
+    @property
+    def cols(self) -> int:
+        return self.col_max - self.col_min + 1
+
+    @property
+    def rows(self) -> int:
+        return self.row_max - self.row_min + 1
+
+
+@dataclass
+class MBTilesRegion:
+    """Grayscale mosaic of an MBTiles zoom level (or part of it) plus its georeferencing."""
+
+    image: np.ndarray
+    transform: Affine
+    crs: str
+    tiles: TileRange
+    tile_size: int
+
+    @property
+    def tag(self) -> str:
+        t = self.tiles
+        return f"z{t.zoom}:{t.col_min}-{t.col_max}:{t.row_min}-{t.row_max}"
+
+
+def _decode_tile_gray(blob: bytes) -> Optional[np.ndarray]:
+    decoded = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if decoded is None:
+        return None
+    if decoded.ndim == 2:
+        return decoded.astype(np.float32)
+    # Average the colour bands only; alpha marks coverage, not brightness.
+    return np.mean(decoded[:, :, :3], axis=2, dtype=np.float32)
+
+
+def _lonlat_to_tile(lon: float, lat: float, zoom: int) -> Tuple[float, float]:
+    """Fractional XYZ tile coordinates of a lon/lat position."""
+
+    x, y = rio_transform("EPSG:4326", MBTILES_CRS, [lon], [lat])
+    n = 2**zoom
+    span = 2 * WEB_MERCATOR_HALF
+    col = (x[0] + WEB_MERCATOR_HALF) / span * n
+    row = (WEB_MERCATOR_HALF - y[0]) / span * n
+    return col, row
+
+
+def looks_like_lonlat(points: Sequence[Tuple[float, float]]) -> bool:
+    if not points:
+        return False
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return -180.0 <= min(xs) <= max(xs) <= 180.0 and -90.0 <= min(ys) <= max(ys) <= 90.0
+
+
+class MBTilesReader:
+    """Read-only access to the raster tiles of an MBTiles (SQLite) file."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "MBTilesReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def metadata(self) -> Dict[str, str]:
+        try:
+            rows = self._conn.execute("SELECT name, value FROM metadata").fetchall()
+        except sqlite3.DatabaseError:
+            return {}
+        return {str(name): str(value) for name, value in rows}
+
+    def max_zoom(self) -> int:
+        row = self._conn.execute("SELECT MAX(zoom_level) FROM tiles").fetchone()
+        if row is None or row[0] is None:
+            raise ValueError(f"MBTiles file {self.path} contains no tiles")
+        return int(row[0])
+
+    def level_range(self, zoom: int) -> TileRange:
+        row = self._conn.execute(
+            "SELECT MIN(tile_column), MAX(tile_column), MIN(tile_row), MAX(tile_row) FROM tiles WHERE zoom_level = ?",
+            (zoom,),
+        ).fetchone()
+        if row is None or row[0] is None:
+            raise ValueError(f"MBTiles file {self.path} has no tiles at zoom {zoom}")
+        col_min, col_max, tms_min, tms_max = (int(v) for v in row)
+        flip = 2**zoom - 1
+        return TileRange(zoom, col_min, col_max, flip - tms_max, flip - tms_min)
+
+    def range_for_points(
+        self,
+        points_lonlat: Sequence[Tuple[float, float]],
+        zoom: int,
+        padding: float,
+    ) -> TileRange:
+        """Tiles covering the points' bounding box, grown by ``padding`` times its size per side."""
+
+        level = self.level_range(zoom)
+        cols, rows = zip(*(_lonlat_to_tile(lon, lat, zoom) for lon, lat in points_lonlat))
+        pad_cols = (max(cols) - min(cols)) * padding
+        pad_rows = (max(rows) - min(rows)) * padding
+        return TileRange(
+            zoom,
+            max(level.col_min, int(math.floor(min(cols) - pad_cols))),
+            min(level.col_max, int(math.floor(max(cols) + pad_cols))),
+            max(level.row_min, int(math.floor(min(rows) - pad_rows))),
+            min(level.row_max, int(math.floor(max(rows) + pad_rows))),
+        )
+
+    def read_region(self, tiles: TileRange) -> MBTilesRegion:
+        """Decode the tiles in ``tiles`` straight into one float32 grayscale mosaic."""
+
+        flip = 2**tiles.zoom - 1
+        cursor = self._conn.execute(
+            "SELECT tile_column, tile_row, tile_data FROM tiles "
+            "WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?",
+            (tiles.zoom, tiles.col_min, tiles.col_max, flip - tiles.row_max, flip - tiles.row_min),
+        )
+
+        image: Optional[np.ndarray] = None
+        tile_size = 0
+        decoded_count = 0
+        for col, tms_row, blob in cursor:
+            gray = _decode_tile_gray(blob)
+            if gray is None:
+                logger.warning("Skipping undecodable tile z=%s x=%s y=%s", tiles.zoom, col, tms_row)
+                continue
+            if image is None:
+                tile_size = gray.shape[0]
+                image = np.zeros((tiles.rows * tile_size, tiles.cols * tile_size), dtype=np.float32)
+            if gray.shape != (tile_size, tile_size):
+                gray = cv2.resize(gray, (tile_size, tile_size), interpolation=cv2.INTER_AREA)
+            y0 = ((flip - int(tms_row)) - tiles.row_min) * tile_size
+            x0 = (int(col) - tiles.col_min) * tile_size
+            image[y0 : y0 + tile_size, x0 : x0 + tile_size] = gray
+            decoded_count += 1
+
+        if image is None:
+            raise ValueError(f"No decodable tiles in {self.path} for {tiles}")
+
+        resolution = 2 * WEB_MERCATOR_HALF / (tile_size * 2**tiles.zoom)
+        origin_x = -WEB_MERCATOR_HALF + tiles.col_min * tile_size * resolution
+        origin_y = WEB_MERCATOR_HALF - tiles.row_min * tile_size * resolution
+        transform = Affine(resolution, 0.0, origin_x, 0.0, -resolution, origin_y)
+        logger.info(
+            "Decoded %d MBTiles tiles (%dx%d px) from %s",
+            decoded_count,
+            image.shape[1],
+            image.shape[0],
+            self.path,
+        )
+        return MBTilesRegion(image=image, transform=transform, crs=MBTILES_CRS, tiles=tiles, tile_size=tile_size)
+
+
+def read_mbtiles_region(
+    path: Union[str, Path],
+    *,
+    line_points: Optional[Sequence[Tuple[float, float]]] = None,
+    zoom: Optional[int] = None,
+    padding: Optional[float] = 1.0,
+) -> MBTilesRegion:
+    """Decode the tiles of one zoom level covering the pattern's area of interest.
+
+    ``zoom`` defaults to the deepest level in the file. When ``line_points`` are lon/lat
+    and ``padding`` is not ``None``, only the tiles around their bounding box are read;
+    otherwise the whole level is assembled, as ``gdal_translate`` would.
+    """
+
+    with MBTilesReader(path) as reader:
+        level = zoom if zoom is not None else reader.max_zoom()
+        if line_points and padding is not None and looks_like_lonlat(line_points):
+            tiles = reader.range_for_points(line_points, level, padding)
+        else:
+            tiles = reader.level_range(level)
+        return reader.read_region(tiles)
+
+
+def open_mbtiles_context(
+    path: Union[str, Path],
+    *,
+    line_points: Optional[Sequence[Tuple[float, float]]] = None,
+    zoom: Optional[int] = None,
+    padding: Optional[float] = 1.0,
+    name: Optional[str] = None,
+    window_size: int = 4096,
+) -> RasterContext:
+    region = read_mbtiles_region(path, line_points=line_points, zoom=zoom, padding=padding)
+    return RasterContext.from_array(
+        region.image,
+        region.transform,
+        region.crs,
+        name=name or Path(path).stem,
+        cache_tag=f"mbtiles:{region.tag}",
+        window_size=window_size,
+    )
+
+
+__all__ = [
+    "MBTilesReader",
+    "MBTilesRegion",
+    "TileRange",
+    "open_mbtiles_context",
+    "read_mbtiles_region",
+]
@@ -1,19 +1,33 @@
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import itertools
+import math
+import time
 
 import cv2
 import numpy as np
 import rasterio
-from rasterio.transform import Affine
+from rasterio.enums import MaskFlags, Resampling
+from rasterio.io import MemoryFile
+from rasterio.transform import Affine, TransformMethodsMixin
+from rasterio.windows import Window, WindowMethodsMixin
 from scipy.spatial import KDTree
 from skimage.exposure import equalize_adapthist
 from skimage.feature import blob_log
 
+from .profiling import stage
+from .star_catalog import StarCatalogCache
+from .star_grid import StarGrid
+from .triangle_index import TriangleIndex
+
 try:  # Optional helpers for parsing string based line strings
     from shapely.geometry import LineString  # type: ignore
     from shapely import wkt as shapely_wkt  # type: ignore
@@ -21,10 +35,25 @@ except Exception:  # pragma: no cover - shapely is optional at runtime
     LineString = None
     shapely_wkt = None
 
+try:  # rasterio >= 1.3: a MEM dataset reading straight from a NumPy array
+    from rasterio._io import MemoryDataset as _MemoryDataset  # type: ignore[attr-defined]
+except ImportError:  # pragma: no cover - older rasterio copies the array into a MemoryFile
+    _MemoryDataset = None
+
 
 logger = logging.getLogger(__name__)
 
 
+# Longest side of preview canvases rendered from a WindowedRaster.
+PREVIEW_MAX_SIDE = 8192
+# Coarse-to-fine search never decimates below this many pixels on the short side.
+COARSE_MIN_SIDE = 256
+# How multi-band rasters become gray: ``None`` averages every band, an ``int`` reads only
+# that (1-based) band, and a sequence gives one weight per band (e.g. luminance
+# ``(0.299, 0.587, 0.114)``); bands weighted zero are never read.
+BandSelection = Union[None, int, Sequence[float]]
+
+
 @dataclass
 class StarDetectionParams:
     """Tweaks for the LoG based star detection pipeline."""
@@ -38,6 +67,39 @@ class StarDetectionParams:
     min_center_value: float = 0.14
     axis_ratio_limit: float = 0.1
     tolerance_px: float = 500.5
+    # Scale-space backend: "log" (skimage blob_log) or "dog" (float32 difference of Gaussians).
+    detector: str = "log"
+    # Contrast equalization before detection: "skimage", "opencv" (16-bit CLAHE) or "none".
+    equalization: str = "skimage"
+    # Tile-parallel detection: tile side in pixels (0 = single pass) and worker threads
+    # (0 = one per CPU). Tiles overlap by the detection halo; seams are deduplicated.
+    tile_size: int = 0
+    tile_workers: int = 0
+    # Star budget: keep only the ``max_stars`` most prominent stars (0 = keep all).
+    max_stars: int = 0
+    # Hierarchical matching: draw RANSAC hypotheses from the ``match_seed_stars`` most
+    # prominent stars first, widening the pool until a match is found (0 = all stars).
+    match_seed_stars: int = 0
+    # Background pre-pass: only run the detector on tiles with a ``background_block`` block
+    # whose peak stands ``background_nsigma`` noise levels above its median and that holds
+    # valid (non-nodata) pixels. Flat sky and nodata borders are then skipped outright.
+    skip_background: bool = False
+    background_block: int = 64
+    background_nsigma: float = 5.0
+    # Hypothesis source for matching: "ransac" (random draws) or "triangles" (indexed
+    # lookup of similar catalog triangles, see ``triangle_index``).
+    match_engine: str = "ransac"
+    # RANSAC sampling: generator seed (searches are reproducible), the confidence of the
+    # adaptive stopping rule and the hard cap on hypotheses per pool.
+    match_seed: int = 0
+    match_confidence: float = 0.99
+    match_max_iterations: int = 1000
+    # Report up to this many non-overlapping occurrences of the pattern (best first).
+    match_max_matches: int = 1
+    # Hypothesis verification: "kdtree" queries or "grid" lookups in a nearest-star table of
+    # ``match_grid_cell``-pixel cells (0 = twice the tolerance; larger cells, less memory).
+    match_verifier: str = "kdtree"
+    match_grid_cell: float = 0.0
 
 
 @dataclass
@@ -48,6 +110,8 @@ class PatternMatch:
     matched_indices: List[int]
     points: np.ndarray
     score: float
+    # Pattern point behind each entry of ``matched_indices`` (a partial match skips some).
+    pattern_indices: Optional[List[int]] = None
 
 
 @dataclass
@@ -86,27 +150,30 @@ class MatchResult:
     matches: List[PatternMatch] = field(default_factory=list)
     stars_xy: Optional[np.ndarray] = None
     image_path: Optional[str] = None
+    # Peak height above the local background of each star in ``stars_xy``.
+    star_prominence: Optional[np.ndarray] = None
+    match_stats: Optional[MatchStats] = None
+    # Pattern (x, y) -> image (x, y) transform of each entry of ``matches``.
+    match_transforms: List[Optional[np.ndarray]] = field(default_factory=list)
+    # What ``stars_xy`` covers: "full" (the whole image at full resolution), "windows" (only
+    # the coarse-to-fine refinement windows) or "coarse" (the decimated overview's stars).
+    stars_scope: str = "full"
 
     def best_match(self) -> Optional[PatternMatch]:
         return self.matches[0] if self.matches else None
 
 
-def load_tif_grayscale(path: Union[str, Path]) -> Tuple[np.ndarray, Affine]:
-    """Load a TIFF/GeoTIFF image and return a normalized grayscale array plus the affine transform."""
+def load_tif_grayscale(path: Union[str, Path], bands: BandSelection = None) -> Tuple[np.ndarray, Affine]:
+    """Load a TIFF/GeoTIFF image and return a normalized grayscale array plus the affine transform.
+
+    ``bands`` selects how the bands are combined into gray (see :data:`BandSelection`).
+    """
 
     path = Path(path)
     with rasterio.open(path) as src:
-        data = src.read(out_dtype=np.float32)
+        gray = _read_gray_bands(src, bands)
         transform = src.transform
 
-    if data.ndim == 3:
-        if data.shape[0] == 1:
-            gray = data[0]
-        else:
-            gray = np.mean(data, axis=0)
-    else:
-        gray = data.astype(np.float32)
-
     gray -= float(np.min(gray))
     peak = float(np.max(gray))
     if peak > 0:
@@ -114,6 +181,369 @@ def load_tif_grayscale(path: Union[str, Path]) -> Tuple[np.ndarray, Affine]:
     return gray, transform
 
 
+def _band_weights(count: int, bands: BandSelection) -> List[Tuple[int, float]]:
+    if bands is None:
+        return [(index, 1.0) for index in range(1, count + 1)]
+    if isinstance(bands, (int, np.integer)):
+        if not 1 <= int(bands) <= count:
+            raise ValueError(f"Band {bands} out of range for a {count}-band raster")
+        return [(int(bands), 1.0)]
+    weights = [float(weight) for weight in bands]
+    if len(weights) != count:
+        raise ValueError(f"Got {len(weights)} band weights for a {count}-band raster")
+    selected = [(index, weight) for index, weight in enumerate(weights, start=1) if weight != 0.0]
+    if not selected:
+        raise ValueError("Band weights are all zero")
+    return selected
+
+
+def band_selection_tag(bands: BandSelection) -> Optional[str]:
+    """Stable text form of a band selection for cache keys (``None`` for the default mean)."""
+
+    if bands is None:
+        return None
+    if isinstance(bands, (int, np.integer)):
+        return f"band{int(bands)}"
+    return "w" + ",".join(f"{float(weight):g}" for weight in bands)
+
+
+def _read_gray_bands(
+    dataset: rasterio.io.DatasetReader,
+    bands: BandSelection = None,
+    window: Optional[Window] = None,
+    out_shape: Optional[Tuple[int, int]] = None,
+) -> np.ndarray:
+    """Combine the selected bands into one float32 gray array, reading one band at a time.
+
+    At most two band-sized buffers are alive (the accumulator and a reused scratch band)
+    whatever the band count, instead of a ``(bands, rows, cols)`` stack. The default mean
+    adds the bands in order and divides once, which is bit-identical to ``np.mean``.
+    """
+
+    selected = _band_weights(dataset.count, bands)
+    kwargs: Dict[str, Any] = {"window": window, "out_dtype": np.float32}
+    if out_shape is not None:
+        kwargs["out_shape"] = out_shape
+        kwargs["resampling"] = Resampling.average
+    index, weight = selected[0]
+    gray = dataset.read(index, **kwargs)
+    if weight != 1.0:
+        gray *= np.float32(weight)
+    scratch: Optional[np.ndarray] = None
+    for index, weight in selected[1:]:
+        if scratch is None:
+            scratch = dataset.read(index, **kwargs)
+        else:
+            # ``out`` already fixes the (possibly resampled) shape.
+            dataset.read(index, out=scratch, **{k: v for k, v in kwargs.items() if k != "out_shape"})
+        if weight != 1.0:
+            scratch *= np.float32(weight)
+        gray += scratch
+    if bands is None and len(selected) > 1:
+        gray /= np.float32(len(selected))
+    return gray
+
+
+class WindowedRaster:
+    """Block-streaming grayscale reader for rasters too large to decode in one piece.
+
+    The global min/max is computed in a single pass over the blocks, after which every
+    window handed out is normalized exactly like ``load_tif_grayscale`` would normalize
+    the full image. Peak memory is bounded by ``window_size`` instead of the raster size.
+    ``bands`` selects how bands are combined into gray (see :data:`BandSelection`).
+    """
+
+    def __init__(
+        self,
+        dataset: rasterio.io.DatasetReader,
+        *,
+        window_size: int = 4096,
+        owns_dataset: bool = False,
+        bands: BandSelection = None,
+    ) -> None:
+        self.dataset = dataset
+        self.window_size = max(int(window_size), 256)
+        self.bands = bands
+        self._owns_dataset = owns_dataset
+        self._stats: Optional[Tuple[float, float]] = None
+
+    @classmethod
+    def open(
+        cls, path: Union[str, Path], *, window_size: int = 4096, bands: BandSelection = None
+    ) -> "WindowedRaster":
+        return cls(rasterio.open(Path(path)), window_size=window_size, owns_dataset=True, bands=bands)
+
+    def close(self) -> None:
+        if self._owns_dataset and not self.dataset.closed:
+            self.dataset.close()
+
+    def __enter__(self) -> "WindowedRaster":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def name(self) -> str:
+        return Path(self.dataset.name).stem
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.dataset.height, self.dataset.width
+
+    @property
+    def transform(self) -> Affine:
+        return self.dataset.transform
+
+    @property
+    def crs(self) -> Any:
+        return self.dataset.crs
+
+    def iter_windows(self, region: Optional[Window] = None, size: Optional[int] = None) -> Iterator[Window]:
+        """Tile ``region`` (default: the whole raster) into windows of at most ``size`` (default ``window_size``)."""
+
+        height, width = self.shape
+        row_start, col_start, row_end, col_end = 0, 0, height, width
+        if region is not None:
+            row_start = max(int(region.row_off), 0)
+            col_start = max(int(region.col_off), 0)
+            row_end = min(int(region.row_off + region.height), height)
+            col_end = min(int(region.col_off + region.width), width)
+        step = size or self.window_size
+        for row in range(row_start, row_end, step):
+            for col in range(col_start, col_end, step):
+                yield Window(col, row, min(step, col_end - col), min(step, row_end - row))
+
+    def _read_gray(self, window: Optional[Window] = None, out_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        return _read_gray_bands(self.dataset, self.bands, window=window, out_shape=out_shape)
+
+    def stats(self) -> Tuple[float, float]:
+        """Return the (min, max) of the grayscale image, streaming the raster once."""
+
+        if self._stats is None:
+            low = math.inf
+            high = -math.inf
+            for window in self.iter_windows():
+                gray = self._read_gray(window)
+                if gray.size:
+                    low = min(low, float(np.min(gray)))
+                    high = max(high, float(np.max(gray)))
+            if not math.isfinite(low):
+                low, high = 0.0, 0.0
+            self._stats = (low, high)
+        return self._stats
+
+    def _normalize(self, gray: np.ndarray) -> np.ndarray:
+        low, high = self.stats()
+        gray -= low
+        peak = high - low
+        if peak > 0:
+            gray /= peak
+        return gray
+
+    def read_window(self, window: Window) -> np.ndarray:
+        """Read a single window as a globally normalized float32 grayscale array."""
+
+        return self._normalize(self._read_gray(window))
+
+    def read_valid(self, window: Optional[Window] = None) -> Optional[np.ndarray]:
+        """Boolean mask of pixels holding data (GDAL's dataset mask), or ``None`` if all are valid."""
+
+        if all(MaskFlags.all_valid in flags for flags in self.dataset.mask_flag_enums):
+            return None
+        return self.dataset.dataset_mask(window=window) > 0
+
+    def read_full(self) -> np.ndarray:
+        gray = self._read_gray()
+        if self._stats is None and gray.size:
+            # The full image is at hand, so skip the separate statistics pass.
+            self._stats = (float(np.min(gray)), float(np.max(gray)))
+        return self._normalize(gray)
+
+    def read_decimated(self, max_side: int) -> Tuple[np.ndarray, float]:
+        """Read a downsampled copy whose longest side is at most ``max_side`` pixels.
+
+        Returns the normalized image and the scale factor from full-resolution pixels to it.
+        """
+
+        height, width = self.shape
+        scale = min(1.0, float(max_side) / float(max(height, width)))
+        if scale >= 1.0:
+            return self.read_full(), 1.0
+        out_shape = (max(1, int(round(height * scale))), max(1, int(round(width * scale))))
+        return self._normalize(self._read_gray(out_shape=out_shape)), scale
+
+
+if _MemoryDataset is not None:
+
+    class _ArrayDataset(_MemoryDataset, WindowMethodsMixin, TransformMethodsMixin):
+        """MEM dataset over a NumPy array, with the ``xy``/``index`` helpers of an opened file."""
+
+
+class RasterContext:
+    """Per-file raster state shared by every search stage.
+
+    Holds the open dataset handle, its transform and CRS, the normalized grayscale image
+    and the 8-bit debug canvas, each produced at most once. Rasters above
+    ``stream_threshold_pixels`` are never decoded whole; detection streams them through
+    :attr:`loader` and previews are drawn on a decimated canvas.
+    """
+
+    def __init__(
+        self,
+        dataset: rasterio.io.DatasetReader,
+        *,
+        window_size: int = 4096,
+        stream_threshold_pixels: Optional[int] = None,
+        owns_dataset: bool = True,
+        name: Optional[str] = None,
+        cache_tag: Optional[str] = None,
+        memory_file: Optional[MemoryFile] = None,
+        bands: BandSelection = None,
+    ) -> None:
+        self.dataset = dataset
+        self.loader = WindowedRaster(dataset, window_size=window_size, bands=bands)
+        self.streaming = stream_threshold_pixels is not None and dataset.width * dataset.height > stream_threshold_pixels
+        # Distinguishes catalogs of different views of one source (e.g. MBTiles regions).
+        self.cache_tag = cache_tag
+        self._name = name
+        self._memory_file = memory_file
+        self._owns_dataset = owns_dataset
+        self._image: Optional[np.ndarray] = None
+        self._preview: Optional[Tuple[np.ndarray, float]] = None
+        self._preview_side: Optional[int] = None
+        self._canvas: Optional[np.ndarray] = None
+
+    @classmethod
+    def open(
+        cls,
+        path: Union[str, Path],
+        *,
+        window_size: int = 4096,
+        stream_threshold_pixels: Optional[int] = None,
+        bands: BandSelection = None,
+    ) -> "RasterContext":
+        return cls(
+            rasterio.open(Path(path)),
+            window_size=window_size,
+            stream_threshold_pixels=stream_threshold_pixels,
+            bands=bands,
+        )
+
+    @classmethod
+    def from_array(
+        cls,
+        image: np.ndarray,
+        transform: Affine,
+        crs: Any,
+        *,
+        name: str,
+        cache_tag: Optional[str] = None,
+        window_size: int = 4096,
+    ) -> "RasterContext":
+        """Wrap an in-memory grayscale array, normalizing it in place like ``load_tif_grayscale``.
+
+        The array becomes :attr:`image` as is; the dataset handle is a georeferenced MEM
+        dataset over the same buffer, so windowed and decimated reads need no second copy.
+        """
+
+        gray = np.ascontiguousarray(image, dtype=np.float32)
+        peak = 0.0
+        if gray.size:
+            gray -= float(np.min(gray))
+            peak = float(np.max(gray))
+            if peak > 0:
+                gray /= peak
+        memory_file = None
+        if _MemoryDataset is not None:
+            dataset = _ArrayDataset(gray, transform=transform, crs=crs)
+        else:  # pragma: no cover
+            memory_file = MemoryFile()
+            height, width = gray.shape
+            with memory_file.open(
+                driver="GTiff", height=height, width=width, count=1, dtype="float32", crs=crs, transform=transform
+            ) as dst:
+                dst.write(gray, 1)
+            dataset = memory_file.open()
+        context = cls(dataset, window_size=window_size, name=name, cache_tag=cache_tag, memory_file=memory_file)
+        context._image = gray
+        # Reads through the loader are already normalized: min 0 and max 1 (or 0 when flat).
+        context.loader._stats = (0.0, 1.0 if peak > 0 else 0.0)
+        return context
+
+    def close(self) -> None:
+        self._image = None
+        self._preview = None
+        self._canvas = None
+        if self._owns_dataset and not self.dataset.closed:
+            self.dataset.close()
+        if self._memory_file is not None:
+            self._memory_file.close()
+            self._memory_file = None
+
+    def __enter__(self) -> "RasterContext":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def path(self) -> str:
+        return str(self.dataset.name)
+
+    @property
+    def name(self) -> str:
+        return self._name or self.loader.name
+
+    @property
+    def transform(self) -> Affine:
+        return self.dataset.transform
+
+    @property
+    def crs(self) -> Any:
+        return self.dataset.crs
+
+    @property
+    def image(self) -> np.ndarray:
+        """Normalized grayscale image of the whole raster (decoded on first access)."""
+
+        if self.streaming:
+            raise ValueError("Raster is streamed window by window; the full image is not decoded.")
+        if self._image is None:
+            self._image = self.loader.read_full()
+        return self._image
+
+    def detection_source(self) -> Union[np.ndarray, WindowedRaster]:
+        return self.loader if self.streaming else self.image
+
+    def valid_mask(self) -> Optional[np.ndarray]:
+        """Nodata mask of the in-memory image (``None`` when every pixel holds data)."""
+
+        return None if self.streaming else self.loader.read_valid()
+
+    def preview_image(self, max_side: int) -> Tuple[np.ndarray, float]:
+        """Image to draw previews on and the full-resolution -> preview scale."""
+
+        if not self.streaming:
+            return self.image, 1.0
+        if self._preview is None or self._preview_side != max_side:
+            self._preview = self.loader.read_decimated(max_side)
+            self._preview_side = max_side
+            self._canvas = None
+        return self._preview
+
+    def debug_canvas(self, max_side: int) -> Tuple[np.ndarray, float]:
+        """Fresh copy of the 8-bit BGR canvas, ready to be drawn on."""
+
+        img, scale = self.preview_image(max_side)
+        if self._canvas is None:
+            self._canvas = _prepare_debug_canvas(img)
+        return self._canvas.copy(), scale
+
+
+ImageSource = Union[str, Path, WindowedRaster, RasterContext]
+
+
 def _parse_linestring(pattern: Union[str, Sequence[Tuple[float, float]], np.ndarray]) -> np.ndarray:
     """Convert user supplied pattern data into an array of lon/lat pairs."""
 
@@ -192,6 +622,80 @@ def linestring_to_pixels(coords: np.ndarray, transform: Affine) -> np.ndarray:
     return np.asarray(pixels, dtype=np.float32)
 
 
+@dataclass(frozen=True)
+class _SigmaMasks:
+    """Validation masks for one blob sigma over the full ``(2r+1)``-square window.
+
+    Offsets are relative to the blob centre, so a patch clipped by the image border uses
+    the matching slice of each mask; no per-blob grids are rebuilt.
+    """
+
+    sigma: float
+    radius: int
+    dy: np.ndarray
+    dx: np.ndarray
+    inner: np.ndarray
+    ring: np.ndarray
+    bg: np.ndarray
+    edge: np.ndarray
+    theoretical_area: float
+
+    @property
+    def usable(self) -> bool:
+        return bool(self.ring.any() and self.bg.any())
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+@lru_cache(maxsize=512)
+def _sigma_masks(sigma: float) -> _SigmaMasks:
+    radius = max(int(3 * sigma), 3)
+    offsets = np.arange(-radius, radius + 1)
+    dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+    dist2 = dy**2 + dx**2
+    sigma_sq = sigma**2
+    inner = dist2 <= (sigma_sq * 1.2)
+    ring = (dist2 >= (sigma_sq * 1.3)) & (dist2 <= (sigma_sq * 2.3))
+    bg = (dist2 > (sigma_sq * 3.8)) & (dist2 <= (sigma_sq * 8.0))
+    edge = ~(inner | ring | bg)
+    return _SigmaMasks(
+        sigma=sigma,
+        radius=radius,
+        dy=_readonly(dy),
+        dx=_readonly(dx),
+        inner=_readonly(inner),
+        ring=_readonly(ring),
+        bg=_readonly(bg),
+        edge=_readonly(edge),
+        theoretical_area=float(np.pi * sigma_sq),
+    )
+
+
+def _sigma_ladder(min_sigma: float, max_sigma: float, num_sigma: int, log_scale: bool) -> np.ndarray:
+    """The scales ``blob_log`` evaluates (and the DoG backend reuses)."""
+
+    if log_scale:
+        return np.logspace(np.log10(min_sigma), np.log10(max_sigma), num_sigma)
+    return np.linspace(min_sigma, max_sigma, num_sigma)
+
+
+@lru_cache(maxsize=32)
+def _mask_bank(min_sigma: float, max_sigma: float, num_sigma: int, log_scale: bool) -> Dict[float, _SigmaMasks]:
+    """Masks for every sigma the detectors can emit with these scale-space settings."""
+
+    sigmas = _sigma_ladder(min_sigma, max_sigma, num_sigma, log_scale)
+    return {float(sigma): _sigma_masks(float(sigma)) for sigma in sigmas if sigma > 0}
+
+
+def _masks_for(params: StarDetectionParams, sigma: float) -> _SigmaMasks:
+    bank = _mask_bank(float(params.min_sigma), float(params.max_sigma), int(params.num_sigma), bool(params.log_scale))
+    masks = bank.get(sigma)
+    return masks if masks is not None else _sigma_masks(sigma)
+
+
 def _is_candidate_star(
     img: np.ndarray,
     y: float,
@@ -202,7 +706,8 @@ def _is_candidate_star(
     if sigma <= 0:
         return False
 
-    radius = max(int(3 * sigma), 3)
+    masks = _masks_for(params, float(sigma))
+    radius = masks.radius
     cy = int(round(y))
     cx = int(round(x))
     h, w = img.shape
@@ -224,12 +729,10 @@ def _is_candidate_star(
     if center_val < params.min_center_value:
         return False
 
-    rr, cc = np.ogrid[: patch.shape[0], : patch.shape[1]]
-    dist2 = (rr - py) ** 2 + (cc - px) ** 2
-    sigma_sq = sigma**2
-    inner_mask = dist2 <= (sigma_sq * 1.2)
-    ring_mask = (dist2 >= (sigma_sq * 1.3)) & (dist2 <= (sigma_sq * 2.3))
-    bg_mask = (dist2 > (sigma_sq * 3.8)) & (dist2 <= (sigma_sq * 8.0))
+    # Same window, expressed in the bank's full-size mask coordinates.
+    window = (slice(y0 - cy + radius, y1 - cy + radius), slice(x0 - cx + radius, x1 - cx + radius))
+    ring_mask = masks.ring[window]
+    bg_mask = masks.bg[window]
     if not ring_mask.any() or not bg_mask.any():
         return False
 
@@ -248,7 +751,7 @@ def _is_candidate_star(
         return False
 
     area = float(high_mask.sum())
-    theoretical = np.pi * sigma_sq
+    theoretical = masks.theoretical_area
     if area < 0.2 * theoretical or area > 2.0 * theoretical:
         return False
 
@@ -264,22 +767,494 @@ def _is_candidate_star(
     if axis_ratio < params.axis_ratio_limit:
         return False
 
-    edge_mask = ~(inner_mask | ring_mask | bg_mask)
-    edge_values = patch[edge_mask]
+    edge_values = patch[masks.edge[window]]
     if edge_values.size and float(np.max(edge_values)) > center_val * 0.95:
         return False
 
     return True
 
 
-def detect_stars(img: np.ndarray, params: Optional[StarDetectionParams] = None) -> np.ndarray:
-    """Detect star-like blobs in the grayscale image."""
+# Upper bound on the float64 patch stack built per batch by ``_filter_candidate_stars``.
+_CANDIDATE_BATCH_BYTES = 32 * 1024 * 1024
+
+
+def _filter_sigma_group(
+    img: np.ndarray,
+    cy: np.ndarray,
+    cx: np.ndarray,
+    masks: _SigmaMasks,
+    params: StarDetectionParams,
+) -> np.ndarray:
+    """Batched ``_is_candidate_star`` for blobs sharing one sigma whose patches fit the image.
+
+    Every check mirrors the scalar version: the patches are gathered into one
+    ``(n, side, side)`` stack using the bank's offsets and the per-blob statistics become
+    reductions over its trailing axes. Ring and background values are gathered in the same
+    row-major order the scalar code uses, so the means agree bit for bit.
+    """
+
+    if not masks.usable:
+        return np.zeros(len(cy), dtype=bool)
+    radius = masks.radius
+    dy, dx = masks.dy, masks.dx
+    ring_mask, bg_mask, edge_mask = masks.ring, masks.bg, masks.edge
+    theoretical = masks.theoretical_area
+    # Coordinates inside the patch, as np.nonzero(high_mask) reports them.
+    patch_rows = (dy + radius).astype(np.float64)
+    patch_cols = (dx + radius).astype(np.float64)
+
+    keep = np.zeros(len(cy), dtype=bool)
+    batch = max(1, _CANDIDATE_BATCH_BYTES // (dy.size * 8))
+    for start in range(0, len(cy), batch):
+        by = cy[start : start + batch, None, None]
+        bx = cx[start : start + batch, None, None]
+        patches = img[by + dy, bx + dx]
+        center_val = patches[:, radius, radius]
+
+        ok = center_val >= params.min_center_value
+        halo_mean = patches[:, ring_mask].mean(axis=1)
+        bg_mean = patches[:, bg_mask].mean(axis=1)
+        prominence = center_val - np.maximum(halo_mean, bg_mean)
+        ok &= prominence >= params.min_prominence
+        ok &= (halo_mean > bg_mean + 0.03) & (halo_mean < center_val - 0.03)
+
+        high_mask = patches >= (bg_mean + 0.65 * (center_val - bg_mean))[:, None, None]
+        area = high_mask.sum(axis=(1, 2)).astype(np.float64)
+        ok &= (area >= 0.2 * theoretical) & (area <= 2.0 * theoretical) & (area >= 5)
+
+        if edge_mask.any():
+            ok &= ~(patches[:, edge_mask].max(axis=1) > center_val * 0.95)
+
+        survivors = np.flatnonzero(ok)
+        if len(survivors):
+            high = high_mask[survivors]
+            count = area[survivors]
+            mean_r = (high * patch_rows).sum(axis=(1, 2)) / count
+            mean_c = (high * patch_cols).sum(axis=(1, 2)) / count
+            dr = np.where(high, patch_rows - mean_r[:, None, None], 0.0)
+            dc = np.where(high, patch_cols - mean_c[:, None, None], 0.0)
+            norm = 1.0 / (count - 1)
+            cov = np.empty((len(survivors), 2, 2))
+            cov[:, 0, 0] = (dr * dr).sum(axis=(1, 2)) * norm
+            cov[:, 1, 1] = (dc * dc).sum(axis=(1, 2)) * norm
+            cov[:, 0, 1] = cov[:, 1, 0] = (dr * dc).sum(axis=(1, 2)) * norm
+            eigvals = np.linalg.eigvalsh(cov)
+            largest = eigvals[:, -1]
+            shaped = largest > 0
+            ratio = np.divide(eigvals[:, 0], largest, out=np.zeros_like(largest), where=shaped)
+            ok[survivors] = shaped & (ratio >= params.axis_ratio_limit)
+        keep[start : start + batch] = ok
+    return keep
+
+
+def _filter_candidate_stars(img: np.ndarray, blobs: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    """Boolean mask over ``blobs`` (``(y, x, sigma)`` rows) selecting the accepted stars.
+
+    Equivalent to calling :func:`_is_candidate_star` on every blob. Blobs are grouped by
+    their sigma (``blob_log`` only produces ``num_sigma`` distinct values) and validated in
+    batches; the few whose patch is clipped by the image border take the scalar path.
+    """
+
+    keep = np.zeros(len(blobs), dtype=bool)
+    if not len(blobs):
+        return keep
+    h, w = img.shape
+    ys, xs, sigmas = blobs[:, 0], blobs[:, 1], blobs[:, 2]
+    cy = np.rint(ys).astype(np.intp)
+    cx = np.rint(xs).astype(np.intp)
+    valid = (sigmas > 0) & (cy >= 0) & (cx >= 0) & (cy < h) & (cx < w)
+    radius = np.maximum((3 * np.where(valid, sigmas, 0)).astype(np.intp), 3)
+    interior = valid & (cy - radius >= 0) & (cx - radius >= 0) & (cy + radius < h) & (cx + radius < w)
+
+    for index in np.flatnonzero(valid & ~interior):
+        keep[index] = _is_candidate_star(img, ys[index], xs[index], sigmas[index], params)
+    for sigma in np.unique(sigmas[interior]):
+        group = np.flatnonzero(interior & (sigmas == sigma))
+        keep[group] = _filter_sigma_group(img, cy[group], cx[group], _masks_for(params, float(sigma)), params)
+    return keep
+
+
+def _no_stars() -> np.ndarray:
+    return np.zeros((0, 3), dtype=np.float32)
+
+
+def _blob_prominence(img: np.ndarray, blobs: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    """Peak height above the local background, ``center - max(ring mean, bg mean)``, per blob.
+
+    The same quantity the candidate filter thresholds with ``min_prominence``; patches
+    clipped by the image border only average their in-image pixels.
+    """
+
+    out = np.zeros(len(blobs), dtype=np.float32)
+    h, w = img.shape
+    cy = np.clip(np.rint(blobs[:, 0]).astype(np.intp), 0, h - 1)
+    cx = np.clip(np.rint(blobs[:, 1]).astype(np.intp), 0, w - 1)
+    for sigma in np.unique(blobs[:, 2]):
+        masks = _masks_for(params, float(sigma))
+        if not masks.usable:
+            continue
+        group = np.flatnonzero(blobs[:, 2] == sigma)
+        batch = max(1, _CANDIDATE_BATCH_BYTES // (masks.dy.size * 8))
+        for start in range(0, len(group), batch):
+            members = group[start : start + batch]
+            rows = cy[members, None, None] + masks.dy
+            cols = cx[members, None, None] + masks.dx
+            inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+            patches = img[np.clip(rows, 0, h - 1), np.clip(cols, 0, w - 1)].astype(np.float64)
+            ring = inside & masks.ring
+            bg = inside & masks.bg
+            halo = (patches * ring).sum(axis=(1, 2)) / np.maximum(ring.sum(axis=(1, 2)), 1)
+            background = (patches * bg).sum(axis=(1, 2)) / np.maximum(bg.sum(axis=(1, 2)), 1)
+            out[members] = img[cy[members], cx[members]] - np.maximum(halo, background)
+    return out
+
+
+def _accepted_stars(img: np.ndarray, blobs: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    """``(row, col, prominence)`` float32 rows for blobs that passed the candidate filter.
+
+    Prominence is measured on the normalized image *before* equalization: CLAHE flattens
+    bright stars towards a common level, which would make it useless for ranking.
+    """
+
+    if not len(blobs):
+        return _no_stars()
+    return np.column_stack([blobs[:, :2], _blob_prominence(img, blobs, params)]).astype(np.float32)
+
+
+def _limit_stars(stars: np.ndarray, max_stars: int) -> np.ndarray:
+    """Keep the ``max_stars`` most prominent stars (all when ``max_stars`` is 0), in catalog order."""
+
+    if max_stars <= 0 or len(stars) <= max_stars:
+        return stars
+    brightest = np.argsort(-stars[:, 2], kind="stable")[:max_stars]
+    return stars[np.sort(brightest)]
+
+
+# The DoG backend brackets each scale ``s`` with blurs at ``s / k`` and ``s * k``.
+_DOG_SPREAD = math.sqrt(1.2)
+_DETECTORS = ("log", "dog")
+
+
+def _detection_halo(params: StarDetectionParams) -> int:
+    """Margin a window needs so detector responses and star validation match the full image."""
+
+    validation_radius = max(int(3 * params.max_sigma), 3)
+    spread = _DOG_SPREAD if params.detector == "dog" else 1.0
+    return validation_radius + int(math.ceil(4 * params.max_sigma * spread))
+
+
+def _tile_workers(params: StarDetectionParams) -> int:
+    return max(1, params.tile_workers or os.cpu_count() or 1)
+
+
+def _run_tiles(
+    job: Callable[..., Tuple[np.ndarray, np.ndarray]],
+    items: Iterable[Tuple[Any, ...]],
+    workers: int,
+) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Run ``job(*item)`` for every tile, in order, on up to ``workers`` threads.
+
+    ``items`` is consumed lazily and at most ``2 * workers`` tiles are in flight, so a
+    streaming source never has more than that many windows decoded at once.
+    """
+
+    if workers <= 1:
+        return [job(*item) for item in items]
+    results: List[Tuple[np.ndarray, np.ndarray]] = []
+    pending: "deque[Future[Tuple[np.ndarray, np.ndarray]]]" = deque()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="star-tiles") as pool:
+        for item in items:
+            pending.append(pool.submit(job, *item))
+            if len(pending) >= 2 * workers:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+    return results
+
+
+def _tile_core_stars(
+    stars: np.ndarray,
+    origin: Tuple[int, int],
+    core: Window,
+) -> np.ndarray:
+    """Shift tile-local stars to image coordinates and keep those inside the tile's core."""
+
+    if not len(stars):
+        return _no_stars()
+    stars = stars.astype(np.float32, copy=True)
+    stars[:, 0] += origin[0]
+    stars[:, 1] += origin[1]
+    # Each star belongs to the tile whose core contains it, so halos never duplicate.
+    inside = (
+        (stars[:, 0] >= core.row_off)
+        & (stars[:, 0] < core.row_off + core.height)
+        & (stars[:, 1] >= core.col_off)
+        & (stars[:, 1] < core.col_off + core.width)
+    )
+    return stars[inside]
+
+
+def _merge_tile_stars(parts: Sequence[Tuple[np.ndarray, np.ndarray]], params: StarDetectionParams) -> np.ndarray:
+    """Concatenate per-tile catalogs and drop seam duplicates found by neighbouring tiles.
+
+    Core ownership already prevents a blob from being reported twice; this only catches a
+    star whose peak landed on different sides of a seam in the two tiles that saw it.
+    """
+
+    parts = [(stars, tiles) for stars, tiles in parts if len(stars)]
+    if not parts:
+        return _no_stars()
+    stars = np.concatenate([p[0] for p in parts]).astype(np.float32)
+    tiles = np.concatenate([p[1] for p in parts])
+    if len(parts) < 2:
+        return stars
+    pairs = KDTree(stars[:, :2]).query_pairs(max(1.0, float(params.min_sigma)), output_type="ndarray")
+    if not len(pairs):
+        return stars
+    seams = pairs[tiles[pairs[:, 0]] != tiles[pairs[:, 1]]]
+    if not len(seams):
+        return stars
+    keep = np.ones(len(stars), dtype=bool)
+    keep[np.maximum(seams[:, 0], seams[:, 1])] = False
+    return stars[keep]
+
+
+def _tile_windows(shape: Tuple[int, int], size: int, halo: int) -> Iterator[Tuple[int, Window, Window]]:
+    """``(index, core, padded)`` windows covering ``shape`` with ``halo`` pixels of overlap."""
+
+    height, width = shape
+    index = 0
+    for row in range(0, height, size):
+        for col in range(0, width, size):
+            core = Window(col, row, min(size, width - col), min(size, height - row))
+            row0, col0 = max(row - halo, 0), max(col - halo, 0)
+            row1 = min(row + int(core.height) + halo, height)
+            col1 = min(col + int(core.width) + halo, width)
+            yield index, core, Window(col0, row0, col1 - col0, row1 - row0)
+            index += 1
+
+
+def _tile_is_active(active: np.ndarray, block: int, core: Window) -> bool:
+    row0, col0 = int(core.row_off) // block, int(core.col_off) // block
+    row1 = -(-int(core.row_off + core.height) // block)
+    col1 = -(-int(core.col_off + core.width) // block)
+    return bool(active[row0:row1, col0:col1].any())
+
+
+def _detect_stars_tiled(
+    img: np.ndarray,
+    img_eq: np.ndarray,
+    params: StarDetectionParams,
+    active: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Blob search and validation over haloed tiles of an already equalised image.
+
+    Equalisation stays a single global pass (it is cheap next to the scale-space search),
+    so every tile sees exactly the pixels the single-pass detector would, and core blobs
+    get the same responses and validation patches. With an ``active`` block map from
+    :func:`_background_activity`, tiles whose core covers no active block are skipped.
+    """
+
+    halo = _detection_halo(params) + 1
+    size = params.tile_size if params.tile_size > 0 else _BACKGROUND_TILE
+    windows = _tile_windows(img_eq.shape[:2], size, halo)
+    if active is not None:
+        block = max(int(params.background_block), 1)
+        windows = (item for item in windows if _tile_is_active(active, block, item[1]))
+
+    def _job(index: int, core: Window, padded: Window) -> Tuple[np.ndarray, np.ndarray]:
+        row0, col0 = int(padded.row_off), int(padded.col_off)
+        rows = slice(row0, row0 + int(padded.height))
+        cols = slice(col0, col0 + int(padded.width))
+        tile = img_eq[rows, cols]
+        blobs = _find_blobs(tile, params)
+        if not len(blobs):
+            return _no_stars(), np.zeros(0, dtype=np.intp)
+        keep = _filter_candidate_stars(tile, blobs, params)
+        stars = _tile_core_stars(_accepted_stars(img[rows, cols], blobs[keep], params), (row0, col0), core)
+        return stars, np.full(len(stars), index, dtype=np.intp)
+
+    parts = _run_tiles(_job, windows, _tile_workers(params))
+    return _merge_tile_stars(parts, params)
+
+
+def _detect_stars_windowed(
+    loader: WindowedRaster,
+    params: StarDetectionParams,
+    region: Optional[Window] = None,
+) -> np.ndarray:
+    """Detection over a raster too large to hold in memory, one haloed window at a time.
+
+    Windows are read sequentially (the dataset handle is not thread-safe). With
+    ``tile_size`` set they are that size and are processed by ``tile_workers`` threads.
+    """
+
+    height, width = loader.shape
+    halo = _detection_halo(params)
+    tiled = params.tile_size > 0
+    window_params = replace(params, tile_size=0)
+
+    def _windows() -> Iterator[Tuple[int, Window, Tuple[int, int], np.ndarray, Optional[np.ndarray]]]:
+        for index, core in enumerate(loader.iter_windows(region, params.tile_size if tiled else None)):
+            row0 = max(int(core.row_off) - halo, 0)
+            col0 = max(int(core.col_off) - halo, 0)
+            row1 = min(int(core.row_off + core.height) + halo, height)
+            col1 = min(int(core.col_off + core.width) + halo, width)
+            padded = Window(col0, row0, col1 - col0, row1 - row0)
+            valid = None
+            if params.skip_background:
+                valid = loader.read_valid(padded)
+                if valid is not None and not valid.any():
+                    continue
+                # Only the core decides what gets searched; halo stars belong to the neighbours.
+                owned = np.zeros((row1 - row0, col1 - col0), dtype=bool)
+                owned[
+                    int(core.row_off) - row0 : int(core.row_off + core.height) - row0,
+                    int(core.col_off) - col0 : int(core.col_off + core.width) - col0,
+                ] = True
+                valid = owned if valid is None else valid & owned
+            yield index, core, (row0, col0), loader.read_window(padded), valid
+
+    def _job(
+        index: int, core: Window, origin: Tuple[int, int], tile: np.ndarray, valid: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        stars = _tile_core_stars(_detect_stars_array(tile, window_params, valid), origin, core)
+        return stars, np.full(len(stars), index, dtype=np.intp)
+
+    parts = _run_tiles(_job, _windows(), _tile_workers(params) if tiled else 1)
+    if not tiled:
+        collected = [stars for stars, _ in parts if len(stars)]
+        if not collected:
+            return _no_stars()
+        return np.concatenate(collected).astype(np.float32)
+    return _merge_tile_stars(parts, params)
+
+
+def detect_stars(
+    img: Union[np.ndarray, WindowedRaster],
+    params: Optional[StarDetectionParams] = None,
+    *,
+    with_prominence: bool = False,
+    valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Detect star-like blobs in the grayscale image.
+
+    ``img`` may also be a :class:`WindowedRaster`, in which case detection runs window by
+    window (with a halo around each one) and never holds the full image in memory.
+
+    Returns ``(row, col)`` rows, or ``(row, col, prominence)`` with ``with_prominence``.
+    ``params.max_stars`` keeps only that many of the most prominent stars. With
+    ``params.skip_background``, ``valid`` (a nodata mask of an array ``img``; a
+    :class:`WindowedRaster` reads its own) keeps empty regions out of the detector.
+    """
 
     params = params or StarDetectionParams()
-    kernel = max(32, int(min(img.shape[:2]) / 8) or 1)
-    img_eq = equalize_adapthist(img, clip_limit=0.01, kernel_size=kernel)
+    if isinstance(img, WindowedRaster):
+        stars = _detect_stars_windowed(img, params)
+    else:
+        stars = _detect_stars_array(img, params, valid)
+    stars = _limit_stars(stars, params.max_stars)
+    return stars if with_prominence else stars[:, :2]
+
+
+def _blob_overlap_fraction(r1: np.ndarray, r2: np.ndarray, distance: np.ndarray) -> np.ndarray:
+    """Overlap area of circle pairs relative to the smaller circle (as in skimage's pruning)."""
+
+    r1 = np.asarray(r1, dtype=np.float64)
+    r2 = np.asarray(r2, dtype=np.float64)
+    distance = np.asarray(distance, dtype=np.float64)
+    safe = np.maximum(distance, 1e-12)
+    ratio1 = np.clip((safe**2 + r1**2 - r2**2) / (2 * safe * r1), -1, 1)
+    ratio2 = np.clip((safe**2 + r2**2 - r1**2) / (2 * safe * r2), -1, 1)
+    a = -safe + r2 + r1
+    b = safe - r2 + r1
+    c = safe + r2 - r1
+    d = safe + r2 + r1
+    area = r1**2 * np.arccos(ratio1) + r2**2 * np.arccos(ratio2) - 0.5 * np.sqrt(np.abs(a * b * c * d))
+    fraction = area / (np.pi * np.minimum(r1, r2) ** 2)
+    fraction = np.where(distance <= np.abs(r1 - r2), 1.0, fraction)
+    return np.where(distance > r1 + r2, 0.0, fraction)
+
+
+def _prune_overlapping_blobs(blobs: np.ndarray, overlap: float = 0.5) -> np.ndarray:
+    """Drop the smaller of any two blobs overlapping by more than ``overlap``.
+
+    Overlaps are computed for all neighbouring pairs at once; only the pairs above the
+    threshold are resolved in order, and a blob that was already dropped no longer
+    suppresses others.
+    """
+
+    if len(blobs) < 2:
+        return blobs
+    radii = blobs[:, 2] * math.sqrt(2)
+    tree = KDTree(blobs[:, :2])
+    pairs = tree.query_pairs(2 * float(radii.max()), output_type="ndarray")
+    if not len(pairs):
+        return blobs
+    first, second = pairs[:, 0], pairs[:, 1]
+    distance = np.hypot(*(blobs[first, :2] - blobs[second, :2]).T)
+    heavy = _blob_overlap_fraction(radii[first], radii[second], distance) > overlap
+    alive = np.ones(len(blobs), dtype=bool)
+    for i, j in pairs[heavy]:
+        if not (alive[i] and alive[j]):
+            continue
+        if radii[i] > radii[j]:
+            alive[j] = False
+        else:
+            alive[i] = False
+    return blobs[alive]
+
 
-    blobs = blob_log(
+def _dog_blobs(img_eq: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    """Difference-of-Gaussians scale space with a streaming 3x3x3 local-maximum search.
+
+    For each ladder scale ``s`` the response ``(G(s/k) - G(s*k)) / (k - 1/k)`` approximates
+    the scale-normalised ``-s**2 * LoG`` that ``blob_log`` thresholds, so ``threshold`` keeps
+    its meaning. Blurs are separable float32 OpenCV filters, and only three response layers
+    are alive at a time instead of a ``num_sigma`` deep float64 cube. Returns ``(y, x,
+    sigma)`` rows like ``blob_log``.
+    """
+
+    img32 = np.ascontiguousarray(img_eq, dtype=np.float32)
+    sigmas = _sigma_ladder(params.min_sigma, params.max_sigma, params.num_sigma, params.log_scale)
+    norm = 1.0 / (_DOG_SPREAD - 1.0 / _DOG_SPREAD)
+    footprint = np.ones((3, 3), np.uint8)
+    narrow = np.empty_like(img32)
+    wide = np.empty_like(img32)
+
+    def _response(sigma: float) -> Tuple[np.ndarray, np.ndarray]:
+        cv2.GaussianBlur(img32, (0, 0), sigma / _DOG_SPREAD, dst=narrow, borderType=cv2.BORDER_REFLECT)
+        cv2.GaussianBlur(img32, (0, 0), sigma * _DOG_SPREAD, dst=wide, borderType=cv2.BORDER_REFLECT)
+        layer = cv2.subtract(narrow, wide)
+        layer *= norm
+        return layer, cv2.dilate(layer, footprint)
+
+    found: List[np.ndarray] = []
+    previous: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    current = _response(float(sigmas[0]))
+    for index, sigma in enumerate(sigmas):
+        following = _response(float(sigmas[index + 1])) if index + 1 < len(sigmas) else None
+        layer, neighbourhood = current
+        peak = neighbourhood.copy()
+        for other in (previous, following):
+            if other is not None:
+                np.maximum(peak, other[1], out=peak)
+        rows, cols = np.nonzero((layer >= peak) & (layer > params.threshold))
+        if len(rows):
+            found.append(np.column_stack([rows, cols, np.full(len(rows), sigma)]).astype(np.float64))
+        previous, current = current, following  # type: ignore[assignment]
+
+    if not found:
+        return np.zeros((0, 3), dtype=np.float64)
+    return _prune_overlapping_blobs(np.concatenate(found))
+
+
+def _find_blobs(img_eq: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    if params.detector not in _DETECTORS:
+        raise ValueError(f"Unknown star detector {params.detector!r}; expected one of {_DETECTORS}")
+    if params.detector == "dog":
+        return _dog_blobs(img_eq, params)
+    return blob_log(
         img_eq,
         min_sigma=params.min_sigma,
         max_sigma=params.max_sigma,
@@ -288,30 +1263,312 @@ def detect_stars(img: np.ndarray, params: Optional[StarDetectionParams] = None)
         log_scale=params.log_scale,
     )
 
+
+# CLAHE settings shared by both engines (skimage's clip limit and histogram bin count).
+_CLAHE_CLIP_LIMIT = 0.01
+_CLAHE_NBINS = 256
+_EQUALIZERS = ("skimage", "opencv", "none")
+
+
+def _clahe_kernel(shape: Tuple[int, ...]) -> int:
+    return max(32, int(min(shape[:2]) / 8) or 1)
+
+
+def _equalize_opencv(img: np.ndarray, kernel: int) -> np.ndarray:
+    """OpenCV 16-bit CLAHE configured to behave like ``equalize_adapthist``.
+
+    The image is min-max rescaled like skimage does and binned to its 256 histogram levels
+    (spread over the 16-bit range), with one tile per ``kernel`` pixels. OpenCV clips each
+    bin at ``clipLimit * tile_area / 65536``, so ``clip_limit * 65536`` reproduces skimage's
+    per-bin limit of ``clip_limit * kernel_area``.
+    """
+
+    gray = np.asarray(img, dtype=np.float32)
+    low, high = float(gray.min()), float(gray.max())
+    scale = (_CLAHE_NBINS - 1) / (high - low) if high > low else 0.0
+    levels = np.rint((gray - low) * scale).astype(np.uint16)
+    levels *= 65535 // (_CLAHE_NBINS - 1)
+    height, width = gray.shape[:2]
+    grid = (max(1, math.ceil(width / kernel)), max(1, math.ceil(height / kernel)))
+    clahe = cv2.createCLAHE(clipLimit=_CLAHE_CLIP_LIMIT * 65536, tileGridSize=grid)
+    out = clahe.apply(levels).astype(np.float32)
+    out /= 65535.0
+    return out
+
+
+def _equalize(img: np.ndarray, params: StarDetectionParams) -> np.ndarray:
+    if params.equalization not in _EQUALIZERS:
+        raise ValueError(f"Unknown equalization {params.equalization!r}; expected one of {_EQUALIZERS}")
+    if params.equalization == "none":
+        return img
+    kernel = _clahe_kernel(img.shape)
+    if params.equalization == "opencv":
+        return _equalize_opencv(img, kernel)
+    return equalize_adapthist(img, clip_limit=_CLAHE_CLIP_LIMIT, kernel_size=kernel)
+
+
+def _is_tiled(shape: Tuple[int, ...], params: StarDetectionParams) -> bool:
+    return params.tile_size > 0 and max(shape[:2]) > params.tile_size
+
+
+def _equalize_and_find_blobs(img: np.ndarray, params: StarDetectionParams) -> Tuple[np.ndarray, np.ndarray]:
+    """The expensive, filter-independent half of single-pass detection: ``(img_eq, blobs)``."""
+
+    # float32 end to end: every engine and both detectors preserve it, which halves the
+    # equalized image and the LoG scale-space cube compared to float64.
+    img = np.asarray(img, dtype=np.float32)
+    with stage("equalize"):
+        img_eq = _equalize(img, params)
+    with stage("blobs"):
+        blobs = _find_blobs(img_eq, params)
+    return img_eq, blobs
+
+
+def _select_stars(
+    img: np.ndarray, img_eq: np.ndarray, blobs: np.ndarray, params: StarDetectionParams
+) -> np.ndarray:
+    """The cheap half: run the candidate filter and return the accepted ``(row, col, prominence)`` stars."""
+
     if not len(blobs):
-        return np.zeros((0, 2), dtype=np.float32)
+        return _no_stars()
+    with stage("filter"):
+        keep = _filter_candidate_stars(img_eq, blobs, params)
+        if not keep.any():
+            return _no_stars()
+        return _accepted_stars(img, blobs[keep], params)
 
-    filtered: List[Tuple[float, float]] = []
-    for y, x, sigma in blobs:
-        if _is_candidate_star(img_eq, y, x, sigma, params):
-            filtered.append((y, x))
 
-    if not filtered:
-        return np.zeros((0, 2), dtype=np.float32)
+# Tile side for the background pre-pass when ``tile_size`` is not set.
+_BACKGROUND_TILE = 512
 
-    return np.asarray(filtered, dtype=np.float32)
 
+def _background_activity(img: np.ndarray, block: int, nsigma: float, valid: Optional[np.ndarray] = None) -> np.ndarray:
+    """Boolean ``block``-cell map of the regions that may hold a star.
 
-import numpy as np
-from scipy.spatial import KDTree
-from typing import List, Tuple, NamedTuple
+    A cell is active when its brightest pixel stands ``nsigma`` noise levels above its
+    median. The noise level is the median of the per-cell standard deviations, which a
+    sparse star field barely moves. Cells without a single ``valid`` pixel never are, and
+    nodata pixels are filled with the typical sky level so a nodata edge is not a peak.
+    """
+
+    height, width = img.shape
+    rows, cols = -(-height // block), -(-width // block)
+    peak = np.empty((rows, cols), dtype=np.float32)
+    level = np.empty_like(peak)
+    spread = np.empty_like(peak)
+    filled = np.ones((rows, cols), dtype=bool)
+    pad = cols * block - width
+    sky = None
+    if valid is not None:
+        data = img[valid]
+        if not data.size:
+            return np.zeros((rows, cols), dtype=bool)
+        sky = np.float32(np.median(data[:: max(data.size // 65536, 1)]))
+    for row in range(rows):
+        # One strip of cells at a time: (block rows, cols * block) -> (cols, pixels per cell).
+        strip = img[row * block : (row + 1) * block]
+        if sky is not None:
+            strip = np.where(valid[row * block : (row + 1) * block], strip, sky)
+        if pad:
+            strip = np.pad(strip, ((0, 0), (0, pad)), mode="edge")
+        cells = strip.reshape(strip.shape[0], cols, block).swapaxes(0, 1).reshape(cols, -1)
+        peak[row] = cells.max(axis=1)
+        level[row] = np.median(cells, axis=1)
+        spread[row] = cells.std(axis=1)
+        if valid is not None:
+            mask = valid[row * block : (row + 1) * block]
+            if pad:
+                mask = np.pad(mask, ((0, 0), (0, pad)))
+            filled[row] = mask.reshape(mask.shape[0], cols, block).any(axis=(0, 2))
+    if not filled.any():
+        return filled
+    noise = float(np.median(spread[filled]))
+    return filled & (peak - level > nsigma * noise)
+
+
+def _detect_stars_array(img: np.ndarray, params: StarDetectionParams, valid: Optional[np.ndarray] = None) -> np.ndarray:
+    active = None
+    if params.skip_background:
+        img = np.asarray(img, dtype=np.float32)
+        block = max(int(params.background_block), 1)
+        with stage("background"):
+            active = _background_activity(img, block, float(params.background_nsigma), valid)
+        if not active.any():
+            return _no_stars()
+        size = params.tile_size if params.tile_size > 0 else _BACKGROUND_TILE
+        if all(_tile_is_active(active, block, core) for _, core, _ in _tile_windows(img.shape, size, 0)):
+            # Nothing to skip: keep the plain (single-pass or tiled) detector.
+            active = None
+    if active is not None or _is_tiled(img.shape, params):
+        img = np.asarray(img, dtype=np.float32)
+        with stage("equalize"):
+            img_eq = _equalize(img, params)
+        with stage("tiles"):
+            return _detect_stars_tiled(img, img_eq, params, active)
+    img_eq, blobs = _equalize_and_find_blobs(img, params)
+    return _select_stars(img, img_eq, blobs, params)
+
+
+_MATCH_ENGINES = ("ransac", "triangles")
+_MATCH_VERIFIERS = ("kdtree", "grid")
+# Hypotheses solved and verified per vectorized batch: the first batch and the largest.
+_RANSAC_FIRST_BATCH = 16
+_RANSAC_BATCH = 256
+
+
+@dataclass
+class MatchStats:
+    """Work done by :func:`match_pattern`, summed over every call that shares the object."""
+
+    # Hypotheses drawn (RANSAC) or looked up (triangles), and those actually verified.
+    iterations: int = 0
+    hypotheses: int = 0
+    seconds: float = 0.0
+    # Why the last call stopped: "perfect" match, "confident" (adaptive rule satisfied),
+    # "budget" (``max_iterations`` spent) or "exhausted" (no more triangle candidates).
+    stop_reason: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "iterations": self.iterations,
+            "hypotheses": self.hypotheses,
+            "seconds": round(self.seconds, 4),
+            "stopReason": self.stop_reason,
+        }
+
+
+def _draw_sample_pairs(
+    rng: np.random.Generator, count: int, num_pattern_pts: int, pool_size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """``count`` RANSAC draws: two distinct pattern points and two distinct stars each."""
+
+    def _pairs(size: int) -> np.ndarray:
+        first = rng.integers(0, size, count)
+        second = rng.integers(0, size - 1, count)
+        second += second >= first
+        return np.column_stack([first, second])
+
+    return _pairs(num_pattern_pts), _pairs(pool_size)
+
+
+def _ransac_budget(inliers: int, num_pattern_pts: int, pool_size: int, confidence: float, cap: int) -> int:
+    """Draws needed to sample a correct hypothesis with ``confidence`` if ``inliers`` points have a star.
+
+    A draw is correct when both pattern points are inliers and both stars are their
+    counterparts, in order: probability ``k (k - 1) / (n (n - 1) M (M - 1))``.
+    """
+
+    if inliers < 2 or confidence >= 1.0:
+        return cap
+    hit = inliers * (inliers - 1) / (num_pattern_pts * (num_pattern_pts - 1) * pool_size * max(pool_size - 1, 1))
+    if hit >= 1.0:
+        return 1
+    return int(min(cap, math.ceil(math.log1p(-confidence) / math.log1p(-hit))))
+
+
+def _similarity_from_pairs(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Closed-form similarity of each ``(2, 2)`` point pair in ``src``/``dst``: ``(K, 2, 3)``.
+
+    For two points the least-squares fit reduces to the rotation between the two difference
+    vectors and the ratio of their lengths, so no per-hypothesis SVD is needed.
+    """
+
+    src_vec = src[:, 1] - src[:, 0]
+    dst_vec = dst[:, 1] - dst[:, 0]
+    src_len = np.linalg.norm(src_vec, axis=1)
+    dst_len = np.linalg.norm(dst_vec, axis=1)
+    cos = (src_vec * dst_vec).sum(axis=1) / (src_len * dst_len)
+    sin = (src_vec[:, 0] * dst_vec[:, 1] - src_vec[:, 1] * dst_vec[:, 0]) / (src_len * dst_len)
+    scale = dst_len / src_len
+    A = scale[:, None, None] * np.stack([np.stack([cos, -sin], axis=1), np.stack([sin, cos], axis=1)], axis=1)
+    t = dst.mean(axis=1) - np.einsum("kij,kj->ki", A, src.mean(axis=1))
+    return np.concatenate([A, t[:, :, None]], axis=2)
+
+
+def _similarity_fit(src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """Least-squares similarity (SVD rotation, mean-distance scale) per stacked point set: ``(K, 2, 3)``."""
+
+    src_mean = src.mean(axis=1, keepdims=True)
+    dst_mean = dst.mean(axis=1, keepdims=True)
+    src_centered = src - src_mean
+    dst_centered = dst - dst_mean
+    U, _, Vt = np.linalg.svd(np.swapaxes(src_centered, 1, 2) @ dst_centered)
+    reflected = np.linalg.det(np.swapaxes(Vt, 1, 2) @ np.swapaxes(U, 1, 2)) < 0
+    Vt[reflected, -1, :] *= -1
+    R = np.swapaxes(Vt, 1, 2) @ np.swapaxes(U, 1, 2)
+    scale = np.linalg.norm(dst_centered, axis=2).sum(axis=1) / np.linalg.norm(src_centered, axis=2).sum(axis=1)
+    A = scale[:, None, None] * R
+    t = dst_mean[:, 0] - np.einsum("kij,kj->ki", A, src_mean[:, 0])
+    return np.concatenate([A, t[:, :, None]], axis=2)
+
+
+def _nearest_free(
+    tree: KDTree, points: np.ndarray, tolerance: float, consumed: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Distance and index of each point's nearest star that is not ``consumed``.
+
+    Without consumed stars this is a single ``k=1`` query. Otherwise only the points whose
+    nearest star is taken look further, fourfold more neighbours at a time and never beyond
+    ``tolerance``; those left without a free star in range get an infinite distance.
+    """
+
+    distances, nearest = tree.query(points, k=1)
+    if consumed is None:
+        return distances, nearest
+    pending = np.flatnonzero(consumed[nearest])
+    k = 4
+    while len(pending):
+        k = min(k, tree.n)
+        found_d, found_i = tree.query(points[pending], k=k, distance_upper_bound=tolerance)
+        found_d = found_d.reshape(len(pending), k)
+        found_i = found_i.reshape(len(pending), k)
+        free = np.isfinite(found_d)
+        free[free] = ~consumed[found_i[free]]
+        hit = free.any(axis=1)
+        first = free.argmax(axis=1)[hit]
+        distances[pending[hit]] = found_d[hit, first]
+        nearest[pending[hit]] = found_i[hit, first]
+        # Done when even the k-th neighbour is out of range, or the whole catalog was seen.
+        done = ~hit & (~np.isfinite(found_d[:, -1]) | (k == tree.n))
+        distances[pending[done]] = np.inf
+        pending = pending[~hit & ~done]
+        k *= 4
+    return distances, nearest
+
+
+def _score_hypotheses(
+    tree: KDTree,
+    transforms: np.ndarray,
+    pattern: np.ndarray,
+    tolerance: float,
+    consumed: Optional[np.ndarray] = None,
+    grid: Optional[StarGrid] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Project the pattern through every ``(2, 3)`` transform and find each point's nearest star.
+
+    One KD-tree query covers the whole batch; ``consumed`` stars (already claimed by an
+    earlier match) are looked past. With a ``grid`` the points are looked up in it and only
+    those it cannot settle go to the tree, which decides exactly the same inliers. Returns
+    the ``(K, P)`` inlier mask and the ``(K, P)`` nearest star indices.
+    """
+
+    projected = np.einsum("kij,pj->kpi", transforms[:, :, :2], pattern) + transforms[:, None, :, 2]
+    points = projected.reshape(-1, 2)
+    if grid is None:
+        distances, nearest = _nearest_free(tree, points, tolerance, consumed)
+    else:
+        distances, nearest, unsure = grid.lookup(points, consumed)
+        if unsure.any():
+            distances[unsure], nearest[unsure] = _nearest_free(tree, points[unsure], tolerance, consumed)
+    shape = projected.shape[:2]
+    return (distances < tolerance).reshape(shape), nearest.reshape(shape)
+
+
+# Bright-star family of the triangle index when ``seed_stars`` does not size it, and the
+# size it may double up to while no match is found (C(160, 3) is about 670k triangles).
+_TRIANGLE_BRIGHT_STARS = 40
+_TRIANGLE_MAX_BRIGHT_STARS = 160
 
-# Az eredmény struktúrájának megtartása
-class PatternMatch(NamedTuple):
-    anchor_index: int
-    matched_indices: List[int]
-    points: np.ndarray
-    score: float
 
 def match_pattern(
     stars: np.ndarray,
@@ -319,11 +1576,89 @@ def match_pattern(
     tolerance: float,
     max_iterations: int = 1000,
     min_inliers_ratio: float = 0.7,
+    *,
+    brightness: Optional[np.ndarray] = None,
+    seed_stars: int = 0,
+    engine: str = "ransac",
+    rng: Union[None, int, np.random.Generator] = None,
+    confidence: float = 0.99,
+    stats: Optional[MatchStats] = None,
+    max_matches: int = 1,
+    verifier: str = "kdtree",
+    grid_cell: float = 0.0,
 ) -> List[PatternMatch]:
     """
     Finds star groupings that match the provided pattern using a RANSAC-based approach.
     This method is robust against noise and outliers.
+
+    With ``seed_stars`` and a per-star ``brightness``, hypotheses are drawn from the
+    ``seed_stars`` brightest stars first and the pool grows fourfold (``max_iterations``
+    each round) until a match is found or every star is in it. Verification always runs
+    against the full catalog, so faint stars still count as inliers.
+
+    Hypotheses are drawn from ``rng`` (a generator or a seed; ``None`` for fresh entropy).
+    Each pool stops adaptively once, given the best model's inlier count, a correct draw
+    would have turned up with probability ``confidence`` (see :func:`_ransac_budget`);
+    ``max_iterations`` caps it. ``stats``, when given, accumulates the work done.
+
+    ``engine="triangles"`` replaces the random draws with a :class:`TriangleIndex` lookup:
+    up to ``max_iterations`` catalog triangles shaped like pattern triangles are verified,
+    most similar first. ``seed_stars`` then sizes its bright-star family, which doubles
+    (up to 160 stars) while no match is found.
+
+    Up to ``max_matches`` non-overlapping occurrences are returned, best first. After each
+    one its stars are marked consumed: later hypotheses are drawn without them and their
+    verification looks past them in the same KD-tree (and triangle index), so nothing is
+    rebuilt. The search ends at the first round that finds no acceptable match.
+
+    ``verifier="grid"`` verifies hypotheses against a :class:`StarGrid` built once per call,
+    with ``grid_cell``-pixel cells (0 = twice the tolerance), falling back to the KD-tree
+    near the tolerance boundary; the inliers are the same as with ``"kdtree"``. It pays
+    off when many hypotheses are verified against one catalog.
     """
+    started = time.perf_counter()
+    stats = stats if stats is not None else MatchStats()
+    try:
+        return _match_pattern(
+            stars,
+            pattern_pixels,
+            tolerance,
+            max_iterations,
+            min_inliers_ratio,
+            brightness,
+            seed_stars,
+            engine,
+            np.random.default_rng(rng),
+            confidence,
+            stats,
+            max_matches,
+            verifier,
+            grid_cell,
+        )
+    finally:
+        stats.seconds += time.perf_counter() - started
+
+
+def _match_pattern(
+    stars: np.ndarray,
+    pattern_pixels: np.ndarray,
+    tolerance: float,
+    max_iterations: int,
+    min_inliers_ratio: float,
+    brightness: Optional[np.ndarray],
+    seed_stars: int,
+    engine: str,
+    rng: np.random.Generator,
+    confidence: float,
+    stats: MatchStats,
+    max_matches: int,
+    verifier: str,
+    grid_cell: float,
+) -> List[PatternMatch]:
+    if engine not in _MATCH_ENGINES:
+        raise ValueError(f"Unknown match engine {engine!r}; expected one of {_MATCH_ENGINES}")
+    if verifier not in _MATCH_VERIFIERS:
+        raise ValueError(f"Unknown match verifier {verifier!r}; expected one of {_MATCH_VERIFIERS}")
     if pattern_pixels.ndim != 2 or pattern_pixels.shape[1] != 2:
         raise ValueError("pattern_pixels must have shape (N, 2)")
     if stars.ndim != 2 or stars.shape[1] != 2:
@@ -369,95 +1704,199 @@ def match_pattern(
         return (M[:, :2] @ pts.T + M[:, [2]]).T
 
     # --- RANSAC Main Logic ---
-    best_match_info = {'inlier_indices': [], 'transform': None, 'num_inliers': -1}
-    
-    # Use a KD-Tree for efficient nearest neighbor searches
+    # Use a KD-Tree for efficient nearest neighbor searches. It is built once: stars claimed
+    # by a match are masked out of every later lookup instead of being removed.
     star_tree = KDTree(stars)
+    star_grid = StarGrid(stars, tolerance, cell=grid_cell) if verifier == "grid" else None
+    consumed = np.zeros(num_stars, dtype=bool)
+    triangle_indexes: Dict[int, TriangleIndex] = {}
 
     min_required_inliers = int(num_pattern_pts * min_inliers_ratio)
+    if engine == "ransac" and seed_stars > 0 and brightness is not None and num_stars > seed_stars:
+        order = np.argsort(-np.asarray(brightness, dtype=np.float64), kind="stable")
+    else:
+        order = None
+
+    matches: List[PatternMatch] = []
+    while len(matches) < max_matches and num_stars - len(np.flatnonzero(consumed)) >= num_pattern_pts:
+        taken = consumed if matches else None
+        best_match_info = {'inlier_indices': [], 'transform': None, 'num_inliers': -1}
+
+        def _consider(transforms: np.ndarray) -> Optional[int]:
+            """Verify a batch of hypotheses in order and keep the best; index of the first perfect one."""
+            nonlocal best_match_info
+            if not len(transforms):
+                return None
+            inliers, nearest = _score_hypotheses(
+                star_tree, transforms, pattern_pixels, tolerance, taken, star_grid
+            )
+            stats.hypotheses += len(transforms)
+            counts = inliers.sum(axis=1)
+            # First occurrence of the maximum: the one a sequential strict ">" update keeps.
+            best = int(np.argmax(counts))
+            if counts[best] > best_match_info['num_inliers']:
+                best_match_info = {
+                    'inlier_indices': list(zip(np.flatnonzero(inliers[best]), nearest[best][inliers[best]])),
+                    'transform': transforms[best],
+                    'num_inliers': counts[best]
+                }
+            return best if counts[best] == num_pattern_pts else None
+
+        if engine == "triangles":
+            # Widen the bright-star family until a match is found (its triangles grow cubically).
+            # A triangle hypothesis brings its own three inliers and one more is often a chance
+            # alignment in a dense catalog, so stop widening only after two confirmations.
+            wanted = min(max(min_required_inliers, 5), num_pattern_pts)
+            bright = max(int(seed_stars or _TRIANGLE_BRIGHT_STARS), 3)
+            while True:
+                if bright not in triangle_indexes:
+                    triangle_indexes[bright] = TriangleIndex(stars, brightness, bright=bright)
+                pattern_triples, star_triples = triangle_indexes[bright].candidates(
+                    pattern_pixels, limit=max_iterations
+                )
+                stats.stop_reason = "budget" if len(pattern_triples) >= max_iterations else "exhausted"
+                if taken is not None:
+                    free = ~taken[star_triples].any(axis=1)
+                    pattern_triples, star_triples = pattern_triples[free], star_triples[free]
+                for start in range(0, len(pattern_triples), _RANSAC_BATCH):
+                    chunk = slice(start, start + _RANSAC_BATCH)
+                    transforms = _similarity_fit(pattern_pixels[pattern_triples[chunk]], stars[star_triples[chunk]])
+                    stats.iterations += len(transforms)
+                    if _consider(transforms) is not None:
+                        stats.stop_reason = "perfect"
+                        break
+                if best_match_info['num_inliers'] >= wanted or bright >= min(num_stars, _TRIANGLE_MAX_BRIGHT_STARS):
+                    break
+                bright *= 2
+
+        # Hypothesis pools: the brightest ``seed_stars`` first, then fourfold larger, then all,
+        # each without the stars earlier matches claimed.
+        pools: List[Optional[np.ndarray]] = [None] if engine == "ransac" else []
+        if order is not None:
+            pools = []
+            size = max(int(seed_stars), num_pattern_pts)
+            while size < num_stars:
+                pools.append(order[:size])
+                size *= 4
+            pools.append(None)
+        if taken is not None:
+            pools = [
+                np.flatnonzero(~taken) if pool is None else pool[~taken[pool]]
+                for pool in pools
+            ]
+            pools = [pool for pool in pools if len(pool) >= 2]
+
+        for pool in pools:
+            pool_size = num_stars if pool is None else len(pool)
+
+            def _budget() -> int:
+                inliers = max(int(best_match_info['num_inliers']), min_required_inliers)
+                return _ransac_budget(inliers, num_pattern_pts, pool_size, confidence, max_iterations)
+
+            drawn = 0
+            perfect = None
+            budget = _budget()
+            while drawn < budget:
+                # Batches start small and double, so easy searches stop after a handful of draws.
+                batch = min(budget - drawn, _RANSAC_BATCH, max(_RANSAC_FIRST_BATCH, drawn))
+                drawn += batch
+                stats.iterations += batch
+                # 1. Sample 2 pattern points and 2 stars per hypothesis, batch at a time
+                pattern_samples, star_samples = _draw_sample_pairs(rng, batch, num_pattern_pts, pool_size)
+                if pool is not None:
+                    star_samples = pool[star_samples]
+                src_samples = pattern_pixels[pattern_samples]
+                dst_samples = stars[star_samples]
+
+                # Avoid degenerate samples (points are too close)
+                usable = np.flatnonzero(
+                    (np.linalg.norm(src_samples[:, 0] - src_samples[:, 1], axis=1) >= 1e-6)
+                    & (np.linalg.norm(dst_samples[:, 0] - dst_samples[:, 1], axis=1) >= 1e-6)
+                )
+
+                # 2. Solve every hypothesis in closed form, 3. verify and 4. keep the best model
+                perfect = _consider(_similarity_from_pairs(src_samples[usable], dst_samples[usable]))
+
+                # Early exit if we found a perfect match
+                if perfect is not None:
+                    break
+                # Adaptive termination: a better model leaves fewer draws to be confident.
+                budget = _budget()
+
+            if perfect is not None:
+                stats.stop_reason = "perfect"
+            else:
+                stats.stop_reason = "budget" if drawn >= max_iterations else "confident"
+
+            if best_match_info['num_inliers'] >= min_required_inliers:
+                break
+
+        # --- Post-RANSAC Refinement ---
+        if best_match_info['num_inliers'] < min_required_inliers:
+            break # No (further) good match found
+
+        # 5. Refine the model using ALL inliers from the best hypothesis
+        inlier_pairs = np.array(best_match_info['inlier_indices'])
+        final_src_pts = pattern_pixels[inlier_pairs[:, 0]]
+        final_dst_pts = stars[inlier_pairs[:, 1]]
+
+        final_transform = _find_similarity_transform(final_src_pts, final_dst_pts)
+
+        # Verify the refined model on the entire pattern again
+        final_projected = _apply_transform(final_transform, pattern_pixels)
+        final_distances, final_indices = _nearest_free(star_tree, final_projected, tolerance, taken)
+
+        final_inliers_mask = final_distances < tolerance
+        final_score = np.mean(final_inliers_mask) # Score is the inlier ratio
+
+        if final_score < min_inliers_ratio:
+            break
 
-    for _ in range(max_iterations):
-        # 1. Randomly sample 2 points from pattern and stars
-        # Ensures we don't pick the same point twice
-        pattern_sample_indices = np.random.choice(num_pattern_pts, 2, replace=False)
-        star_sample_indices = np.random.choice(num_stars, 2, replace=False)
+        # Build the result
+        matched_indices = final_indices[final_inliers_mask].tolist()
+        points = stars[matched_indices]
 
-        src_sample = pattern_pixels[pattern_sample_indices]
-        dst_sample = stars[star_sample_indices]
+        # We can choose the first matched point as the "anchor"
+        anchor_index = matched_indices[0] if matched_indices else -1
 
-        # Avoid degenerate samples (points are too close)
-        if np.linalg.norm(src_sample[0] - src_sample[1]) < 1e-6 or \
-           np.linalg.norm(dst_sample[0] - dst_sample[1]) < 1e-6:
-            continue
+        matches.append(
+            PatternMatch(
+                anchor_index=anchor_index,
+                matched_indices=matched_indices,
+                points=points,
+                score=final_score,
+                pattern_indices=np.flatnonzero(final_inliers_mask).tolist(),
+            )
+        )
+        # Later occurrences may not reuse these stars, so they never overlap this one.
+        consumed[matched_indices] = True
 
-        # 2. Compute hypothetical transform
-        M_hypo = _find_similarity_transform(src_sample, dst_sample)
-        
-        # 3. Verify: project all pattern points and count inliers
-        projected_pattern = _apply_transform(M_hypo, pattern_pixels)
-        
-        # Find nearest stars to the projected points
-        distances, nearest_star_indices = star_tree.query(projected_pattern, k=1)
-        
-        # Identify inliers based on tolerance
-        inlier_mask = distances < tolerance
-        current_num_inliers = np.sum(inlier_mask)
-
-        # 4. Keep track of the best model
-        if current_num_inliers > best_match_info['num_inliers']:
-            # Find the global indices of the inlier stars
-            inlier_pattern_indices = np.where(inlier_mask)[0]
-            inlier_star_indices = nearest_star_indices[inlier_mask]
-
-            best_match_info = {
-                'inlier_indices': list(zip(inlier_pattern_indices, inlier_star_indices)),
-                'transform': M_hypo,
-                'num_inliers': current_num_inliers
-            }
-        
-        # Early exit if we found a perfect match
-        if current_num_inliers == num_pattern_pts:
-            break
-            
-    # --- Post-RANSAC Refinement ---
-    if best_match_info['num_inliers'] < min_required_inliers:
-        return [] # No good match found
-
-    # 5. Refine the model using ALL inliers from the best hypothesis
-    inlier_pairs = np.array(best_match_info['inlier_indices'])
-    final_src_pts = pattern_pixels[inlier_pairs[:, 0]]
-    final_dst_pts = stars[inlier_pairs[:, 1]]
-    
-    final_transform = _find_similarity_transform(final_src_pts, final_dst_pts)
-    
-    # Verify the refined model on the entire pattern again
-    final_projected = _apply_transform(final_transform, pattern_pixels)
-    final_distances, final_indices = star_tree.query(final_projected, k=1)
-    
-    final_inliers_mask = final_distances < tolerance
-    final_score = np.mean(final_inliers_mask) # Score is the inlier ratio
-
-    if final_score < min_inliers_ratio:
-        return []
-    
-    # Build the result
-    matched_indices = final_indices[final_inliers_mask].tolist()
-    points = stars[matched_indices]
-    
-    # We can choose the first matched point as the "anchor"
-    anchor_index = matched_indices[0] if matched_indices else -1
-    
-    match = PatternMatch(
-        anchor_index=anchor_index,
-        matched_indices=matched_indices,
-        points=points,
-        score=final_score
+    return matches
+
+
+def _match_catalog(
+    stars: np.ndarray,
+    pattern_rc: np.ndarray,
+    params: StarDetectionParams,
+    stats: Optional[MatchStats] = None,
+) -> List[PatternMatch]:
+    """Match against a ``(row, col, prominence)`` catalog with the ``match_*`` params."""
+
+    return match_pattern(
+        stars[:, :2],
+        pattern_rc,
+        params.tolerance_px,
+        params.match_max_iterations,
+        brightness=stars[:, 2],
+        seed_stars=params.match_seed_stars,
+        engine=params.match_engine,
+        rng=params.match_seed,
+        confidence=params.match_confidence,
+        stats=stats,
+        max_matches=params.match_max_matches,
+        verifier=params.match_verifier,
+        grid_cell=params.match_grid_cell,
     )
-    
-    # This implementation finds the single best match.
-    # To find multiple, non-overlapping matches, you would wrap this in a loop
-    # and remove the found stars from the 'stars' array on each iteration.
-    return [match]
 
 
 def _prepare_debug_canvas(img: np.ndarray) -> np.ndarray:
@@ -481,6 +1920,24 @@ def draw_debug_image(
     """Draw pattern, detected stars, and matches over the image for visual debugging."""
 
     canvas = _prepare_debug_canvas(img)
+    _draw_overlay(canvas, pattern_pixels, stars, matches)
+    if output is not None:
+        _write_canvas(canvas, Path(output))
+    return canvas
+
+
+def _write_canvas(canvas: np.ndarray, output_path: Path) -> None:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    cv2.imwrite(str(output_path), canvas)
+
+
+def _draw_overlay(
+    canvas: np.ndarray,
+    pattern_pixels: np.ndarray,
+    stars: np.ndarray,
+    matches: Sequence[PatternMatch],
+) -> None:
+    """Draw pattern (row/col), detected stars and matches onto an 8-bit BGR canvas in place."""
 
     if len(pattern_pixels):
         pts = [(float(col), float(row)) for row, col in pattern_pixels]
@@ -497,13 +1954,6 @@ def draw_debug_image(
         anchor = match.points[0]
         cv2.circle(canvas, (int(round(anchor[1])), int(round(anchor[0]))), 4, (0, 165, 255), -1)
 
-    if output is not None:
-        output_path = Path(output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        cv2.imwrite(str(output_path), canvas)
-
-    return canvas
-
 
 def find_pattern_in_image(
     image_path: Union[str, Path],
@@ -525,8 +1975,9 @@ def find_pattern_in_image(
     img, transform = load_tif_grayscale(image_path)
     pattern_pixels = linestring_to_pixels(lonlat, transform)
 
-    stars = detect_stars(img, params)
-    matches = match_pattern(stars, pattern_pixels, params.tolerance_px) if len(pattern_pixels) else []
+    stars = detect_stars(img, params, with_prominence=True)
+    matches = _match_catalog(stars, pattern_pixels, params) if len(pattern_pixels) else []
+    stars = stars[:, :2]
 
     debug_path: Optional[Path] = None
     if debug_output is not None:
@@ -578,44 +2029,408 @@ def _apply_star_param_overrides(
         return params
     for key, value in overrides.items():
         if hasattr(params, key):
+            # Enum members (e.g. the request's detector choice) carry their value.
+            value = getattr(value, "value", value)
             setattr(params, key, type(getattr(params, key))(value))
     return params
 
 
+def _cached_detection(
+    detect: Callable[[], np.ndarray],
+    params: StarDetectionParams,
+    catalog_cache: Optional[StarCatalogCache],
+    catalog_key: Optional[str],
+    source_name: str,
+    **cache_extra: Any,
+) -> np.ndarray:
+    use_cache = catalog_cache is not None and catalog_key is not None
+    if use_cache:
+        stars = catalog_cache.load(catalog_key, params, **cache_extra)
+        if stars is not None:
+            logger.info("Star catalog cache hit for %s (%d stars)", source_name, len(stars))
+            return stars
+    stars = detect()
+    if use_cache:
+        try:
+            catalog_cache.store(catalog_key, params, stars, **cache_extra)
+        except OSError:
+            logger.exception("Failed to store star catalog for %s", source_name)
+    return stars
+
+
+def _staged_detection(
+    load: Callable[[], Union[np.ndarray, WindowedRaster]],
+    params: StarDetectionParams,
+    catalog_cache: Optional[StarCatalogCache],
+    catalog_key: Optional[str],
+    source_name: str,
+    *,
+    valid: Optional[Callable[[], Optional[np.ndarray]]] = None,
+    **cache_extra: Any,
+) -> np.ndarray:
+    """Detect stars, reusing cached equalization and blob stages when only filter params differ.
+
+    Only single-pass in-memory detection has stages worth keeping; streamed, tiled and
+    background-skipping detection go straight to :func:`detect_stars`. ``load`` is only
+    called on a stage miss, ``valid`` (the nodata mask) only when background is skipped.
+    """
+
+    use_cache = (
+        catalog_cache is not None
+        and catalog_key is not None
+        and catalog_cache.caches_stages
+        and not params.skip_background
+    )
+    if use_cache:
+        cached = catalog_cache.load_stages(catalog_key, params, **cache_extra)
+        if cached is not None:
+            img, img_eq, blobs = cached
+            logger.info("Detection stage cache hit for %s (%d blobs)", source_name, len(blobs))
+            return _limit_stars(_select_stars(img, img_eq, blobs, params), params.max_stars)
+
+    with stage("load"):
+        image = load()
+    with stage("detect"):
+        if not use_cache or isinstance(image, WindowedRaster) or _is_tiled(image.shape, params):
+            mask = valid() if valid is not None and params.skip_background else None
+            return detect_stars(image, params, with_prominence=True, valid=mask)
+        img_eq, blobs = _equalize_and_find_blobs(image, params)
+        try:
+            catalog_cache.store_stages(catalog_key, params, image, img_eq, blobs, **cache_extra)
+        except OSError:
+            logger.exception("Failed to store detection stages for %s", source_name)
+        return _limit_stars(_select_stars(image, img_eq, blobs, params), params.max_stars)
+
+
+def ensure_overviews(path: Union[str, Path], levels: int) -> bool:
+    """Make sure the raster has ``levels`` power-of-two overviews, building them if missing.
+
+    Overviews are written to an external ``.ovr`` sidecar so the raster itself is never
+    modified. Returns ``False`` when they could not be built; decimated reads then fall
+    back to GDAL's on-the-fly resampling.
+    """
+
+    path = Path(path)
+    factors = [2**level for level in range(1, max(int(levels), 0) + 1)]
+    if not factors:
+        return True
+    try:
+        with rasterio.open(path) as src:
+            if src.overviews(1):
+                return True
+        with rasterio.Env(TIFF_USE_OVR=True), rasterio.open(path, "r+") as dst:
+            dst.build_overviews(factors, Resampling.average)
+        return True
+    except Exception:
+        logger.warning("Could not build overviews for %s", path, exc_info=True)
+        return False
+
+
+def _detect_coarse_peaks(img: np.ndarray, sigma: float, nsigma: float = 5.0) -> np.ndarray:
+    """Cheap point-source detector for decimated overviews.
+
+    On an overview, stars shrink to a pixel or two, which is below what the LoG blob
+    validation in ``_is_candidate_star`` accepts. Smoothed local maxima above a robust
+    (median + ``nsigma`` * MAD) background threshold are enough to propose candidates;
+    full-resolution refinement runs the real detector.
+    """
+
+    smooth = cv2.GaussianBlur(img.astype(np.float32, copy=False), (0, 0), max(float(sigma), 0.8))
+    background = float(np.median(smooth))
+    noise = 1.4826 * float(np.median(np.abs(smooth - background)))
+    peaks = (smooth == cv2.dilate(smooth, np.ones((3, 3), np.uint8))) & (smooth > background + nsigma * max(noise, 1e-6))
+    rows, cols = np.nonzero(peaks)
+    if not len(rows):
+        return _no_stars()
+
+    # Sub-pixel position from the intensity-weighted centroid of the 3x3 neighbourhood.
+    padded = np.pad(smooth, 1, mode="edge")
+    offsets = np.array([-1, 0, 1], dtype=np.float32)
+    patches = np.stack(
+        [padded[rows + 1 + dy, cols + 1 + dx] for dy in (-1, 0, 1) for dx in (-1, 0, 1)],
+        axis=1,
+    ).reshape(-1, 3, 3)
+    weights = np.clip(patches - background, 0, None)
+    total = weights.sum(axis=(1, 2))
+    total[total == 0] = 1.0
+    dy = (weights.sum(axis=2) * offsets).sum(axis=1) / total
+    dx = (weights.sum(axis=1) * offsets).sum(axis=1) / total
+    return np.column_stack([rows + dy, cols + dx, smooth[rows, cols] - background]).astype(np.float32)
+
+
+def _merge_boxes(boxes: Sequence[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+    """Union overlapping ``(row0, col0, row1, col1)`` boxes until no two overlap."""
+
+    merged: List[Tuple[int, int, int, int]] = []
+    for box in sorted(boxes):
+        absorbed = True
+        while absorbed:
+            absorbed = False
+            for other in merged:
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    merged.remove(other)
+                    box = (min(box[0], other[0]), min(box[1], other[1]), max(box[2], other[2]), max(box[3], other[3]))
+                    absorbed = True
+                    break
+        merged.append(box)
+    return merged
+
+
+def _coarse_to_fine_match(
+    loader: WindowedRaster,
+    pattern: Pattern,
+    params: StarDetectionParams,
+    levels: int,
+    *,
+    catalog_cache: Optional[StarCatalogCache] = None,
+    catalog_key: Optional[str] = None,
+    cache_extra: Optional[Dict[str, Any]] = None,
+    stats: Optional[MatchStats] = None,
+) -> Tuple[np.ndarray, List[PatternMatch], str]:
+    """Match on a decimated overview first, then refine only around the coarse candidates.
+
+    Returns full-resolution ``(row, col, prominence)`` stars and the refined matches. With
+    ``match_max_matches > 1`` every coarse candidate gets its own window. When no
+    coarse candidate is found the coarse catalog, scaled back to full resolution, is
+    returned with no matches. The third value is the catalog's scope (see
+    :attr:`MatchResult.stars_scope`). ``stats`` accumulates both matching passes.
+    """
+
+    height, width = loader.shape
+    factor = 2 ** max(int(levels), 0)
+    while factor > 1 and min(height, width) // factor < COARSE_MIN_SIDE:
+        factor //= 2
+    if factor == 1:
+        stars = _limit_stars(_detect_stars_windowed(loader, params), params.max_stars)
+        return stars, _match_catalog(stars, pattern.points_rc, params, stats), "full"
+
+    coarse_params = replace(
+        params,
+        min_sigma=max(params.min_sigma / factor, 1.0),
+        max_sigma=max(params.max_sigma / factor, 1.0),
+        tolerance_px=max(params.tolerance_px / factor, 1.0),
+    )
+    max_side = int(math.ceil(max(height, width) / factor))
+    scale = min(1.0, float(max_side) / float(max(height, width)))
+
+    def _detect_coarse() -> np.ndarray:
+        coarse_img, _ = loader.read_decimated(max_side)
+        return _limit_stars(_detect_coarse_peaks(coarse_img, coarse_params.min_sigma), params.max_stars)
+
+    coarse_stars = _cached_detection(
+        _detect_coarse,
+        coarse_params,
+        catalog_cache,
+        catalog_key,
+        str(loader.dataset.name),
+        coarse_factor=factor,
+        coarse_detector="peaks",
+        **(cache_extra or {}),
+    )
+    coarse_matches = _match_catalog(coarse_stars, pattern.points_rc * scale, coarse_params, stats)
+    if not coarse_matches:
+        coarse_stars = coarse_stars.astype(np.float32, copy=True)
+        coarse_stars[:, :2] /= scale
+        return coarse_stars, [], "coarse"
+
+    # One refinement window per coarse candidate, overlapping ones merged so no star is
+    # detected twice.
+    boxes: List[Tuple[int, int, int, int]] = []
+    for coarse_match in coarse_matches:
+        candidate = np.asarray(coarse_match.points, dtype=np.float32) / scale
+        low = candidate.min(axis=0)
+        high = candidate.max(axis=0)
+        extent = float(np.max(high - low))
+        pad = _detection_halo(params) + params.tolerance_px + 0.25 * extent + factor
+        boxes.append(
+            (
+                max(int(math.floor(low[0] - pad)), 0),
+                max(int(math.floor(low[1] - pad)), 0),
+                min(int(math.ceil(high[0] + pad)), height),
+                min(int(math.ceil(high[1] + pad)), width),
+            )
+        )
+    parts = []
+    for row0, col0, row1, col1 in _merge_boxes(boxes):
+        logger.info(
+            "Refining coarse candidate (factor %d) in window rows %d-%d cols %d-%d",
+            factor,
+            row0,
+            row1,
+            col0,
+            col1,
+        )
+        parts.append(_detect_stars_windowed(loader, params, Window(col0, row0, col1 - col0, row1 - row0)))
+
+    fine_stars = _limit_stars(np.concatenate(parts) if len(parts) > 1 else parts[0], params.max_stars)
+    return fine_stars, _match_catalog(fine_stars, pattern.points_rc, params, stats), "windows"
+
+
+def _scale_matches(matches: Sequence[PatternMatch], scale: float) -> List[PatternMatch]:
+    if scale == 1.0:
+        return list(matches)
+    return [
+        PatternMatch(
+            anchor_index=match.anchor_index,
+            matched_indices=match.matched_indices,
+            points=np.asarray(match.points, dtype=np.float32) * scale,
+            score=match.score,
+            pattern_indices=match.pattern_indices,
+        )
+        for match in matches
+    ]
+
+
+def _preview_canvas(
+    source: Union[ImageSource, np.ndarray], max_side: int
+) -> Tuple[np.ndarray, float, str]:
+    """Return an 8-bit canvas to draw on, the full-resolution -> canvas scale and a file stem."""
+
+    if isinstance(source, RasterContext):
+        canvas, scale = source.debug_canvas(max_side)
+        return canvas, scale, source.name
+    if isinstance(source, np.ndarray):
+        return _prepare_debug_canvas(source), 1.0, "image"
+    if isinstance(source, WindowedRaster):
+        img, scale = source.read_decimated(max_side)
+        return _prepare_debug_canvas(img), scale, source.name
+    path = Path(source)
+    img, _ = load_tif_grayscale(path)
+    return _prepare_debug_canvas(img), 1.0, path.stem
+
+
+def _match_points_xy(match: PatternMatch) -> np.ndarray:
+    return np.column_stack([match.points[:, 1], match.points[:, 0]]).astype(np.float32)
+
+
+def _match_transform(pattern: Pattern, match: PatternMatch) -> Optional[np.ndarray]:
+    """Pattern-to-image similarity of ``match`` in (x, y), fitted on its matched points only."""
+
+    matched_points_xy = _match_points_xy(match)
+    pattern_xy = pattern.points if match.pattern_indices is None else pattern.points[match.pattern_indices]
+    if pattern_xy.shape[0] < 2 or matched_points_xy.shape[0] < 2:
+        return None
+    matrix, _ = cv2.estimateAffinePartial2D(
+        pattern_xy.astype(np.float32),
+        matched_points_xy,
+        method=cv2.LMEDS,
+    )
+    return matrix.astype(np.float32) if matrix is not None else None
+
+
 def search_in_image(
-    image_path: Union[str, Path],
+    image_path: ImageSource,
     pattern: Pattern,
     star_params: Optional[Dict[str, Any]] = None,
     verify_tol_px: Optional[float] = None,
     *,
     debug_output: Optional[Union[str, Path]] = None,
+    preview_max_side: int = PREVIEW_MAX_SIDE,
+    catalog_cache: Optional[StarCatalogCache] = None,
+    catalog_key: Optional[str] = None,
+    coarse_levels: int = 0,
 ) -> MatchResult:
-    path = Path(image_path)
-    img, _ = load_tif_grayscale(path)
+    """Detect stars in the image and match the pattern against them.
+
+    When ``catalog_cache`` and ``catalog_key`` are given, a previously stored catalog for
+    the same source and detection parameters is reused and the image is only decoded if
+    it is actually needed (cache miss or debug output).
+
+    ``coarse_levels > 0`` enables coarse-to-fine search: stars are detected and matched on
+    an overview ``2 ** coarse_levels`` times smaller, and only the windows around the coarse
+    candidates are re-detected at full resolution.
+
+    ``match_max_matches`` in ``star_params`` asks for several non-overlapping occurrences:
+    ``matches`` and ``match_transforms`` then list them all, best first, while ``score``,
+    ``transform`` and ``matched_points_img`` describe the best one.
+
+    In coarse-to-fine mode ``stars_xy`` is not the whole image's catalog; ``stars_scope``
+    says what it covers.
+    """
+
+    image: Union[np.ndarray, WindowedRaster, None] = None
+    cache_extra: Dict[str, Any] = {}
+    raster: Optional[RasterContext] = None
+    if isinstance(image_path, RasterContext):
+        raster = image_path
+        source_name = raster.path
+        if raster.streaming:
+            cache_extra["window_size"] = raster.loader.window_size
+        if raster.cache_tag:
+            cache_extra["view"] = raster.cache_tag
+        bands_tag = band_selection_tag(raster.loader.bands)
+    elif isinstance(image_path, WindowedRaster):
+        image = image_path
+        source_name = str(image_path.dataset.name)
+        cache_extra["window_size"] = image_path.window_size
+        bands_tag = band_selection_tag(image_path.bands)
+    else:
+        path = Path(image_path)
+        source_name = str(path)
+        bands_tag = None
+    if bands_tag is not None:
+        cache_extra["bands"] = bands_tag
 
     params = StarDetectionParams()
     params = _apply_star_param_overrides(params, star_params)
     if verify_tol_px is not None:
         params.tolerance_px = float(verify_tol_px)
 
-    stars_rc = detect_stars(img, params)
-    matches = match_pattern(stars_rc, pattern.points_rc, params.tolerance_px)
+    match_stats = MatchStats()
+    stars_scope = "full"
+    if coarse_levels > 0:
+        if raster is not None:
+            loader, owns_loader = raster.loader, False
+        elif isinstance(image, WindowedRaster):
+            loader, owns_loader = image, False
+        else:
+            ensure_overviews(path, coarse_levels)
+            loader, owns_loader = WindowedRaster.open(path), True
+        try:
+            with stage("coarse_to_fine"):
+                stars_rc, matches, stars_scope = _coarse_to_fine_match(
+                    loader,
+                    pattern,
+                    params,
+                    coarse_levels,
+                    catalog_cache=catalog_cache,
+                    catalog_key=catalog_key,
+                    cache_extra=cache_extra,
+                    stats=match_stats,
+                )
+        finally:
+            if owns_loader:
+                loader.close()
+    else:
 
-    best = matches[0] if matches else None
-    matched_points_xy: Optional[np.ndarray] = None
-    transform: Optional[np.ndarray] = None
-    score = float(best.score) if best else 0.0
+        def _load() -> Union[np.ndarray, WindowedRaster]:
+            nonlocal image
+            if raster is not None:
+                image = raster.detection_source()
+            elif image is None:
+                image, _ = load_tif_grayscale(path)
+            return image
 
-    if best is not None:
-        matched_points_xy = np.column_stack([best.points[:, 1], best.points[:, 0]]).astype(np.float32)
-        if pattern.points.shape[0] >= 2 and matched_points_xy.shape[0] >= 2:
-            matrix, _ = cv2.estimateAffinePartial2D(
-                pattern.points.astype(np.float32),
-                matched_points_xy,
-                method=cv2.LMEDS,
+        def _valid() -> Optional[np.ndarray]:
+            return raster.valid_mask() if raster is not None else None
+
+        def _detect() -> np.ndarray:
+            return _staged_detection(
+                _load, params, catalog_cache, catalog_key, source_name, valid=_valid, **cache_extra
             )
-            if matrix is not None:
-                transform = matrix.astype(np.float32)
+
+        stars_rc = _cached_detection(_detect, params, catalog_cache, catalog_key, source_name, **cache_extra)
+        with stage("match"):
+            matches = _match_catalog(stars_rc, pattern.points_rc, params, match_stats)
+
+    prominence = stars_rc[:, 2].astype(np.float32) if len(stars_rc) else None
+    stars_rc = stars_rc[:, :2]
+
+    best = matches[0] if matches else None
+    match_transforms = [_match_transform(pattern, match) for match in matches]
+    matched_points_xy = _match_points_xy(best) if best is not None else None
+    transform = match_transforms[0] if matches else None
+    score = float(best.score) if best else 0.0
 
     stars_xy = (
         np.column_stack([stars_rc[:, 1], stars_rc[:, 0]]).astype(np.float32)
@@ -625,7 +2440,10 @@ def search_in_image(
 
     if debug_output is not None:
         debug_path = Path(debug_output)
-        draw_debug_image(img, pattern.points_rc, stars_rc, matches, output=debug_path)
+        preview_source = raster if raster is not None else (image if image is not None else path)
+        canvas, scale, _ = _preview_canvas(preview_source, preview_max_side)
+        _draw_overlay(canvas, pattern.points_rc * scale, stars_rc * scale, _scale_matches(matches, scale))
+        _write_canvas(canvas, debug_path)
 
     return MatchResult(
         success=best is not None,
@@ -634,23 +2452,27 @@ def search_in_image(
         matched_points_img=matched_points_xy,
         matches=matches,
         stars_xy=stars_xy,
-        image_path=str(path),
+        image_path=source_name,
+        star_prominence=prominence,
+        match_stats=match_stats,
+        match_transforms=match_transforms,
+        stars_scope=stars_scope,
     )
 
 
 def visualize_match(
-    image_path: Union[str, Path],
+    image_path: ImageSource,
     pattern: Pattern,
     match_result: MatchResult,
     out_dir: Union[str, Path],
     *,
     filename: Optional[str] = None,
+    preview_max_side: int = PREVIEW_MAX_SIDE,
 ) -> str:
-    base = Path(image_path)
     out_directory = Path(out_dir)
     out_directory.mkdir(parents=True, exist_ok=True)
 
-    img, _ = load_tif_grayscale(base)
+    canvas, scale, stem = _preview_canvas(image_path, preview_max_side)
     stars_rc = (
         np.column_stack([match_result.stars_xy[:, 1], match_result.stars_xy[:, 0]]).astype(np.float32)
         if match_result.stars_xy is not None and len(match_result.stars_xy)
@@ -658,66 +2480,69 @@ def visualize_match(
     )
 
     matches = match_result.matches
-    best = match_result.best_match()
-    if best is not None:
-        matches = [best]
 
-    output_name = filename or f"{base.stem}_match.png"
+    output_name = filename or f"{stem}_match.png"
     output_path = out_directory / output_name
-    draw_debug_image(img, pattern.points_rc, stars_rc, matches, output=output_path)
+    _draw_overlay(canvas, pattern.points_rc * scale, stars_rc * scale, _scale_matches(matches, scale))
+    _write_canvas(canvas, output_path)
     return str(output_path)
 
 
 def visualize_stars(
-    image_path: Union[str, Path],
+    image_path: ImageSource,
     stars_xy: Optional[np.ndarray],
     out_dir: Union[str, Path],
     *,
     projected_pattern: Optional[np.ndarray] = None,
     matched_points: Optional[np.ndarray] = None,
     filename: Optional[str] = None,
+    preview_max_side: int = PREVIEW_MAX_SIDE,
 ) -> str:
-    base = Path(image_path)
     out_directory = Path(out_dir)
     out_directory.mkdir(parents=True, exist_ok=True)
 
-    img, _ = load_tif_grayscale(base)
-    canvas = _prepare_debug_canvas(img)
+    canvas, scale, stem = _preview_canvas(image_path, preview_max_side)
 
     if stars_xy is not None and len(stars_xy):
-        for x, y in stars_xy:
+        for x, y in np.asarray(stars_xy, dtype=np.float32) * scale:
             cv2.circle(canvas, (int(round(x)), int(round(y))), 3, (0, 255, 255), 1)
 
     if projected_pattern is not None and len(projected_pattern) >= 2:
-        pts = np.asarray(projected_pattern, dtype=np.float32)
+        pts = np.asarray(projected_pattern, dtype=np.float32) * scale
         pts_int = pts.reshape((-1, 1, 2)).astype(np.int32)
         cv2.polylines(canvas, [pts_int], isClosed=False, color=(0, 0, 255), thickness=2)
 
     if matched_points is not None and len(matched_points):
-        pts = np.asarray(matched_points, dtype=np.float32)
+        pts = np.asarray(matched_points, dtype=np.float32) * scale
         pts_int = pts.reshape((-1, 1, 2)).astype(np.int32)
         cv2.polylines(canvas, [pts_int], isClosed=False, color=(0, 255, 0), thickness=2)
         for x, y in pts:
             cv2.circle(canvas, (int(round(x)), int(round(y))), 8, (0, 165, 255), -1)
 
-    output_name = filename or f"{base.stem}_stars.png"
+    output_name = filename or f"{stem}_stars.png"
     output_path = out_directory / output_name
     cv2.imwrite(str(output_path), canvas)
     return str(output_path)
 
 
 __all__ = [
+    "BandSelection",
     "StarDetectionParams",
     "PatternMatch",
     "PatternFinderResult",
     "Pattern",
     "MatchResult",
+    "MatchStats",
     "load_tif_grayscale",
     "load_tif_gray",
+    "WindowedRaster",
+    "RasterContext",
+    "band_selection_tag",
     "linestring_to_pixels",
     "line_string_to_points",
     "build_pattern",
     "detect_stars",
+    "ensure_overviews",
     "match_pattern",
     "draw_debug_image",
     "find_pattern_in_image",
@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import subprocess
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 import os
 import numpy as np
 import rasterio
@@ -20,17 +21,26 @@ from ..models import (
     DatasetDetailModel,
     DatasetFileModel,
     SearchDatasetRequest,
+    SearchMode,
+    SearchMatchItem,
     SearchResultItem,
 )
 from ..services.pattern_core import (
     MatchResult,
     Pattern,
+    RasterContext,
     build_pattern,
     line_string_to_points,
     search_in_image,
     visualize_match,
     visualize_stars,
 )
+from ..services.conversion_cache import get_conversion_cache
+from ..services.executor import get_executor
+from ..services.mbtiles import open_mbtiles_context
+from ..services.profiling import StageProfiler, stage
+from ..services.star_catalog import dataset_file_source_key, get_catalog_cache
+from ..cache import file_digest
 from ..clients.dataset_server import DatasetServerClient
 
 
@@ -118,7 +128,11 @@ def _pixel_points_to_lonlat(
     return coords
 
 
-def build_match_geojson(search_path: Path, pattern: Pattern, match_result: MatchResult) -> Optional[Dict[str, Any]]:
+def build_match_geojson(
+    source: Union[Path, RasterContext],
+    pattern: Pattern,
+    match_result: MatchResult,
+) -> Optional[Dict[str, Any]]:
     if match_result.matched_points_img is not None and len(match_result.matched_points_img) >= 2:
         pixel_pts = match_result.matched_points_img
     else:
@@ -128,51 +142,70 @@ def build_match_geojson(search_path: Path, pattern: Pattern, match_result: Match
     if pixel_pts is None or pixel_pts.shape[0] < 2:
         return None
 
+    # The best occurrence first, then any further ones found with ``match_max_matches``.
+    occurrences = [(pixel_pts, float(match_result.score))] + [
+        (np.column_stack([match.points[:, 1], match.points[:, 0]]), float(match.score))
+        for match in match_result.matches[1:]
+        if len(match.points) >= 2
+    ]
+
     try:
-        with rasterio.open(str(search_path)) as dataset:
-            coords = _pixel_points_to_lonlat(dataset, pixel_pts)
+        if isinstance(source, RasterContext):
+            coords_list = [_pixel_points_to_lonlat(source.dataset, pts) for pts, _ in occurrences]
+        else:
+            with rasterio.open(str(source)) as dataset:
+                coords_list = [_pixel_points_to_lonlat(dataset, pts) for pts, _ in occurrences]
     except Exception as exc:
         logger.exception(
             "Failed to construct geojson for match",
             {
-                "path": str(search_path),
+                "path": source.path if isinstance(source, RasterContext) else str(source),
                 "dataset_id": getattr(match_result, "image_path", "unknown"),
                 "error": str(exc),
             },
         )
         return None
 
-    if coords is None or len(coords) < 2:
+    if coords_list[0] is None or len(coords_list[0]) < 2:
         return None
 
-    polygon_coords = coords + [coords[0]]
+    features: List[Dict[str, Any]] = []
+    for occurrence, ((_, score), coords) in enumerate(zip(occurrences, coords_list)):
+        if coords is None or len(coords) < 2:
+            continue
+        polygon_coords = coords + [coords[0]]
+        features.extend(
+            [
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "kind": "pattern-line",
+                        "score": score,
+                        "occurrence": occurrence,
+                    },
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": coords,
+                    },
+                },
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "kind": "pattern-polygon",
+                        "score": score,
+                        "occurrence": occurrence,
+                    },
+                    "geometry": {
+                        "type": "Polygon",
+                        "coordinates": [polygon_coords],
+                    },
+                },
+            ]
+        )
 
     return {
         "type": "FeatureCollection",
-        "features": [
-            {
-                "type": "Feature",
-                "properties": {
-                    "kind": "pattern-line",
-                    "score": float(match_result.score),
-                },
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": coords,
-                },
-            },
-            {
-                "type": "Feature",
-                "properties": {
-                    "kind": "pattern-polygon",
-                    "score": float(match_result.score),
-                },
-                "geometry": {
-                    "type": "Polygon",
-                    "coordinates": [polygon_coords],
-                },
-            },
-        ],
+        "features": features,
     }
 
 
@@ -196,6 +229,17 @@ def resolve_asset_source(
     raise HTTPException(status_code=404, detail=f"No downloadable assets available for dataset file {file.id}.")
 
 
+def _asset_version(file: DatasetFileModel, asset_kind: str) -> Optional[str]:
+    """Version stamp the asset cache keys downloads by, when the dataset server provides one."""
+
+    if file.updated_at is None:
+        return None
+    stamp = file.updated_at.isoformat()
+    if asset_kind == "mbtiles":
+        return f"{stamp}:{file.mbtiles_key or ''}"
+    return stamp
+
+
 async def download_dataset_asset(
     client: DatasetServerClient,
     dataset_id: str,
@@ -207,22 +251,23 @@ async def download_dataset_asset(
     use_admin_endpoints: bool,
 ) -> int:
     destination.parent.mkdir(parents=True, exist_ok=True)
+    version = _asset_version(file, asset_kind)
     try:
         if asset_kind == "mbtiles":
             if use_admin_endpoints:
-                return await client.download_admin_mbtiles(dataset_id, file.id, destination, headers=headers)
-            return await client.download_public_mbtiles(dataset_id, file.id, destination, headers=headers)
+                return await client.download_admin_mbtiles(dataset_id, file.id, destination, headers=headers, version=version)
+            return await client.download_public_mbtiles(dataset_id, file.id, destination, headers=headers, version=version)
         if use_admin_endpoints:
-            return await client.download_admin_file(dataset_id, file.id, destination, headers=headers)
-        return await client.download_public_file(dataset_id, file.id, destination, headers=headers)
+            return await client.download_admin_file(dataset_id, file.id, destination, headers=headers, version=version)
+        return await client.download_public_file(dataset_id, file.id, destination, headers=headers, version=version)
     except HTTPException:
         if destination.exists():
             destination.unlink(missing_ok=True)
         raise
 
 
-async def convert_mbtiles_to_geotiff(mbtiles_path: Path) -> Path:
-    tif_path = mbtiles_path.with_suffix(".tif")
+async def convert_mbtiles_to_geotiff(mbtiles_path: Path, target: Optional[Path] = None) -> Path:
+    tif_path = target if target is not None else mbtiles_path.with_suffix(".tif")
     if tif_path.exists():
         tif_path.unlink()
     command = [
@@ -309,6 +354,240 @@ async def convert_mbtiles_to_geotiff(mbtiles_path: Path) -> Path:
     return tif_path
 
 
+def _catalog_source_key(file: DatasetFileModel, asset_kind: str, search_path: Path) -> str:
+    """Identify raster contents for the star-catalog cache, hashing the file only when needed."""
+
+    if file.updated_at is not None:
+        return dataset_file_source_key(file.id, file.updated_at, asset_kind)
+    return f"sha256:{file_digest(search_path)}"
+
+
+def _failed_result(file: DatasetFileModel, asset_kind: str, message: str) -> SearchResultItem:
+    return SearchResultItem(
+        dataset_file_id=file.id,
+        dataset_file_name=file.original_filename,
+        asset_kind=asset_kind,
+        success=False,
+        score=0.0,
+        score_above_threshold=False,
+        transform=None,
+        matched_points_image=None,
+        preview_path=None,
+        preview_url=None,
+        stars_path=None,
+        stars_url=None,
+        geojson=None,
+        message=message,
+    )
+
+
+def _result_url(result_full_path: str, config: ServiceConfig) -> Tuple[str, Optional[str]]:
+    rel_path = _relative_result_path(result_full_path, config)
+    if rel_path is None:
+        return result_full_path, None
+    rel_str = rel_path.as_posix()
+    return rel_str, f"/results/{rel_str}"
+
+
+def _open_raster_context(
+    search_path: Path,
+    base_points: List[Tuple[float, float]],
+    config: ServiceConfig,
+) -> RasterContext:
+    if search_path.suffix.lower() == ".mbtiles":
+        return open_mbtiles_context(
+            search_path,
+            line_points=base_points,
+            zoom=config.mbtiles_zoom,
+            padding=config.mbtiles_aoi_padding,
+            window_size=config.raster_window_size,
+        )
+    return RasterContext.open(
+        search_path,
+        window_size=config.raster_window_size,
+        stream_threshold_pixels=config.stream_threshold_pixels,
+        bands=config.gray_bands,
+    )
+
+
+def _search_raster_file(
+    search_path: Path,
+    file: DatasetFileModel,
+    asset_kind: str,
+    fallback_used: bool,
+    **options: Any,
+) -> SearchResultItem:
+    """Executor entry point: :func:`_search_raster_stages`, profiled when ``profile_stages`` is on."""
+
+    config: ServiceConfig = options["config"]
+    if not config.profile_stages:
+        return _search_raster_stages(search_path, file, asset_kind, fallback_used, **options)
+    with StageProfiler() as profiler:
+        item = _search_raster_stages(search_path, file, asset_kind, fallback_used, **options)
+    logger.info(
+        "Search stage profile",
+        {
+            "dataset_id": options["dataset_id"],
+            "file_id": file.id,
+            "exact_peaks": profiler.exact,
+            "stages": profiler.report(),
+        },
+    )
+    return item
+
+
+def _search_raster_stages(
+    search_path: Path,
+    file: DatasetFileModel,
+    asset_kind: str,
+    fallback_used: bool,
+    *,
+    dataset_id: str,
+    payload: SearchDatasetRequest,
+    base_points: List[Tuple[float, float]],
+    star_params_dict: Optional[Dict[str, Any]],
+    preview_dir: Path,
+    stars_dir: Path,
+    config: ServiceConfig,
+) -> SearchResultItem:
+    """Run every CPU/raster stage for one file against a single shared RasterContext.
+
+    The raster is opened once and decoded at most once; pattern conversion, detection,
+    previews and the GeoJSON export all read from the same context. Everything runs on
+    one thread, so the dataset handle is never shared across threads.
+    """
+
+    log_context = {"dataset_id": dataset_id, "file_id": file.id, "asset_kind": asset_kind}
+    catalog_cache = get_catalog_cache(config)
+    coarse_levels = payload.pyramid_levels if payload.search_mode == SearchMode.COARSE_TO_FINE else 0
+
+    try:
+        with stage("open"):
+            raster = _open_raster_context(search_path, base_points, config)
+    except Exception as exc:  # pragma: no cover
+        logger.exception("Failed to open raster", log_context)
+        return _failed_result(file, asset_kind, str(exc))
+
+    with raster:
+        try:
+            # Konvertáljuk a bemeneti vonal pontokat pixel koordinátákra az aktuális raszterben
+            pattern_xy = _line_points_to_pixels(raster.dataset, base_points)
+            if pattern_xy is None or pattern_xy.shape[0] < 2:
+                raise HTTPException(status_code=400, detail="Pattern line points conversion failed")
+            pattern = build_pattern(pattern_xy, name=payload.pattern_name)
+
+            catalog_key = (
+                _catalog_source_key(file, asset_kind, search_path) if catalog_cache is not None else None
+            )
+            with stage("search"):
+                match_result: MatchResult = search_in_image(
+                    raster,
+                    pattern,
+                    star_params_dict,
+                    payload.verify_tol_px,
+                    catalog_cache=catalog_cache,
+                    catalog_key=catalog_key,
+                    coarse_levels=coarse_levels,
+                )
+        except Exception as exc:  # pragma: no cover
+            logger.exception("Pattern search failed", log_context)
+            return _failed_result(file, asset_kind, str(exc))
+
+        if match_result.match_stats is not None:
+            logger.info(
+                "Pattern match stats",
+                {**log_context, **match_result.match_stats.to_dict(), "matches": len(match_result.matches)},
+            )
+
+        score_above_threshold = bool(match_result.score >= payload.score_threshold)
+        success = bool(match_result.transform is not None and score_above_threshold)
+        transform_list = match_result.transform.tolist() if match_result.transform is not None else None
+        matched_points = (
+            match_result.matched_points_img.tolist() if match_result.matched_points_img is not None else None
+        )
+        match_items = [
+            SearchMatchItem(
+                score=float(match.score),
+                transform=match_transform.tolist() if match_transform is not None else None,
+                matched_points_image=np.column_stack([match.points[:, 1], match.points[:, 0]]).tolist(),
+            )
+            for match, match_transform in zip(match_result.matches, match_result.match_transforms)
+        ]
+
+        preview_path_str = None
+        preview_url = None
+        stars_path_str = None
+        stars_url = None
+        geojson_feature = None
+        if success and payload.generate_previews:
+            try:
+                with stage("preview"):
+                    preview_full = visualize_match(raster, pattern, match_result, str(preview_dir))
+                preview_path_str, preview_url = _result_url(preview_full, config)
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to generate preview", log_context)
+
+        if payload.generate_previews and match_result.stars_xy is not None:
+            try:
+                projected_pattern = _project_pattern_points(pattern, match_result)
+                with stage("stars_preview"):
+                    stars_full = visualize_stars(
+                        raster,
+                        match_result.stars_xy,
+                        str(stars_dir),
+                        projected_pattern=projected_pattern,
+                        matched_points=match_result.matched_points_img,
+                        # A partial catalog is labelled as such in the file name too.
+                        filename=(
+                            f"{raster.name}_stars_{match_result.stars_scope}.png"
+                            if match_result.stars_scope != "full"
+                            else None
+                        ),
+                    )
+                stars_path_str, stars_url = _result_url(stars_full, config)
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to generate stars visualization", log_context)
+
+        if success:
+            try:
+                with stage("geojson"):
+                    geojson_feature = build_match_geojson(raster, pattern, match_result)
+            except Exception:  # pragma: no cover
+                logger.exception("Failed to generate match geojson", log_context)
+
+    message_parts: List[str] = []
+    if fallback_used:
+        if asset_kind == "mbtiles":
+            message_parts.append("Original file unavailable, MBTiles variant was used.")
+        else:
+            message_parts.append("MBTiles variant unavailable, original file was used.")
+    if not success:
+        message_parts.append("Pattern verification did not meet the success criteria.")
+    if match_result.stars_scope == "windows":
+        message_parts.append("Star catalog covers only the coarse-to-fine refinement windows.")
+    elif match_result.stars_scope == "coarse":
+        message_parts.append("Star catalog comes from the coarse overview only.")
+
+    return SearchResultItem(
+        dataset_file_id=file.id,
+        dataset_file_name=file.original_filename,
+        asset_kind=asset_kind,
+        success=success,
+        score=float(match_result.score),
+        score_above_threshold=score_above_threshold,
+        transform=transform_list,
+        matched_points_image=matched_points,
+        preview_path=preview_path_str,
+        preview_url=preview_url,
+        stars_path=stars_path_str,
+        stars_url=stars_url,
+        stars_scope=match_result.stars_scope,
+        geojson=geojson_feature,
+        matches=match_items,
+        message=" ".join(message_parts) if message_parts else None,
+    )
+
+
 def _relative_result_path(result_full_path: str, config: ServiceConfig) -> Optional[Path]:
     try:
         return Path(result_full_path).resolve().relative_to(config.results_dir)
@@ -327,7 +606,11 @@ async def execute_search(
     use_admin_endpoints: bool = False,
 ) -> Tuple[List[SearchResultItem], List[str]]:
     base_points = [point.as_tuple() for point in payload.line_points]
-    star_params_dict = payload.star_params.dict(exclude_none=True) if payload.star_params else None
+    # Cached conversions get overviews for coarse-to-fine searches; per-run downloads are
+    # deleted right after the search, so they use GDAL's decimated reads instead.
+    overview_levels = payload.pyramid_levels if payload.search_mode == SearchMode.COARSE_TO_FINE else 0
+    # Field names, not the camelCase aliases: the overrides are applied by attribute name.
+    star_params_dict = payload.star_params.dict(exclude_none=True, by_alias=False) if payload.star_params else None
 
     run_dir = config.results_dir / run_id
     run_dir.mkdir(parents=True, exist_ok=True)
@@ -336,42 +619,28 @@ async def execute_search(
     stars_dir = run_dir / "stars"
     stars_dir.mkdir(parents=True, exist_ok=True)
 
-    results: List[SearchResultItem] = []
-    used_file_ids: List[str] = []
+    # Files enter the pipeline in order (asyncio semaphores are FIFO); ``depth`` bounds how
+    # many are in flight so downloads run ahead of the searches without filling the disk.
+    depth = asyncio.Semaphore(config.pipeline_depth)
+    download_slots = asyncio.Semaphore(config.download_concurrency)
+    convert_slots = asyncio.Semaphore(config.convert_concurrency)
+    search_slots = asyncio.Semaphore(config.search_concurrency)
+    executor = get_executor(config)
 
-    with tempfile.TemporaryDirectory(prefix=f"pattern_{run_id}_") as tmp_root:
-        tmp_dir = Path(tmp_root)
-        for file in files:
-            try:
-                asset_kind, fallback_used = resolve_asset_source(
-                    file,
-                    payload.asset_preference,
-                )
-            except HTTPException as exc:
-                results.append(
-                    SearchResultItem(
-                        dataset_file_id=file.id,
-                        dataset_file_name=file.original_filename,
-                        asset_kind="unavailable",
-                        success=False,
-                        score=0.0,
-                        score_above_threshold=False,
-                        transform=None,
-                        matched_points_image=None,
-                        preview_path=None,
-                        preview_url=None,
-                        stars_path=None,
-                        stars_url=None,
-                        geojson=None,
-                        message=str(exc.detail),
-                    )
-                )
-                continue
+    async def _process(file: DatasetFileModel, tmp_dir: Path) -> Tuple[SearchResultItem, bool]:
+        try:
+            asset_kind, fallback_used = resolve_asset_source(
+                file,
+                payload.asset_preference,
+            )
+        except HTTPException as exc:
+            return _failed_result(file, "unavailable", str(exc.detail)), False
 
-            suffix = ".mbtiles" if asset_kind == "mbtiles" else (Path(file.original_filename).suffix or ".tif")
-            filename = f"{sanitize_filename(file.id)}{suffix}"
-            destination = tmp_dir / filename
-            try:
+        suffix = ".mbtiles" if asset_kind == "mbtiles" else (Path(file.original_filename).suffix or ".tif")
+        filename = f"{sanitize_filename(file.id)}{suffix}"
+        destination = tmp_dir / filename
+        try:
+            async with download_slots:
                 bytes_downloaded = await download_dataset_asset(
                     client,
                     dataset.id,
@@ -381,215 +650,80 @@ async def execute_search(
                     headers=request_headers,
                     use_admin_endpoints=use_admin_endpoints,
                 )
-                if config.max_download_bytes is not None and bytes_downloaded > config.max_download_bytes:
-                    raise HTTPException(status_code=413, detail="Downloaded asset exceeded configured size limit.")
-                logger.info(
-                    "Downloaded dataset asset",
-                    {
-                        "dataset_id": dataset.id,
-                        "file_id": file.id,
-                        "asset_kind": asset_kind,
-                        "bytes": bytes_downloaded,
-                        "path": str(destination),
-                    },
-                )
-            except HTTPException as exc:
-                results.append(
-                    SearchResultItem(
-                        dataset_file_id=file.id,
-                        dataset_file_name=file.original_filename,
-                        asset_kind=asset_kind,
-                        success=False,
-                        score=0.0,
-                        score_above_threshold=False,
-                        transform=None,
-                        matched_points_image=None,
-                        preview_path=None,
-                        preview_url=None,
-                        stars_path=None,
-                        stars_url=None,
-                        geojson=None,
-                        message=str(exc.detail),
-                    )
-                )
-                continue
+            if config.max_download_bytes is not None and bytes_downloaded > config.max_download_bytes:
+                raise HTTPException(status_code=413, detail="Downloaded asset exceeded configured size limit.")
+            logger.info(
+                "Downloaded dataset asset",
+                {
+                    "dataset_id": dataset.id,
+                    "file_id": file.id,
+                    "asset_kind": asset_kind,
+                    "bytes": bytes_downloaded,
+                    "path": str(destination),
+                },
+            )
+        except HTTPException as exc:
+            return _failed_result(file, asset_kind, str(exc.detail)), False
 
+        # Holds the conversion cache lease until the search has read the converted file.
+        leases = contextlib.AsyncExitStack()
+        try:
             search_path = destination
-            if asset_kind == "mbtiles":
+            if asset_kind == "mbtiles" and config.mbtiles_reader == "gdal":
                 try:
-                    search_path = await convert_mbtiles_to_geotiff(destination)
+                    async with convert_slots:
+                        conversion_cache = get_conversion_cache(config)
+                        if conversion_cache is not None:
+                            search_path = await leases.enter_async_context(
+                                conversion_cache.leased(
+                                    destination, convert_mbtiles_to_geotiff, overview_levels=overview_levels
+                                )
+                            )
+                        else:
+                            search_path = await convert_mbtiles_to_geotiff(destination)
                     logger.info(search_path)
 
                 except HTTPException as exc:
-                    results.append(
-                        SearchResultItem(
-                            dataset_file_id=file.id,
-                            dataset_file_name=file.original_filename,
-                            asset_kind=asset_kind,
-                            success=False,
-                            score=0.0,
-                            score_above_threshold=False,
-                            transform=None,
-                            matched_points_image=None,
-                            preview_path=None,
-                            preview_url=None,
-                            stars_path=None,
-                            stars_url=None,
-                            geojson=None,
-                            message=str(exc.detail),
-                        )
-                    )
-                    continue
+                    return _failed_result(file, asset_kind, str(exc.detail)), False
 
-            used_file_ids.append(file.id)
-            try:
-                # Konvertáljuk a bemeneti vonal pontokat pixel koordinátákra az aktuális raszterben
-                with rasterio.open(str(search_path)) as ds_for_pattern:
-                    pattern_xy = _line_points_to_pixels(ds_for_pattern, base_points)
-                    if pattern_xy is None or pattern_xy.shape[0] < 2:
-                        raise HTTPException(status_code=400, detail="Pattern line points conversion failed")
-                    pattern = build_pattern(pattern_xy, name=payload.pattern_name)
-
-                match_result: MatchResult = await asyncio.to_thread(
-                    search_in_image,
-                    str(search_path),
-                    pattern,
-                    star_params_dict,
-                    payload.verify_tol_px,
-                )
-            except Exception as exc:  # pragma: no cover
-                logger.exception(
-                    "Pattern search failed",
-                    {
-                        "dataset_id": dataset.id,
-                        "file_id": file.id,
-                        "asset_kind": asset_kind,
-                    },
-                )
-                results.append(
-                    SearchResultItem(
-                        dataset_file_id=file.id,
-                        dataset_file_name=file.original_filename,
-                        asset_kind=asset_kind,
-                        success=False,
-                        score=0.0,
-                        score_above_threshold=False,
-                        transform=None,
-                        matched_points_image=None,
-                        preview_path=None,
-                        preview_url=None,
-                        stars_path=None,
-                        stars_url=None,
-                        geojson=None,
-                        message=str(exc),
-                    )
+            async with search_slots:
+                item = await executor.run(
+                    _search_raster_file,
+                    search_path,
+                    file,
+                    asset_kind,
+                    fallback_used,
+                    dataset_id=dataset.id,
+                    payload=payload,
+                    base_points=base_points,
+                    star_params_dict=star_params_dict,
+                    preview_dir=preview_dir,
+                    stars_dir=stars_dir,
+                    config=config,
                 )
-                continue
-
-            score_above_threshold = bool(match_result.score >= payload.score_threshold)
-            success = bool(match_result.transform is not None and score_above_threshold)
-            transform_list = match_result.transform.tolist() if match_result.transform is not None else None
-            matched_points = (
-                match_result.matched_points_img.tolist() if match_result.matched_points_img is not None else None
-            )
-
-            preview_path_str = None
-            preview_url = None
-            stars_path_str = None
-            stars_url = None
-            geojson_feature = None
-            if success and payload.generate_previews:
-                try:
-                    preview_full = await asyncio.to_thread(
-                        visualize_match,
-                        str(search_path),
-                        pattern,
-                        match_result,
-                        str(preview_dir),
-                    )
-                    rel_path = _relative_result_path(preview_full, config)
-                    if rel_path is not None:
-                        preview_path_str = rel_path.as_posix()
-                        preview_url = f"/results/{preview_path_str}"
-                    else:
-                        preview_path_str = preview_full
-                except Exception as exc:  # pragma: no cover
-                    logger.exception(
-                        "Failed to generate preview",
-                        {
-                            "dataset_id": dataset.id,
-                            "file_id": file.id,
-                            "asset_kind": asset_kind,
-                        },
-                    )
-
-            if payload.generate_previews and match_result.stars_xy is not None:
-                try:
-                    projected_pattern = _project_pattern_points(pattern, match_result)
-                    stars_full = await asyncio.to_thread(
-                        visualize_stars,
-                        str(search_path),
-                        match_result.stars_xy,
-                        str(stars_dir),
-                        projected_pattern=projected_pattern,
-                        matched_points=match_result.matched_points_img,
-                    )
-                    rel_path = _relative_result_path(stars_full, config)
-                    if rel_path is not None:
-                        stars_path_str = rel_path.as_posix()
-                        stars_url = f"/results/{stars_path_str}"
-                    else:
-                        stars_path_str = stars_full
-                except Exception:  # pragma: no cover
-                    logger.exception(
-                        "Failed to generate stars visualization",
-                        {
-                            "dataset_id": dataset.id,
-                            "file_id": file.id,
-                            "asset_kind": asset_kind,
-                        },
-                    )
+            return item, True
+        finally:
+            await leases.aclose()
+            # Free the temp space early; later files may still be downloading.
+            destination.unlink(missing_ok=True)
 
-            if success:
-                try:
-                    geojson_feature = build_match_geojson(Path(search_path), pattern, match_result)
-                except Exception:  # pragma: no cover
-                    logger.exception(
-                        "Failed to generate match geojson",
-                        {
-                            "dataset_id": dataset.id,
-                            "file_id": file.id,
-                            "asset_kind": asset_kind,
-                        },
-                    )
+    async def _enter_pipeline(file: DatasetFileModel, tmp_dir: Path) -> Tuple[SearchResultItem, bool]:
+        async with depth:
+            return await _process(file, tmp_dir)
 
-            message_parts: List[str] = []
-            if fallback_used:
-                if asset_kind == "mbtiles":
-                    message_parts.append("Original file unavailable, MBTiles variant was used.")
-                else:
-                    message_parts.append("MBTiles variant unavailable, original file was used.")
-            if not success:
-                message_parts.append("Pattern verification did not meet the success criteria.")
-
-            results.append(
-                SearchResultItem(
-                    dataset_file_id=file.id,
-                    dataset_file_name=file.original_filename,
-                    asset_kind=asset_kind,
-                    success=success,
-                    score=float(match_result.score),
-                    score_above_threshold=score_above_threshold,
-                    transform=transform_list,
-                    matched_points_image=matched_points,
-                    preview_path=preview_path_str,
-                    preview_url=preview_url,
-                    stars_path=stars_path_str,
-                    stars_url=stars_url,
-                    geojson=geojson_feature,
-                    message=" ".join(message_parts) if message_parts else None,
-                )
-            )
+    with tempfile.TemporaryDirectory(prefix=f"pattern_{run_id}_") as tmp_root:
+        tmp_dir = Path(tmp_root)
+        tasks = [asyncio.create_task(_enter_pipeline(file, tmp_dir)) for file in files]
+        try:
+            outcomes = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    results: List[SearchResultItem] = [item for item, _ in outcomes]
+    used_file_ids: List[str] = [file.id for file, (_, used) in zip(files, outcomes) if used]
 
     return results, used_file_ids
 
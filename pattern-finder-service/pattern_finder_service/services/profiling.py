@@ -0,0 +1,151 @@
+"""Per-stage wall time and peak resident memory of a search, for sizing worker pods.
+
+Stages are marked with :func:`stage`, which is a no-op unless a :class:`StageProfiler` is
+active in the current context, so the detection code can stay instrumented for free.
+
+On Linux the kernel's RSS high-water mark (``VmHWM``) is reset at every stage boundary via
+``/proc/self/clear_refs``, which gives the true peak of each stage. Elsewhere (or when the
+file is not writable) the process-lifetime ``ru_maxrss`` is reported instead. RSS is a
+process-wide figure: the numbers are only attributable to one file when searches do not
+overlap in the same process (``PATTERN_SEARCH_CONCURRENCY=1`` or the process executor).
+"""
+from __future__ import annotations
+
+import contextvars
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+_PROC_STATUS = "/proc/self/status"
+_PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+_ACTIVE: contextvars.ContextVar[Optional["StageProfiler"]] = contextvars.ContextVar("stage_profiler", default=None)
+
+
+def _status_kib(field_name: str) -> Optional[int]:
+    try:
+        with open(_PROC_STATUS, "r", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith(field_name + ":"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+def _maxrss_kib() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kibibytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def current_rss_mb() -> Optional[float]:
+    rss = _status_kib("VmRSS")
+    return rss / 1024.0 if rss is not None else None
+
+
+@dataclass
+class StageRecord:
+    name: str
+    seconds: float
+    rss_start_mb: Optional[float]
+    peak_rss_mb: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "seconds": round(self.seconds, 4),
+            "rssStartMb": None if self.rss_start_mb is None else round(self.rss_start_mb, 1),
+            "peakRssMb": round(self.peak_rss_mb, 1),
+        }
+
+
+class StageProfiler:
+    """Collects a :class:`StageRecord` for every stage entered while it is active.
+
+    Nested stages are recorded as ``outer/inner``; an outer stage's peak covers its
+    children. Use it as a context manager to activate it for the current context.
+    """
+
+    def __init__(self) -> None:
+        self.records: List[StageRecord] = []
+        self._open: List[List[Any]] = []  # [name, started, rss_start, running_peak_kib]
+        self._token: Optional[contextvars.Token] = None
+        self.exact = self._reset_peak()
+
+    def __enter__(self) -> "StageProfiler":
+        self._token = _ACTIVE.set(self)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._token is not None:
+            _ACTIVE.reset(self._token)
+            self._token = None
+
+    @staticmethod
+    def _reset_peak() -> bool:
+        try:
+            with open(_PROC_CLEAR_REFS, "w", encoding="ascii") as handle:
+                handle.write("5")
+            return True
+        except OSError:
+            return False
+
+    def _peak_kib(self) -> int:
+        if self.exact:
+            peak = _status_kib("VmHWM")
+            if peak is not None:
+                return peak
+        return _maxrss_kib()
+
+    def _fold_peak(self) -> None:
+        """Fold the current high-water mark into every open stage before it is reset."""
+
+        peak = self._peak_kib()
+        for entry in self._open:
+            entry[3] = max(entry[3], peak)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        self._fold_peak()
+        if self.exact:
+            self.exact = self._reset_peak()
+        full_name = "/".join([entry[0] for entry in self._open] + [name])
+        entry = [name, time.perf_counter(), current_rss_mb(), 0]
+        self._open.append(entry)
+        try:
+            yield
+        finally:
+            self._fold_peak()
+            self._open.pop()
+            self.records.append(
+                StageRecord(
+                    name=full_name,
+                    seconds=time.perf_counter() - entry[1],
+                    rss_start_mb=entry[2],
+                    peak_rss_mb=entry[3] / 1024.0,
+                )
+            )
+            if self._open:
+                self._open[-1][3] = max(self._open[-1][3], entry[3])
+
+    def report(self) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self.records]
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record ``name`` on the active profiler, if any."""
+
+    profiler = _ACTIVE.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
+
+
+__all__ = ["StageProfiler", "StageRecord", "current_rss_mb", "stage"]
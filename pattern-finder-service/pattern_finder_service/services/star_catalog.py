@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from ..cache import DiskCache, hash_key
+
+if TYPE_CHECKING:  # pragma: no cover
+    from ..config import ServiceConfig
+    from .pattern_core import StarDetectionParams
+
+# Bump whenever detection output changes in a way that invalidates stored catalogs.
+CATALOG_FORMAT_VERSION = 2
+
+# Parameters that do not influence which stars are detected (matching, parallelism).
+_NON_DETECTION_FIELDS = frozenset(
+    {
+        "tolerance_px",
+        "tile_workers",
+        "match_seed_stars",
+        "match_engine",
+        "match_seed",
+        "match_confidence",
+        "match_max_iterations",
+        "match_max_matches",
+        "match_verifier",
+        "match_grid_cell",
+    }
+)
+# Applied after the candidate filter only; equalization and blob finding ignore them.
+FILTER_FIELDS = frozenset({"min_prominence", "min_center_value", "axis_ratio_limit", "max_stars"})
+
+
+def canonical_params(params: "StarDetectionParams", *, exclude: frozenset = frozenset(), **extra: Any) -> str:
+    """Stable JSON form of the detection-relevant parameters (minus ``exclude``)."""
+
+    skip = _NON_DETECTION_FIELDS | exclude
+    values: Dict[str, Any] = {key: value for key, value in asdict(params).items() if key not in skip}
+    for key, value in extra.items():
+        values[f"_{key}"] = value
+    return json.dumps(values, sort_keys=True, default=str)
+
+
+class StarCatalogCache:
+    """On-disk store of detected star catalogs keyed by source identity and detection params.
+
+    ``source_key`` identifies the raster contents, e.g. ``"sha256:<digest>"`` or a dataset
+    file id combined with its ``updated_at`` timestamp. Catalogs are stored as compact
+    float32 ``(N, 3)`` row/column/prominence arrays.
+
+    With ``stage_max_bytes`` set, the intermediate detection stages (the normalized and the
+    equalized image and the raw blob list) are kept as well, keyed without the :data:`FILTER_FIELDS`. A
+    search that only changes filter thresholds then re-runs just the candidate filter.
+    """
+
+    def __init__(self, root: Path, max_bytes: Optional[int], *, stage_max_bytes: Optional[int] = None) -> None:
+        self._store = DiskCache(root, max_bytes, suffix=".npy")
+        self._stages = DiskCache(root / "stages", stage_max_bytes, suffix=".npy") if stage_max_bytes else None
+
+    @property
+    def root(self) -> Path:
+        return self._store.root
+
+    def key_for(self, source_key: str, params: "StarDetectionParams", **extra: Any) -> str:
+        return hash_key(f"v{CATALOG_FORMAT_VERSION}", source_key, canonical_params(params, **extra))
+
+    def load(self, source_key: str, params: "StarDetectionParams", **extra: Any) -> Optional[np.ndarray]:
+        key = self.key_for(source_key, params, **extra)
+        path = self._store.get(key)
+        if path is None:
+            return None
+        try:
+            stars = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            self._store.discard(key)
+            return None
+        if stars.ndim != 2 or stars.shape[1] != 3:
+            self._store.discard(key)
+            return None
+        return stars.astype(np.float32, copy=False)
+
+    def store(self, source_key: str, params: "StarDetectionParams", stars: np.ndarray, **extra: Any) -> Path:
+        key = self.key_for(source_key, params, **extra)
+        array = np.ascontiguousarray(stars, dtype=np.float32).reshape(-1, 3)
+
+        def _write(tmp_path: Path) -> None:
+            with tmp_path.open("wb") as fh:
+                np.save(fh, array, allow_pickle=False)
+
+        return self._store.put(key, _write)
+
+    @property
+    def caches_stages(self) -> bool:
+        return self._stages is not None
+
+    def _stage_keys(self, source_key: str, params: "StarDetectionParams", **extra: Any) -> Tuple[str, str, str]:
+        base = hash_key(f"v{CATALOG_FORMAT_VERSION}", source_key, canonical_params(params, exclude=FILTER_FIELDS, **extra))
+        return hash_key(base, "image"), hash_key(base, "equalized"), hash_key(base, "blobs")
+
+    def load_stages(
+        self, source_key: str, params: "StarDetectionParams", **extra: Any
+    ) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Return ``(image, equalized image, blobs)`` for these detection params, or ``None``.
+
+        Both images are memory-mapped read-only: the filter and the brightness measurement
+        only touch the pages around the blobs they look at.
+        """
+
+        if self._stages is None:
+            return None
+        keys = self._stage_keys(source_key, params, **extra)
+        paths = [self._stages.get(key) for key in keys]
+        if any(path is None for path in paths):
+            return None
+        try:
+            img = np.load(paths[0], mmap_mode="r", allow_pickle=False)
+            img_eq = np.load(paths[1], mmap_mode="r", allow_pickle=False)
+            blobs = np.load(paths[2], allow_pickle=False)
+        except (OSError, ValueError):
+            img = img_eq = blobs = None
+        if img is None or img.ndim != 2 or img.shape != img_eq.shape or blobs.ndim != 2 or blobs.shape[1] != 3:
+            for key in keys:
+                self._stages.discard(key)
+            return None
+        return img, img_eq, blobs
+
+    def store_stages(
+        self,
+        source_key: str,
+        params: "StarDetectionParams",
+        img: np.ndarray,
+        img_eq: np.ndarray,
+        blobs: np.ndarray,
+        **extra: Any,
+    ) -> None:
+        if self._stages is None:
+            return
+        image_key, equalized_key, blobs_key = self._stage_keys(source_key, params, **extra)
+        entries = ((blobs_key, np.asarray(blobs, dtype=np.float64)), (image_key, img), (equalized_key, img_eq))
+        for key, array in entries:
+
+            def _write(tmp_path: Path, array: np.ndarray = array) -> None:
+                with tmp_path.open("wb") as fh:
+                    np.save(fh, array, allow_pickle=False)
+
+            self._stages.put(key, _write)
+
+
+def dataset_file_source_key(file_id: str, updated_at: Any, asset_kind: str) -> str:
+    stamp = updated_at.isoformat() if hasattr(updated_at, "isoformat") else str(updated_at)
+    return f"file:{file_id}@{stamp}:{asset_kind}"
+
+
+_CACHES: Dict[Path, StarCatalogCache] = {}
+
+
+def get_catalog_cache(config: "ServiceConfig") -> Optional[StarCatalogCache]:
+    if not config.catalog_cache_max_bytes:
+        return None
+    root = config.cache_dir / "star_catalogs"
+    cache = _CACHES.get(root)
+    if cache is None:
+        cache = StarCatalogCache(root, config.catalog_cache_max_bytes, stage_max_bytes=config.stage_cache_max_bytes)
+        _CACHES[root] = cache
+    return cache
+
+
+__all__ = [
+    "CATALOG_FORMAT_VERSION",
+    "FILTER_FIELDS",
+    "StarCatalogCache",
+    "canonical_params",
+    "dataset_file_source_key",
+    "get_catalog_cache",
+]
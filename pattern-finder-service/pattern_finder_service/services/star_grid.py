@@ -0,0 +1,86 @@
+"""Nearest-star lookup table: inlier verification as array indexing instead of tree queries.
+
+The catalog is rasterized once onto a grid of ``cell``-pixel cells and a Euclidean distance
+transform gives every cell its nearest occupied cell, stored as the index of a star in it
+(4 bytes per cell, so the cell size sets the memory). A projected point then costs one
+lookup: the exact distance to that cell's star proves an inlier when it is within the
+tolerance, and the distance between cell centres minus the cell diagonal bounds every
+star's distance from below, which proves an outlier. Points in the band between the two,
+or whose star is consumed by an earlier match, are left to an exact search.
+"""
+from __future__ import annotations
+
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+
+# Cell count the grid may grow to before its cells are enlarged instead (16 MB of indices;
+# the distance transform briefly needs about four times that).
+_MAX_CELLS = 1 << 22
+# Default cell size in tolerances. Smaller cells settle a few more points near stars but
+# the distance transform's cost grows with the cell count (about 80 ns per cell).
+_CELL_TOLERANCES = 2.0
+
+
+class StarGrid:
+    """Nearest-star index of every ``cell``-pixel cell around a ``(N, 2)`` star catalog."""
+
+    def __init__(self, stars: np.ndarray, tolerance: float, *, cell: float = 0.0, max_cells: int = _MAX_CELLS) -> None:
+        self.stars = np.asarray(stars, dtype=np.float64)
+        self.tolerance = float(tolerance)
+        # Beyond ``tolerance`` of the catalog's bounding box nothing can be an inlier.
+        self.origin = self.stars.min(axis=0) - self.tolerance
+        extent = self.stars.max(axis=0) + self.tolerance - self.origin
+        cell = float(cell) if cell > 0 else self.tolerance * _CELL_TOLERANCES
+        if np.prod(np.ceil(extent / cell) + 1) > max_cells:
+            cell = math.sqrt(float(np.prod(extent + cell)) / max_cells) * 1.01
+        self.cell = cell
+        shape = tuple(int(side) for side in np.ceil(extent / cell).astype(np.int64) + 1)
+
+        self.star_cells = np.floor((self.stars - self.origin) / cell).astype(np.intp)
+        owner = np.full(shape, -1, dtype=np.int32)
+        # Any star of a cell will do: the bounds only rely on it lying inside the cell.
+        owner[self.star_cells[:, 0], self.star_cells[:, 1]] = np.arange(len(self.stars), dtype=np.int32)
+        indices = np.empty((2,) + shape, dtype=np.int32)
+        distance_transform_edt(owner < 0, return_distances=False, return_indices=True, indices=indices)
+        self.nearest = owner[indices[0], indices[1]]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.nearest.nbytes)
+
+    def lookup(
+        self, points: np.ndarray, consumed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(distances, nearest, unsure)`` of ``points`` against the tolerance.
+
+        Proven inliers get the exact distance to a star within the tolerance (not always the
+        very nearest one when several are) and its index; proven outliers an infinite
+        distance. ``unsure`` flags the rest, whose entries are meaningless.
+        """
+
+        points = np.asarray(points, dtype=np.float64)
+        count = len(points)
+        distances = np.full(count, np.inf)
+        nearest = np.full(count, len(self.stars), dtype=np.intp)
+        unsure = np.zeros(count, dtype=bool)
+        cells = np.floor((points - self.origin) / self.cell)
+        inside = np.flatnonzero(((cells >= 0) & (cells < self.nearest.shape)).all(axis=1))
+        if not len(inside):
+            return distances, nearest, unsure
+        cells = cells[inside].astype(np.intp)
+        found = self.nearest[cells[:, 0], cells[:, 1]].astype(np.intp)
+        exact = np.hypot(*(points[inside] - self.stars[found]).T)
+        bound = self.cell * (np.hypot(*(cells - self.star_cells[found]).T) - math.sqrt(2.0))
+        inlier = exact < self.tolerance
+        if consumed is not None:
+            inlier &= ~consumed[found]
+        distances[inside[inlier]] = exact[inlier]
+        nearest[inside[inlier]] = found[inlier]
+        unsure[inside[~inlier & (bound < self.tolerance)]] = True
+        return distances, nearest, unsure
+
+
+__all__ = ["StarGrid"]
@@ -0,0 +1,143 @@
+"""Similarity-invariant triangle index: pattern matching as lookup instead of random draws.
+
+A triangle is described by its two shorter sides divided by its longest one, which no
+translation, rotation or scale changes, signed by its orientation (a similarity without
+reflection keeps it). The catalog's triangles sit in a KD-tree over that descriptor, so
+every pattern triangle finds its lookalikes with one nearest-neighbour query, and each
+lookalike yields a fully determined hypothesis through its vertex correspondence.
+
+Indexing every triple of a catalog is cubic, so only two families are kept: each star with
+pairs of its ``neighbours`` nearest stars (compact asterisms) and every triple among the
+``bright`` most prominent stars (wide asterisms, which is what hand-drawn patterns are).
+"""
+from __future__ import annotations
+
+from itertools import combinations
+from typing import Optional, Tuple
+
+import numpy as np
+from scipy.spatial import KDTree
+
+# Triangles flatter than this (twice the area over the squared longest side) are dropped:
+# their vertex order and orientation flip under pixel noise.
+_MIN_SHAPE = 0.02
+# Pattern points beyond this many are not combined into triangles (C(24, 3) = 2024).
+_MAX_PATTERN_POINTS = 24
+
+
+def _describe(points: np.ndarray, triples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Descriptors and canonically ordered vertices of ``triples``, flat ones removed.
+
+    Vertices are ordered by the length of the side opposite them, longest first, so two
+    similar triangles list corresponding vertices in the same order. The descriptor is
+    ``(middle / longest, orientation * shortest / longest)``; the orientation sign keeps
+    mirrored triangles far apart, as the shortest side is never near zero for a kept one.
+    """
+
+    if not len(triples):
+        return np.zeros((0, 2)), np.zeros((0, 3), dtype=np.intp)
+    corners = points[triples]
+    sides = np.stack(
+        [
+            np.hypot(*(corners[:, 1] - corners[:, 2]).T),
+            np.hypot(*(corners[:, 2] - corners[:, 0]).T),
+            np.hypot(*(corners[:, 0] - corners[:, 1]).T),
+        ],
+        axis=1,
+    )
+    order = np.argsort(-sides, axis=1, kind="stable")
+    sides = np.take_along_axis(sides, order, axis=1)
+    ordered = np.take_along_axis(triples, order, axis=1)
+    corners = points[ordered]
+    first = corners[:, 1] - corners[:, 0]
+    second = corners[:, 2] - corners[:, 0]
+    cross = first[:, 0] * second[:, 1] - first[:, 1] * second[:, 0]
+    longest = np.maximum(sides[:, 0], 1e-12)
+    keep = np.abs(cross) / longest**2 >= _MIN_SHAPE
+    descriptors = np.column_stack([sides[:, 1] / longest, np.sign(cross) * sides[:, 2] / longest])
+    return descriptors[keep], ordered[keep]
+
+
+def catalog_triangles(
+    stars: np.ndarray,
+    brightness: Optional[np.ndarray] = None,
+    *,
+    neighbours: int = 6,
+    bright: int = 40,
+) -> np.ndarray:
+    """Unique vertex triples of the neighbourhood and bright-star families, as ``(K, 3)``."""
+
+    count = len(stars)
+    if count < 3:
+        return np.zeros((0, 3), dtype=np.intp)
+    families = []
+    k = min(int(neighbours), count - 1)
+    if k >= 2:
+        _, nearest = KDTree(stars).query(stars, k=k + 1)
+        pairs = np.asarray(list(combinations(range(1, k + 1), 2)), dtype=np.intp)
+        centre = np.repeat(nearest[:, 0], len(pairs))
+        families.append(np.column_stack([centre, nearest[:, pairs].reshape(-1, 2)]))
+    if bright >= 3:
+        if brightness is not None:
+            top = np.argsort(-np.asarray(brightness, dtype=np.float64), kind="stable")[: int(bright)]
+        else:
+            top = np.arange(min(int(bright), count))
+        families.append(top[np.asarray(list(combinations(range(len(top)), 3)), dtype=np.intp)])
+    triples = np.sort(np.concatenate(families).astype(np.intp), axis=1)
+    return np.unique(triples, axis=0)
+
+
+class TriangleIndex:
+    """Triangle descriptors of a star catalog, ready for similarity-invariant lookup."""
+
+    def __init__(
+        self,
+        stars: np.ndarray,
+        brightness: Optional[np.ndarray] = None,
+        *,
+        neighbours: int = 6,
+        bright: int = 40,
+    ) -> None:
+        self.stars = np.asarray(stars, dtype=np.float64)
+        triples = catalog_triangles(self.stars, brightness, neighbours=neighbours, bright=bright)
+        descriptors, self.triples = _describe(self.stars, triples)
+        self._tree = KDTree(descriptors) if len(descriptors) else None
+
+    def __len__(self) -> int:
+        return len(self.triples)
+
+    def candidates(
+        self,
+        pattern: np.ndarray,
+        *,
+        limit: int = 1000,
+        radius: float = 0.02,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Up to ``limit`` ``(pattern_triples, star_triples)`` vertex correspondences.
+
+        Every pattern triangle contributes its nearest catalog lookalikes within ``radius``
+        in descriptor space; the pairs come back closest first, with larger pattern
+        triangles (whose ratios noise disturbs least) winning ties.
+        """
+
+        empty = np.zeros((0, 3), dtype=np.intp)
+        pattern = np.asarray(pattern, dtype=np.float64)[:_MAX_PATTERN_POINTS]
+        if self._tree is None or len(pattern) < 3 or limit <= 0:
+            return empty, empty
+        combos = np.asarray(list(combinations(range(len(pattern)), 3)), dtype=np.intp)
+        descriptors, pattern_triples = _describe(pattern, combos)
+        if not len(pattern_triples):
+            return empty, empty
+        k = min(max(1, -(-int(limit) // len(pattern_triples))), len(self.triples))
+        distances, found = self._tree.query(descriptors, k=k, distance_upper_bound=radius)
+        distances = distances.reshape(len(pattern_triples), k)
+        found = found.reshape(len(pattern_triples), k)
+        rows, cols = np.nonzero(np.isfinite(distances))
+        if not len(rows):
+            return empty, empty
+        spans = np.ptp(pattern[pattern_triples[rows]], axis=1).max(axis=1)
+        order = np.lexsort((-spans, distances[rows, cols]))[: int(limit)]
+        return pattern_triples[rows[order]], self.triples[found[rows[order], cols[order]]]
+
+
+__all__ = ["TriangleIndex", "catalog_triangles"]